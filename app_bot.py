@@ -23,12 +23,9 @@ except Exception as e:
     print(f"Error loading .env: {str(e)}")
     traceback.print_exc()
 
-# Configure simple logging to stdout
-logging.basicConfig(
-    level=logging.getLevelName(os.getenv("LOG_LEVEL", "INFO")),
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    handlers=[logging.StreamHandler(sys.stdout)]
-)
+# Log through the shared background writer
+from backend.logging_config import configure_logging
+configure_logging("bot")
 logger = logging.getLogger(__name__)
 logger.info("Logging initialized")
 
@@ -36,9 +33,8 @@ def run_bot():
     try:
         print("Setting up Bot app...")
         
-        # Import bot app here to avoid circular imports
-        print("Importing bot_app...")
-        from backend.bot.bot_app import app as bot_app
+        # Bind the port first, the bot itself is loaded by a background warm-up
+        from backend.bot.server import create_app
         import aiohttp.web
         
         bot_port = int(os.getenv("PORT", "3978"))
@@ -46,7 +42,7 @@ def run_bot():
         print(f"Starting Bot on port {bot_port}...")
         
         # Use the correct method to run an aiohttp application
-        aiohttp.web.run_app(bot_app, host="0.0.0.0", port=bot_port)
+        aiohttp.web.run_app(create_app(), host="0.0.0.0", port=bot_port)
     except Exception as e:
         print(f"Bot error: {str(e)}")
         traceback.print_exc()
@@ -23,12 +23,9 @@ except Exception as e:
     print(f"Error loading .env: {str(e)}")
     traceback.print_exc()
 
-# Configure simple logging to stdout
-logging.basicConfig(
-    level=logging.getLevelName(os.getenv("LOG_LEVEL", "INFO")),
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    handlers=[logging.StreamHandler(sys.stdout)]
-)
+# Log through the shared background writer
+from backend.logging_config import configure_logging
+configure_logging("flask")
 logger = logging.getLogger(__name__)
 logger.info("Logging initialized")
 
@@ -37,6 +34,10 @@ def run_flask():
     try:
         # Import flask app here to avoid circular imports
         from backend.flask_app.flask_app import app as flask_app
+
+        # Create the tables and default users if this deployment has not yet
+        from backend.common import bootstrap
+        bootstrap.bootstrap(flask_app)
         
         # Dynamically determine the port
         port = int(os.getenv("WEBSITES_PORT", os.getenv("PORT", "8080")))
@@ -1,7 +1,7 @@
 import asyncio
-import sys
 import os
 import logging
+import time
 from aiohttp import web
 from dotenv import load_dotenv
 import re
@@ -17,95 +17,38 @@ from botbuilder.core import (
 from botbuilder.schema import Activity, ResourceResponse
 from backend.bot.dialogs.main_dialog import MainDialog
 from backend.bot.state.user_state import UserState
+from backend.bot import warmup
+from backend.bot.state import write_behind
+from backend.bot.services import deadline, resilience, llm_router, rate_limit, batching, metrics, profiler
+from backend.common import configuration, tracing, sampling_profiler
+from backend import logging_config
+from backend.logging_config import configure_logging, PAYLOAD
 from azure.core.exceptions import DeserializationError
-from azure.appconfiguration import AzureAppConfigurationClient
-import threading
+import hmac
 
 # Configure logging
-logging.basicConfig(
-    level=logging.getLevelName(os.getenv("LOG_LEVEL", "INFO")),
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    handlers=[logging.StreamHandler(sys.stdout)]
-)
+configure_logging("bot")
 LOGGER = logging.getLogger(__name__)
 
 # Load environment variables from .env file first
 load_dotenv()
 
-# Function to load environment variables from Azure App Configuration
-def load_azure_app_config():
-    """Load environment variables from Azure App Configuration."""
-    connection_string = os.getenv("AZURE_APP_CONFIG_CONNECTION_STRING")
-    
-    if not connection_string:
-        LOGGER.warning("Azure App Configuration connection string not found. Using local environment variables only.")
-        return False
-    
-    # Set up a timeout for Azure App Configuration loading
-    def fetch_config():
-        nonlocal config_loaded
-        try:
-            # Connect to Azure App Configuration
-            LOGGER.info("Connecting to Azure App Configuration...")
-            client = AzureAppConfigurationClient.from_connection_string(connection_string)
-            
-            # Define the list of configuration keys we need to load
-            config_keys = [
-                "AI_API_KEY",
-                "AI_ENDPOINT",
-                "TRANSLATOR_KEY",
-                "TRANSLATOR_ENDPOINT", 
-                "TRANSLATOR_LOCATION",
-                "TEXT_ANALYTICS_KEY",
-                "TEXT_ANALYTICS_ENDPOINT",
-                "MicrosoftAppId",
-                "MicrosoftAppPassword"
-            ]
-            
-            # Only try to load if not already in environment
-            for key in config_keys:
-                if os.getenv(key):
-                    LOGGER.info(f"Skipping {key} - already set in environment")
-                    continue
-                    
-                try:
-                    setting = client.get_configuration_setting(key=key)
-                    os.environ[key] = setting.value
-                    LOGGER.info(f"Loaded {key} from Azure App Configuration.")
-                except Exception as e:
-                    LOGGER.warning(f"Failed to load {key} from Azure App Configuration: {str(e)}")
-            
-            config_loaded = True
-        except Exception as e:
-            LOGGER.error(f"Error connecting to Azure App Configuration: {str(e)}")
-            config_loaded = False
-    
-    # Run config loading with a timeout
-    config_loaded = False
-    config_thread = threading.Thread(target=fetch_config)
-    config_thread.daemon = True
-    config_thread.start()
-    
-    # Wait up to 5 seconds for config to load
-    config_thread.join(timeout=5.0)
-    
-    if config_thread.is_alive():
-        LOGGER.warning("Azure App Configuration loading timed out after 5 seconds. Using environment variables.")
-        return False
-    
-    return config_loaded
-
 # Load variables from Azure App Configuration before initializing other services
-load_azure_app_config()
+configuration.start()
 
 # Now get environment variables (prioritizing ones loaded from Azure App Config)
 APP_ID = os.getenv("MicrosoftAppId", "")
 APP_PASSWORD = os.getenv("MicrosoftAppPassword", "")
 
+# Token required by the /debug endpoints, which are disabled when it is not set
+DEBUG_ADMIN_TOKEN = os.getenv("DEBUG_ADMIN_TOKEN")
+
 # For local development without authentication
 BYPASS_AUTH = os.getenv("BYPASS_AUTH", "true").lower() == "true"
 LOGGER.info(f"Authentication bypass is {'enabled' if BYPASS_AUTH else 'disabled'}")
 
+tracing.configure("bot")
+
 SETTINGS = BotFrameworkAdapterSettings(
     app_id=APP_ID,
     app_password=APP_PASSWORD,
@@ -190,18 +133,152 @@ async def health_check(req):
         env_vars = ["AI_API_KEY", "AI_ENDPOINT", "TRANSLATOR_KEY", "TRANSLATOR_ENDPOINT"]
         missing = [var for var in env_vars if not os.getenv(var)]
         
+        # Report the circuit breakers so open dependencies are visible to monitoring
+        resilience_status = resilience.snapshot()
+        resilience_status["llm_router"] = llm_router.snapshot()
+        resilience_status["rate_limits"] = rate_limit.snapshot()
+        resilience_status["batching"] = batching.snapshot()
+        resilience_status["logging"] = logging_config.snapshot()
+        resilience_status["configuration"] = configuration.snapshot()
+        resilience_status["write_behind"] = write_behind.snapshot()
+        open_breakers = [
+            name for name, breaker in resilience_status["breakers"].items()
+            if breaker["state"] != resilience.CLOSED
+        ]
+        
         if missing:
             LOGGER.warning(f"Missing environment variables: {', '.join(missing)}")
             return web.json_response({
                 "status": "degraded",
-                "details": f"Missing configuration: {', '.join(missing)}"
+                "details": f"Missing configuration: {', '.join(missing)}",
+                "resilience": resilience_status
             }, status=200)
         
-        return web.json_response({"status": "healthy", "configSource": "Azure App Configuration"}, status=200)
+        if open_breakers:
+            return web.json_response({
+                "status": "degraded",
+                "details": f"Circuit open for: {', '.join(open_breakers)}",
+                "resilience": resilience_status
+            }, status=200)
+        
+        return web.json_response({
+            "status": "healthy",
+            "configSource": resilience_status["configuration"]["source"],
+            "resilience": resilience_status
+        }, status=200)
     except Exception as e:
         LOGGER.error(f"Health check failed: {str(e)}")
         return web.json_response({"status": "unhealthy", "error": str(e)}, status=500)
 
+async def live(req):
+    """Liveness probe: constant time, touches nothing."""
+    return web.json_response({"status": "alive", "service": "bot"})
+
+async def ready(req):
+    """Readiness probe: 503 until the connection and cache warm-up has finished."""
+    if not warmup.is_ready():
+        return web.json_response({"status": "warming_up", "warmup": warmup.snapshot()},
+                                 status=503, headers={"Retry-After": "1"})
+    return web.json_response({"status": "ready", "warmup": warmup.snapshot()}, status=200)
+
+async def start_warm_up(app):
+    warmup.start()
+
+async def metrics_endpoint(req):
+    """Prometheus scrape endpoint."""
+    body = metrics.render(resilience.snapshot()["breakers"])
+    return web.Response(body=body.encode("utf-8"), headers={"Content-Type": metrics.CONTENT_TYPE})
+
+def is_debug_authorised(req):
+    """Check the admin token sent in X-Admin-Token or as a bearer token."""
+    if not DEBUG_ADMIN_TOKEN:
+        return False
+    supplied = req.headers.get("X-Admin-Token", "")
+    auth = req.headers.get("Authorization", "")
+    if not supplied and auth.startswith("Bearer "):
+        supplied = auth[len("Bearer "):]
+    return hmac.compare_digest(supplied.encode(), DEBUG_ADMIN_TOKEN.encode())
+
+async def slow_turns(req):
+    """Breakdown of recent turns slower than SLOW_TURN_THRESHOLD_MS."""
+    if not DEBUG_ADMIN_TOKEN:
+        raise web.HTTPNotFound()
+    if not is_debug_authorised(req):
+        return web.json_response({"error": "Admin token required"}, status=401)
+    try:
+        limit = int(req.query.get("limit", "0")) or None
+    except ValueError:
+        return web.json_response({"error": "limit must be a number"}, status=400)
+    return web.json_response({
+        "threshold_ms": int(profiler.SLOW_TURN_THRESHOLD * 1000),
+        "turns": profiler.slow_turns(limit)
+    })
+
+async def sampling_profile(req):
+    """Sample every thread for a few seconds and return collapsed stacks for a flame graph."""
+    if not DEBUG_ADMIN_TOKEN:
+        raise web.HTTPNotFound()
+    if not is_debug_authorised(req):
+        return web.json_response({"error": "Admin token required"}, status=401)
+    try:
+        options = sampling_profiler.parse_options(req.query)
+    except ValueError:
+        return web.json_response({"error": "seconds and interval_ms must be numbers"}, status=400)
+    try:
+        result = await asyncio.to_thread(sampling_profiler.profile, **options)
+    except sampling_profiler.ProfilerBusy as e:
+        return web.json_response({"error": str(e)}, status=409)
+    return web.Response(
+        text=sampling_profiler.collapsed(result),
+        content_type="text/plain",
+        headers={"X-Profile-Samples": str(result["samples"])}
+    )
+
+def capture_response(msg, all_responses, bot_response):
+    """Record an activity sent during a turn so it can be returned in the HTTP reply."""
+    if isinstance(msg, str):
+        # Plain text message
+        all_responses.append({"type": "message", "text": msg})
+        bot_response["text"] = msg
+    elif isinstance(msg, Activity):
+        # Handle typing indicator
+        if msg.type == "typing":
+            all_responses.append({"type": "typing"})
+        # Normal text activity
+        elif msg.text:
+            all_responses.append({"type": "message", "text": msg.text})
+            bot_response["text"] = msg.text
+        # Handle attachments if present
+        if msg.attachments:
+            bot_response["attachments"] = [
+                {
+                    "contentType": att.content_type,
+                    "content": att.content
+                }
+                for att in msg.attachments
+            ]
+    else:
+        # Unknown message type, convert to string
+        all_responses.append({"type": "message", "text": str(msg)})
+        bot_response["text"] = str(msg)
+
+async def combine_responses(all_responses):
+    """Join the text of every message sent during a turn, preserving order."""
+    combined_text = ""
+    for resp in all_responses:
+        if resp["type"] == "message":
+            text = resp["text"]
+
+            # If the text is a coroutine, await it
+            if asyncio.iscoroutine(text):
+                text = await text
+
+            if text:
+                if combined_text:
+                    combined_text += "\n\n"
+                combined_text += text
+    return combined_text
+
 # Extract HTML content for debug purposes
 def extract_html_error(html_content):
     """Extract error information from HTML content."""
@@ -257,17 +334,17 @@ async def messages(req):
             
             # Get scenario from header for all requests
             scenario = req.headers.get("X-Scenario")
-            LOGGER.info(f"Scenario from header: {scenario}")
+            LOGGER.debug("Scenario from header: %s", scenario)
             
             # Force reset of active dialog if the message is "__start__" or similar
             if body.get('text', '').lower() == "__start__" or body.get('text', '').lower() == "start":
                 user_state.set_active_dialog(None)
                 user_state.set_new_conversation(True)
-                LOGGER.info(f"Starting new conversation for user {user_id} with scenario: {scenario}")
+                LOGGER.info("Starting new conversation for user %s with scenario: %s", user_id, scenario)
             
             # Always initialize the dialog with the scenario parameter
             dialog = MainDialog(user_state, scenario)
-            LOGGER.info(f"Processing message for user {user_id}: '{activity.text}' for scenario: {scenario}")
+            LOGGER.info("Processing message for user %s: '%s' for scenario: %s", user_id, activity.text, scenario, extra=PAYLOAD)
         except Exception as e:
             LOGGER.error(f"Failed to initialize dialog: {str(e)}", exc_info=True)
             return web.json_response(
@@ -285,33 +362,8 @@ async def messages(req):
             # Create a wrapper for send_activity to capture the response
             async def capture_send_activity(msg):
                 try:
-                    if isinstance(msg, str):
-                        # Plain text message
-                        all_responses.append({"type": "message", "text": msg})
-                        bot_response["text"] = msg
-                    elif isinstance(msg, Activity):
-                        # Handle typing indicator
-                        if msg.type == "typing":
-                            all_responses.append({"type": "typing"})
-                        # Normal text activity
-                        elif msg.text:
-                            all_responses.append({"type": "message", "text": msg.text})
-                            bot_response["text"] = msg.text
-                        # Handle attachments if present
-                        if msg.attachments:
-                            bot_response["attachments"] = [
-                                {
-                                    "contentType": att.content_type,
-                                    "content": att.content
-                                }
-                                for att in msg.attachments
-                            ]
-                    else:
-                        # Unknown message type, convert to string
-                        all_responses.append({"type": "message", "text": str(msg)})
-                        bot_response["text"] = str(msg)
-
-                    LOGGER.info(f"Bot response to {user_id}: {str(msg)[:100]}...")
+                    capture_response(msg, all_responses, bot_response)
+                    LOGGER.info("Bot response to %s: %.100s...", user_id, msg, extra=PAYLOAD)
                     
                     # Try to send the message (might fail with deserialisation errors)
                     return await original_send_activity(msg)
@@ -336,8 +388,13 @@ async def messages(req):
                 # Run the dialog
                 try:
                     dialog_result = await dialog.run(turn_context, conversation_state.create_property("DialogState"))
+                    if dialog_result is False:
+                        # MainDialog.run logged and swallowed an error; the turn still failed
+                        metrics.TURN_ERRORS.inc(scenario=metrics.scenario_label(scenario))
+                        turn_span.status = "error"
+                        turn_span.set(error="MainDialog.run failed")
                     # Handle case where dialog_result is None
-                    if dialog_result is None:
+                    elif dialog_result is None:
                         LOGGER.warning(f"Dialog returned None result for user {user_id}")
                         if not bot_response["text"]:
                             bot_response["text"] = "I'm still processing. Let me think about that."
@@ -361,39 +418,51 @@ async def messages(req):
                 
                 # Don't rethrow, we'll use the captured bot_response
             except Exception as e:
+                metrics.TURN_ERRORS.inc(scenario=metrics.scenario_label(scenario))
                 LOGGER.error(f"Dialog execution error: {str(e)}", exc_info=True)
                 bot_response["text"] = "I apologise, but I encountered an error. Let's try again."
 
             # After dialog execution, combine all responses
             if all_responses:
-                # Join all text messages, preserving order
-                combined_text = ""
-                for resp in all_responses:
-                    if resp["type"] == "message":
-                        text = resp["text"]
-
-                        # If the text is a coroutine, await it
-                        if asyncio.iscoroutine(text):
-                            text = await text
-
-                        if text:
-                            if combined_text:
-                                combined_text += "\n\n"
-                            combined_text += text
+                combined_text = await combine_responses(all_responses)
 
                 # Only update if we have content
                 if combined_text:
                     bot_response["text"] = combined_text
 
+        # Bound the whole turn by the time Flask is still willing to wait
+        turn_budget_ms = deadline.budget_from_header(req.headers.get(deadline.DEADLINE_HEADER))
+        deadline_token = deadline.start_turn(turn_budget_ms)
+        scenario_label = metrics.scenario_label(scenario)
+        metrics.TURNS_IN_FLIGHT.inc(scenario=scenario_label)
+        turn_started = time.perf_counter()
+        # Continue the trace Flask started for this message
+        turn_span = tracing.start_span(
+            "bot.turn",
+            traceparent=req.headers.get(tracing.TRACEPARENT_HEADER),
+            scenario=scenario_label,
+            user_id=user_id,
+            budget_ms=turn_budget_ms
+        )
         try:
-            await ADAPTER.process_activity(activity, auth_header, turn_logic)
+            with turn_span:
+                profile_token = profiler.start_turn(scenario=scenario_label, user_id=user_id)
+                try:
+                    await ADAPTER.process_activity(activity, auth_header, turn_logic)
+                finally:
+                    profiler.end_turn(profile_token)
         except Exception as process_error:
+            metrics.TURN_ERRORS.inc(scenario=scenario_label)
             LOGGER.error(f"Error processing activity: {str(process_error)}")
             # If this is an auth error and we're bypassing auth, we can handle it specially
             if "Authorisation" in str(process_error) and BYPASS_AUTH:
                 LOGGER.info("Handling authorisation error in process_activity")
                 bot_response["text"] = "I'm here to help. What would you like to talk about?"
             # Continue execution - we'll use the captured bot_response if available
+        finally:
+            deadline.end_turn(deadline_token)
+            metrics.TURN_SECONDS.observe(time.perf_counter() - turn_started, scenario=scenario_label)
+            metrics.TURNS_IN_FLIGHT.dec(scenario=scenario_label)
 
         # Provide a fallback response if no text was captured
         if not bot_response["text"]:
@@ -421,15 +490,17 @@ async def messages(req):
 # Create and configure the web app
 app = web.Application()
 app.router.add_get("/health", health_check)
+app.router.add_get("/ready", ready)
+app.router.add_get("/live", live)
+app.router.add_get("/metrics", metrics_endpoint)
+app.router.add_get("/debug/slow-turns", slow_turns)
+app.router.add_get("/debug/profile", sampling_profile)
 app.router.add_post("/api/messages", messages)
+app.on_startup.append(start_warm_up)
 
 # Only run the server if directly executed
 if __name__ == "__main__":
     port = int(os.getenv("PORT", 3978))
     LOGGER.info(f"Starting bot on port {port}")
     
-    # Reload config in case environment has changed
-    config_loaded = load_azure_app_config()
-    LOGGER.info(f"Config loaded from Azure App Configuration: {config_loaded}")
-    
     web.run_app(app, host="0.0.0.0", port=port)
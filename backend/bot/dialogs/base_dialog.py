@@ -1,5 +1,4 @@
-import time
-from botbuilder.dialogs import ComponentDialog, DialogSet, DialogTurnStatus, DialogTurnResult
+from botbuilder.dialogs import ComponentDialog, DialogSet, DialogTurnStatus, DialogTurnResult, WaterfallDialog
 from botbuilder.core import TurnContext
 from botbuilder.schema import Activity
 import uuid
@@ -7,12 +6,19 @@ import requests
 from urllib.parse import urlencode
 from azure.ai.textanalytics import TextAnalyticsClient
 from azure.core.credentials import AzureKeyCredential
-from azure.appconfiguration import AzureAppConfigurationClient
+from azure.core.exceptions import HttpResponseError
 import os
 import logging
-from dotenv import load_dotenv
-from openai import OpenAI
 from backend.bot.state.user_state import UserState
+from backend.bot.services.deadline import DeadlineExceeded, call_timeout
+from backend.bot.services import resilience, rate_limit, batching, metrics, profiler, recorder
+from backend.bot.services.resilience import CircuitOpenError
+from backend.bot.services.rate_limit import RateLimitExceeded
+from backend.bot.services.llm_router import get_router
+from backend.common import configuration, tracing
+from collections import OrderedDict
+from functools import partial
+import threading
 from typing import Optional, List
 
 LANGUAGE_CODE_MAP = {
@@ -22,6 +28,123 @@ LANGUAGE_CODE_MAP = {
     "portuguese": "pt"
 }
 
+# Templated replies used when the AI can't answer before the turn deadline or is unavailable
+FALLBACK_REPLIES = {
+    "en": "Sorry, could you say that again?",
+    "es": "Perdón, ¿puede repetirlo?",
+    "fr": "Pardon, pouvez-vous répéter ?",
+    "pt": "Desculpe, pode repetir?"
+}
+
+# Default client timeouts in seconds, capped by whatever is left of the turn
+AI_TIMEOUT = 15
+TRANSLATOR_TIMEOUT = 10
+TEXT_ANALYTICS_TIMEOUT = 10
+
+# Errors that mean a call was skipped or abandoned and a fallback should be used
+SKIPPED_CALL_ERRORS = (DeadlineExceeded, CircuitOpenError, RateLimitExceeded)
+
+# Most documents each service accepts in one request
+TRANSLATOR_BATCH_SIZE = 100
+TEXT_ANALYTICS_BATCH_SIZES = {
+    "analyze_sentiment": 10,
+    "recognize_entities": 5,
+    "detect_language": 100
+}
+
+# Translations shared by all dialogs, keyed by (target language, text)
+TRANSLATION_CACHE_SIZE = 1024
+_translation_cache = OrderedDict()
+
+_text_analytics_client = None
+_text_analytics_lock = threading.Lock()
+
+# Translator connections are pooled and kept alive between calls
+_translator_session = requests.Session()
+
+def _get_text_analytics_client():
+    """Return the Text Analytics client shared by all dialogs, creating it on first use."""
+    global _text_analytics_client
+    if _text_analytics_client is None:
+        with _text_analytics_lock:
+            if _text_analytics_client is None:
+                _text_analytics_client = TextAnalyticsClient(
+                    endpoint=os.getenv("TEXT_ANALYTICS_ENDPOINT"),
+                    credential=AzureKeyCredential(os.getenv("TEXT_ANALYTICS_KEY")),
+                    retry_total=0  # Retries go through the shared retry budget instead
+                )
+    return _text_analytics_client
+
+def _post_translation(url, headers, body, timeout):
+    """POST to the Translator API, raising for HTTP errors so they count against its breaker."""
+    response = _translator_session.post(url, headers=headers, json=body, timeout=timeout)
+    response.raise_for_status()
+    return response.json()
+
+async def _send_translations(target_language, texts):
+    """Translate a batch of texts into one language with a single Translator request."""
+    url = f"{os.getenv('TRANSLATOR_ENDPOINT')}/translate?{urlencode({'api-version': '3.0', 'to': target_language})}"
+    headers = {
+        'Ocp-Apim-Subscription-Key': os.getenv("TRANSLATOR_KEY"),
+        'Ocp-Apim-Subscription-Region': os.getenv("TRANSLATOR_LOCATION"),
+        'Content-type': 'application/json',
+        'X-ClientTraceId': str(uuid.uuid4())
+    }
+    translations = await resilience.call_service(
+        resilience.TRANSLATOR,
+        _post_translation, url, headers, [{'text': text} for text in texts],
+        timeout=TRANSLATOR_TIMEOUT,
+        limiter=rate_limit.get_limiter(resilience.TRANSLATOR, os.getenv("TRANSLATOR_KEY"))
+    )
+    return [item['translations'][0]['text'] if item.get('translations') else None for item in translations]
+
+async def _send_text_analytics(operation, texts):
+    """Run one Text Analytics operation on a batch of texts, returning results in the same order."""
+    client = _get_text_analytics_client()
+    return await resilience.call_service(
+        resilience.TEXT_ANALYTICS,
+        getattr(client, operation),
+        documents=[{"id": str(i), "text": text} for i, text in enumerate(texts)],
+        read_timeout=TEXT_ANALYTICS_TIMEOUT,
+        limiter=rate_limit.get_limiter(resilience.TEXT_ANALYTICS, os.getenv("TEXT_ANALYTICS_KEY"))
+    )
+
+def _cache_translation(target_language, text, translated):
+    _translation_cache[(target_language, text)] = translated
+    if len(_translation_cache) > TRANSLATION_CACHE_SIZE:
+        _translation_cache.popitem(last=False)
+
+async def prime_translation_cache(target_language, texts):
+    """Translate texts ahead of time so translate_text answers them from the cache; returns how many were sent."""
+    missing = [text for text in dict.fromkeys(texts) if (target_language, text) not in _translation_cache]
+    for start in range(0, len(missing), TRANSLATOR_BATCH_SIZE):
+        chunk = missing[start:start + TRANSLATOR_BATCH_SIZE]
+        for text, translated in zip(chunk, await _send_translations(target_language, chunk)):
+            if translated:
+                _cache_translation(target_language, text, translated)
+    return len(missing)
+
+def warm_translator(timeout):
+    """Open a pooled connection to the Translator; any HTTP answer will do."""
+    _translator_session.get(
+        f"{os.getenv('TRANSLATOR_ENDPOINT')}/languages", params={'api-version': '3.0', 'scope': 'translation'},
+        timeout=timeout
+    )
+
+def warm_text_analytics(timeout):
+    """Build the Text Analytics client and open a pooled connection with one tiny request."""
+    try:
+        _get_text_analytics_client().detect_language(["Hello"], read_timeout=timeout, connection_timeout=timeout)
+    except HttpResponseError:
+        pass
+
+def _text_analytics_batcher(operation):
+    return batching.get_batcher(
+        f"text_analytics.{operation}",
+        partial(_send_text_analytics, operation),
+        TEXT_ANALYTICS_BATCH_SIZES[operation]
+    )
+
 class BaseDialog(ComponentDialog):
     """
     Base class for bot dialogues. This class handles:
@@ -41,104 +164,44 @@ class BaseDialog(ComponentDialog):
         
         # Generate a unique conversation ID for KV cache tracking
         self.conversation_id = str(uuid.uuid4())
-        self.logger.info(f"Initialized new conversation with ID: {self.conversation_id}")
+        self.logger.debug("Initialized new conversation with ID: %s", self.conversation_id)
+
+    def add_dialog(self, dialog):
+        """Add a child dialog, instrumenting each of its steps if it is a waterfall."""
+        if isinstance(dialog, WaterfallDialog):
+            dialog._steps = [self._instrument_step(step) for step in dialog._steps]
+        return super().add_dialog(dialog)
+
+    def _instrument_step(self, step):
+        """Wrap a waterfall step with the profiler, a trace span and latency metrics."""
+        step = profiler.profiled_step(self.id, step)
+        step = tracing.traced(f"{self.id}.{step.__name__}")(step)
+        return metrics.timed_step(self.id, step)
 
     def _initialise_configuration(self):
-        """Load required environment variables for API keys and endpoints from Azure App Configuration."""
-        
-        # Load environment variables from .env file
-        load_dotenv()
-        
-        connection_string = os.getenv("AZURE_APP_CONFIG_CONNECTION_STRING")
-        if not connection_string:
-            self.logger.warning("Azure App Configuration connection string not set. Using local environment variables.")
-            return
-            
-        try:
-            # Connect to Azure App Configuration
-            self.logger.info("Connecting to Azure App Configuration...")
-            
-            # Check if the required variables already exist in the environment
-            # If they do, we can skip loading from Azure App Configuration
-            required_vars = [
-                "TRANSLATOR_KEY",
-                "TRANSLATOR_ENDPOINT",
-                "TRANSLATOR_LOCATION",
-                "TEXT_ANALYTICS_KEY",
-                "TEXT_ANALYTICS_ENDPOINT",
-                "AI_API_KEY",
-                "AI_ENDPOINT"
-            ]
-            
-            missing_vars = [var for var in required_vars if not os.getenv(var)]
-            
-            # If all variables are present in environment, skip Azure App Configuration
-            if not missing_vars:
-                self.logger.info("All required variables already in environment, skipping Azure App Configuration")
-                return
-                
-            # Otherwise, load only missing variables from Azure App Configuration
-            app_config_client = AzureAppConfigurationClient.from_connection_string(connection_string)
-
-            # Fetch each missing variable from Azure App Configuration with retry
-            for var_name in missing_vars:
-                max_retries = 3
-                retry_count = 0
-                retry_delay = 1  # Start with 1 second delay
-                
-                while retry_count < max_retries:
-                    try:
-                        setting = app_config_client.get_configuration_setting(key=var_name)
-                        value = setting.value
-                        os.environ[var_name] = value  # Set the variable as an environment variable
-                        print(f"Loaded {var_name} from Azure App Configuration.")
-                        break  # Successfully loaded, exit retry loop
-                    except Exception as e:
-                        # Check if it's a rate limit error
-                        if "429" in str(e) or "rate limit" in str(e).lower():
-                            retry_count += 1
-                            if retry_count < max_retries:
-                                self.logger.warning(f"Rate limit hit for {var_name}, retrying in {retry_delay}s (attempt {retry_count}/{max_retries})")
-                                time.sleep(retry_delay)
-                                retry_delay *= 2  # Exponential backoff
-                            else:
-                                self.logger.error(f"Failed to load {var_name} after {max_retries} attempts")
-                                # Continue with next variable instead of raising exception
-                                break
-                        else:
-                            # Not a rate limit error
-                            self.logger.error(f"Failed to fetch {var_name} from Azure App Configuration: {e}")
-                            break
-        except Exception as e:
-            self.logger.error(f"Error initializing configuration: {e}")
-            # Continue anyway - we'll use whatever environment variables are available
-            pass
+        """Make sure the settings refresh thread is running; never waits, the warm-up did that."""
+        configuration.start(timeout=0)
 
     def _initialise_clients(self):
-        """Initialise Azure service clients for text analytics."""
+        """Attach the shared Azure client for text analytics."""
         try:            
-            self.text_analytics_client = TextAnalyticsClient(
-                endpoint=os.getenv("TEXT_ANALYTICS_ENDPOINT"),
-                credential=AzureKeyCredential(os.getenv("TEXT_ANALYTICS_KEY"))
-            )
+            self.text_analytics_client = _get_text_analytics_client()
 
-            self.logger.info("Successfully initialised Azure clients")
+            self.logger.debug("Successfully initialised Azure clients")
         except Exception as e:
             raise RuntimeError(f"Failed to initialise Azure clients: {e}")
         
     def _initialise_ai(self):
-        """Initialise the OpenAI instance."""
+        """Attach the shared AI router, which spreads calls across the configured endpoints."""
         try:
-            self.client = OpenAI(
-                api_key=os.getenv("AI_API_KEY"),
-                base_url=os.getenv("AI_ENDPOINT")
-            )
-            self.logger.info("OpenAI initialised successfully")
+            self.client = get_router()
+            self.logger.debug("AI router initialised successfully")
 
         except Exception as e:
-            self.logger.error(f"Failed to initialise OpenAI: {e}")
+            self.logger.error(f"Failed to initialise AI router: {e}")
             raise
         
+    @recorder.recorded(metrics.LLM)
     async def chatbot_respond(self, turn_context: TurnContext, user_input, system_message, temperature=0.5):
         """Generate an AI response to the user input.""" 
         language = self.user_state.get_language()
@@ -163,47 +226,56 @@ class BaseDialog(ComponentDialog):
         
         if not user_input:
             user_input = "fallback"
-        try:
-            # Get conversation history from user state
-            conversation_history = self.user_state.get_conversation_history()
+        with metrics.track_call(metrics.LLM) as call:
+            try:
+                # Get conversation history from user state
+                conversation_history = self.user_state.get_conversation_history()
             
-            # Build messages array with system message, conversation history, and current user input
-            messages = [
-                {"role": "system", "content": combined_system_message}
-            ]
+                # Build messages array with system message, conversation history, and current user input
+                messages = [
+                    {"role": "system", "content": combined_system_message}
+                ]
             
-            # Add conversation history to provide context
-            for message in conversation_history[-12:]:  # Include last 12 messages for context
-                messages.append(message)
+                # Add conversation history to provide context
+                for message in conversation_history[-12:]:  # Include last 12 messages for context
+                    messages.append(message)
                 
-            # Add current user message
-            messages.append({"role": "user", "content": str(user_input)})
+                # Add current user message
+                messages.append({"role": "user", "content": str(user_input)})
             
-            # Get the conversation ID from the user state
-            conversation_id = self.user_state.get_conversation_id()
+                # Get the conversation ID from the user state
+                conversation_id = self.user_state.get_conversation_id()
             
-            response = self.client.chat.completions.create(
-                model="deepseek-chat",
-                messages=messages,
-                temperature=temperature,  # Now using the parameter instead of hardcoded 0.5
-                max_tokens=150,
-                user=conversation_id  # Use conversation_id to maintain context across calls
-            )
+                response = await resilience.call_service(
+                    resilience.LLM,
+                    self.client.create,
+                    model="deepseek-chat",
+                    messages=messages,
+                    temperature=temperature,  # Now using the parameter instead of hardcoded 0.5
+                    max_tokens=150,
+                    user=conversation_id,  # Use conversation_id to maintain context across calls
+                    timeout=call_timeout(AI_TIMEOUT)
+                )
             
-            bot_response = response.choices[0].message.content
+                bot_response = response.choices[0].message.content
             
-            # Add the messages to the conversation history
-            conversation_history.append({"role": "user", "content": str(user_input)})
-            conversation_history.append({"role": "assistant", "content": bot_response})
+                # Add the messages to the conversation history
+                conversation_history.append({"role": "user", "content": str(user_input)})
+                conversation_history.append({"role": "assistant", "content": bot_response})
             
-            # Update the conversation history in the user state
-            self.user_state.set_conversation_history(conversation_history)
+                # Update the conversation history in the user state
+                self.user_state.set_conversation_history(conversation_history)
             
-            return bot_response
+                return bot_response
             
-        except Exception as e:
-            self.logger.error(f"OpenAI API error: {str(e)}")
-            return "I apologise, but I encountered an error. Please try again."
+            except SKIPPED_CALL_ERRORS as e:
+                call.fallback(e)
+                self.logger.warning(f"Using fallback reply: {e}")
+                return FALLBACK_REPLIES.get(LANGUAGE_CODE_MAP.get(str(language).lower(), "en"), FALLBACK_REPLIES["en"])
+            except Exception as e:
+                call.error(e)
+                self.logger.error(f"OpenAI API error: {str(e)}")
+                return "I apologise, but I encountered an error. Please try again."
         
     async def check_spelling_grammar(self, text: str) -> str:
         """Check spelling and grammar using Azure Translator service."""
@@ -221,7 +293,7 @@ class BaseDialog(ComponentDialog):
         if not text:
             raise ValueError("No text provided for grammar check")
         
-        detect_language = self.detect_language(text)
+        detect_language = await self.detect_language(text)
 
         language = LANGUAGE_CODE_MAP.get(language.lower(), "en")
         if detect_language != language:
@@ -241,7 +313,8 @@ class BaseDialog(ComponentDialog):
 
         return response        
 
-    def translate_text(self, text: str, target_language: Optional[str] = None) -> str:
+    @recorder.recorded(metrics.TRANSLATE)
+    async def translate_text(self, text: str, target_language: Optional[str] = None) -> str:
         """Translate text using Azure Translator service."""
 
         lang_name = self.user_state.get_language()
@@ -253,61 +326,93 @@ class BaseDialog(ComponentDialog):
         if not text:
             raise ValueError("No text provided for translation")
 
-        url = f"{os.getenv('TRANSLATOR_ENDPOINT')}/translate?{urlencode({'api-version': '3.0', 'to': target_language})}"
-        headers = {
-            'Ocp-Apim-Subscription-Key': os.getenv("TRANSLATOR_KEY"),
-            'Ocp-Apim-Subscription-Region': os.getenv("TRANSLATOR_LOCATION"),
-            'Content-type': 'application/json',
-            'X-ClientTraceId': str(uuid.uuid4())
-        }
+        cache_key = (target_language, text)
+        if cache_key in _translation_cache:
+            _translation_cache.move_to_end(cache_key)
+            return _translation_cache[cache_key]
 
-        try:
-            response = requests.post(url, headers=headers, json=[{'text': text}])
-            response.raise_for_status()
-            translations = response.json()
-            if not translations or not translations[0].get('translations'):
-                return "Translation unavailable."
-            return translations[0]['translations'][0]['text']
-        except requests.exceptions.RequestException as e:
-            raise ValueError(f"Translation request failed: {str(e)}")
-
-    def entity_extraction(self, text: str, categories: Optional[List[str]] = None) -> str:
+        # Concurrent turns translating into the same language share one request
+        batcher = batching.get_batcher(
+            f"translator.{target_language}",
+            partial(_send_translations, target_language),
+            TRANSLATOR_BATCH_SIZE
+        )
+
+        with metrics.track_call(metrics.TRANSLATE) as call:
+            try:
+                translated = await batcher.submit(text)
+                if not translated:
+                    return "Translation unavailable."
+            except SKIPPED_CALL_ERRORS + (requests.exceptions.Timeout,) as e:
+                # Untranslated text is better than no reply at all
+                call.fallback(e)
+                self.logger.warning(f"Translation skipped, returning original text: {e}")
+                return text
+            except requests.exceptions.RequestException as e:
+                raise ValueError(f"Translation request failed: {str(e)}")
+
+            _cache_translation(target_language, text, translated)
+            return translated
+
+    @recorder.recorded(metrics.ENTITIES)
+    async def entity_extraction(self, text: str, categories: Optional[List[str]] = None) -> str:
         """Extract specific categories of entities from text using Azure Text Analytics."""
-        try:
-            response = self.text_analytics_client.recognize_entities(documents=[{"id": "1", "text": text}])[0]
-            result = ""
+        with metrics.track_call(metrics.ENTITIES) as call:
+            try:
+                response = await _text_analytics_batcher("recognize_entities").submit(text)
+                result = ""
 
-            for entity in response.entities:
-                if categories is None or entity.category in categories:
-                    result += entity.text + ", "
+                for entity in response.entities:
+                    if categories is None or entity.category in categories:
+                        result += entity.text + ", "
 
-            return result[:-2] if result else "No entities found."
+                return result[:-2] if result else "No entities found."
         
-        except Exception as e:
-            self.logger.error(f"Entity extraction failed: {e}")
-            return "Entity recognition failed."
+            except SKIPPED_CALL_ERRORS as e:
+                call.fallback(e)
+                self.logger.warning(f"Entity extraction skipped: {e}")
+                return "Entity recognition failed."
+            except Exception as e:
+                call.error(e)
+                self.logger.error(f"Entity extraction failed: {e}")
+                return "Entity recognition failed."
     
     
-    def analyse_sentiment(self, text: str) -> str:
+    @recorder.recorded(metrics.SENTIMENT)
+    async def analyse_sentiment(self, text: str) -> str:
         """Analyse sentiment of the given text using Azure Text Analytics."""
-        try:
-            response = self.text_analytics_client.analyze_sentiment(documents=[{"id": "1", "text": text}])[0]
+        with metrics.track_call(metrics.SENTIMENT) as call:
+            try:
+                response = await _text_analytics_batcher("analyze_sentiment").submit(text)
 
-            return response.sentiment
-        except Exception as e:
-            self.logger.error(f"Sentiment analysis failed: {e}")
-            return "Sentiment analysis failed."
+                return response.sentiment
+            except SKIPPED_CALL_ERRORS as e:
+                call.fallback(e)
+                self.logger.warning(f"Sentiment analysis skipped: {e}")
+                return "neutral"
+            except Exception as e:
+                call.error(e)
+                self.logger.error(f"Sentiment analysis failed: {e}")
+                return "Sentiment analysis failed."
             
     def update_user_streak(self):
         """Updates the user's streak for completing scenarios."""
         self.user_state.update_streak()
 
-    def detect_language(self, text: str) -> str:
+    @recorder.recorded(metrics.LANGUAGE_DETECTION)
+    async def detect_language(self, text: str) -> str:
         """Detect the language of the given text using Azure Text Analytics."""
         if not text.strip():
             return "No text provided for language detection."
-        response = self.text_analytics_client.detect_language(documents=[{"id": "1", "text": text}])[0]
-        return response.primary_language.iso6391_name
+        with metrics.track_call(metrics.LANGUAGE_DETECTION) as call:
+            try:
+                response = await _text_analytics_batcher("detect_language").submit(text)
+            except SKIPPED_CALL_ERRORS as e:
+                # Assume the user wrote in the language they are practising
+                call.fallback(e)
+                self.logger.warning(f"Language detection skipped: {e}")
+                return LANGUAGE_CODE_MAP.get(self.user_state.get_language().lower(), "en")
+            return response.primary_language.iso6391_name
 
     async def run(self, turn_context: TurnContext, accessor):
         """
@@ -342,8 +447,8 @@ class BaseDialog(ComponentDialog):
             from botbuilder.dialogs import DialogTurnResult, DialogTurnStatus
             return DialogTurnResult(DialogTurnStatus.Cancelled)
         
-    def get_fallback(self):
-        return self.translate_text("I didn't catch that. Could you repeat it?", self.language)
+    async def get_fallback(self):
+        return await self.translate_text("I didn't catch that. Could you repeat it?", self.language)
 
     def reset_conversation(self):
         """Reset the conversation by generating a new conversation ID."""
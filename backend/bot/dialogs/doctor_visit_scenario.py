@@ -64,7 +64,7 @@ class DoctorVisitScenarioDialog(BaseDialog):
         )
         
         guidance = "Greet the receptionist and explain that you have a sunburn."
-        example = self.translate_text(
+        example = await self.translate_text(
             "Example: Good morning. My name is Alex. I'm here because I have a bad sunburn.", 
             self.language
         )
@@ -103,7 +103,7 @@ class DoctorVisitScenarioDialog(BaseDialog):
         await step_context.context.send_activity(MessageFactory.text(doctor_greeting))
         
         guidance = "Greet the doctor and explain where your sunburn is and how it feels."
-        example = self.translate_text(
+        example = await self.translate_text(
             "Example: Hello doctor. I got a bad sunburn on my shoulders and back yesterday at the beach. It's very red and painful.", 
             self.language
         )
@@ -139,7 +139,7 @@ class DoctorVisitScenarioDialog(BaseDialog):
         await step_context.context.send_activity(MessageFactory.text(follow_up))
         
         guidance = "Answer the doctor's questions about your sunburn."
-        example = self.translate_text(
+        example = await self.translate_text(
             "Example: I got the sunburn yesterday afternoon. I haven't applied anything to it yet. I don't have a fever, but the area feels hot and tight.", 
             self.language
         )
@@ -182,7 +182,7 @@ class DoctorVisitScenarioDialog(BaseDialog):
         await step_context.context.send_activity(MessageFactory.text(diagnosis_response))
         
         guidance = "Ask the doctor what you should do for your sunburn."
-        example = self.translate_text(
+        example = await self.translate_text(
             "Example: What should I do to treat it? Is there anything I should avoid?", 
             self.language
         )
@@ -227,7 +227,7 @@ class DoctorVisitScenarioDialog(BaseDialog):
         await step_context.context.send_activity(MessageFactory.text(treatment_response))
         
         guidance = "Tell the doctor you understand and thank them for their help."
-        example = self.translate_text(
+        example = await self.translate_text(
             "Example: I understand. Thank you for your help, doctor. I'll follow your advice.", 
             self.language
         )
@@ -257,7 +257,7 @@ class DoctorVisitScenarioDialog(BaseDialog):
             self.understood_treatment = True
             step_context.values["understood_treatment"] = True
             
-        sentiment = self.analyse_sentiment(user_input)
+        sentiment = await self.analyse_sentiment(user_input)
         ai_thanks = await self.chatbot_respond(
             step_context.context,
             user_input,
@@ -281,6 +281,7 @@ class DoctorVisitScenarioDialog(BaseDialog):
         # Calculate score
         self.score = self.calculate_score(step_context)
         self.user_state.update_xp(self.score)
+        self.user_state.record_scenario_completed("doctor", self.score)
         
         await step_context.context.send_activity(MessageFactory.text("Your doctor visit is now complete. Let's see how you did!"))
         
@@ -310,7 +311,7 @@ class DoctorVisitScenarioDialog(BaseDialog):
         """Completes the doctor visit scenario dialog."""
         thank_you = "Thank you for completing the Doctor Visit scenario!"
         await step_context.context.send_activity(MessageFactory.text(thank_you))
-        await step_context.context.send_activity(MessageFactory.text(self.translate_text(thank_you, self.language)))
+        await step_context.context.send_activity(MessageFactory.text(await self.translate_text(thank_you, self.language)))
         
         return await step_context.end_dialog(result=True)
         
@@ -76,7 +76,7 @@ class HotelScenarioDialog(BaseDialog):
         )
         
         guidance = "Respond as if you're a guest inquiring about booking a room."
-        example = self.translate_text(
+        example = await self.translate_text(
             "Example: Hello! I'd like to book a room.", 
             self.language
         )
@@ -102,7 +102,7 @@ class HotelScenarioDialog(BaseDialog):
         )
         
         guidance = "The receptionist is asking about your stay duration. Tell them how many nights you'd like to stay."
-        example = self.translate_text(
+        example = await self.translate_text(
             "Example: I'd like to stay for three nights, please.", 
             self.language
         )
@@ -147,7 +147,7 @@ class HotelScenarioDialog(BaseDialog):
         )
         
         guidance = "The receptionist is asking about room preferences. Tell them what type of room you'd like."
-        example = self.translate_text(
+        example = await self.translate_text(
             "Example: I'd like a deluxe room with a king-sized bed, please.", 
             self.language
         )
@@ -178,7 +178,7 @@ class HotelScenarioDialog(BaseDialog):
         )
         
         guidance = "The receptionist wants to know how many people will be staying in the room."
-        example = self.translate_text(
+        example = await self.translate_text(
             "Example: There will be two adults and one child.", 
             self.language
         )
@@ -215,7 +215,7 @@ class HotelScenarioDialog(BaseDialog):
         )
         
         guidance = "The receptionist is asking if you have any special requests. Mention any preferences or needs you might have."
-        example = self.translate_text(
+        example = await self.translate_text(
             "Example: I'd like a room on a higher floor with a good view, please.", 
             self.language
         )
@@ -260,7 +260,7 @@ class HotelScenarioDialog(BaseDialog):
         await step_context.context.send_activity(MessageFactory.text(feedback))
         
         # Analyze sentiment to check if user is happy with the booking
-        sentiment = self.analyse_sentiment(user_input)
+        sentiment = await self.analyse_sentiment(user_input)
         
         # Get AI to determine if the user is confirming or has issues
         ai_intent = await self.chatbot_respond(
@@ -288,7 +288,7 @@ class HotelScenarioDialog(BaseDialog):
             await step_context.context.send_activity(MessageFactory.text(concern_handling))
             return await step_context.prompt(
                 TextPrompt.__name__,
-                PromptOptions(prompt=MessageFactory.text(self.translate_text("Would you like to proceed with the booking?")))
+                PromptOptions(prompt=MessageFactory.text(await self.translate_text("Would you like to proceed with the booking?")))
             )
         
         # Continue with payment if confirmed
@@ -299,7 +299,7 @@ class HotelScenarioDialog(BaseDialog):
         )
         
         guidance = "The receptionist is asking about payment method. Tell them how you'd like to pay."
-        example = self.translate_text(
+        example = await self.translate_text(
             "Example: I'd like to pay with my credit card.", 
             self.language
         )
@@ -377,6 +377,7 @@ class HotelScenarioDialog(BaseDialog):
         # Calculate score before moving to feedback
         self.score = self.calculate_score(step_context)
         self.user_state.update_xp(self.score)
+        self.user_state.record_scenario_completed("hotel", self.score)
         
         # Update user streak
         self.update_user_streak()
@@ -415,7 +416,7 @@ class HotelScenarioDialog(BaseDialog):
         """Completes the hotel scenario dialog."""
         thank_you = "Thank you for completing the Hotel Booking scenario!"
         await step_context.context.send_activity(MessageFactory.text(thank_you))
-        await step_context.context.send_activity(MessageFactory.text(self.translate_text(thank_you, self.language)))
+        await step_context.context.send_activity(MessageFactory.text(await self.translate_text(thank_you, self.language)))
         
         return await step_context.end_dialog(result=True)
     
@@ -72,7 +72,7 @@ class JobInterviewScenarioDialog(BaseDialog):
         )
         
         example = "Example: 'Good morning! I'm [Your Name], and I have [X years] of experience in customer service. My background includes...' (Feel free to create a professional persona for this practice)"
-        await step_context.context.send_activity(self.translate_text(example, self.language))
+        await step_context.context.send_activity(await self.translate_text(example, self.language))
         
         return await step_context.prompt(TextPrompt.__name__, PromptOptions(prompt=MessageFactory.text(prompt)))
 
@@ -99,7 +99,7 @@ class JobInterviewScenarioDialog(BaseDialog):
         
         # More helpful guidance with structure
         tips = "Response Tips:\n- Mention 1-2 specific roles where you handled customer service\n- Describe key responsibilities using action verbs\n- Share a brief achievement that shows your skills\n- Keep your answer to 3-5 sentences"
-        await step_context.context.send_activity(self.translate_text(tips, self.language))
+        await step_context.context.send_activity(await self.translate_text(tips, self.language))
         
         return await step_context.prompt(TextPrompt.__name__, PromptOptions(prompt=MessageFactory.text(prompt)))
 
@@ -116,7 +116,7 @@ class JobInterviewScenarioDialog(BaseDialog):
             step_context.result,
             f"{self.interviewer_persona} Ask the candidate to describe their key skills and how they align with the role."
         )
-        await step_context.context.send_activity(self.translate_text("Example: I have strong communication and problem-solving skills which help me handle customer issues effectively.", self.language))
+        await step_context.context.send_activity(await self.translate_text("Example: I have strong communication and problem-solving skills which help me handle customer issues effectively.", self.language))
         return await step_context.prompt(TextPrompt.__name__, PromptOptions(prompt=MessageFactory.text(prompt)))
 
     async def motivation_step(self, step_context: WaterfallStepContext) -> DialogTurnResult:
@@ -202,6 +202,7 @@ class JobInterviewScenarioDialog(BaseDialog):
         
         self.score = await self.calculate_score(step_context.result)
         self.user_state.update_score(self.score)
+        self.user_state.record_scenario_completed("interview", self.score)
         
         feedback = self.generate_feedback()
         await step_context.context.send_activity(feedback)
@@ -209,7 +210,7 @@ class JobInterviewScenarioDialog(BaseDialog):
 
     async def feedback_step(self, step_context: WaterfallStepContext) -> DialogTurnResult:
         message = f"You completed the job interview scenario. Your score: {self.score}/100"
-        translated_message = self.translate_text(message, self.language)
+        translated_message = await self.translate_text(message, self.language)
         
         await step_context.context.send_activity(message)
         await step_context.context.send_activity(translated_message)
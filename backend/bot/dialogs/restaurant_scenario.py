@@ -68,7 +68,7 @@ class RestaurantScenarioDialog(BaseDialog):
         )
         
         guidance = "Respond to the waiter with a greeting and ask about the menu or specials."
-        example = self.translate_text(
+        example = await self.translate_text(
             "Example: Hello! Could you tell me what today's specials are?", 
             self.language
         )
@@ -101,7 +101,7 @@ class RestaurantScenarioDialog(BaseDialog):
         
         await step_context.context.send_activity(MessageFactory.text(menu_response))
         guidance = "Tell the waiter what food you would like to order."
-        example = self.translate_text(
+        example = await self.translate_text(
             "Example: I'd like to order the pasta, please.", 
             self.language
         )
@@ -132,7 +132,7 @@ class RestaurantScenarioDialog(BaseDialog):
         )
         
         guidance = "Tell the waiter what you would like to drink."
-        example = self.translate_text(
+        example = await self.translate_text(
             "Example: I'd like a glass of orange juice, please.", 
             self.language
         )
@@ -166,7 +166,7 @@ class RestaurantScenarioDialog(BaseDialog):
         )
         
         guidance = "Tell the waiter if you want dessert or if you'd like the bill."
-        example = self.translate_text(
+        example = await self.translate_text(
             "Example: No dessert for me, thank you. Could I have the bill please?", 
             self.language
         )
@@ -187,7 +187,7 @@ class RestaurantScenarioDialog(BaseDialog):
         feedback = await self.check_spelling_grammar(user_input)
         await step_context.context.send_activity(MessageFactory.text(feedback))
 
-        sentiment = self.analyse_sentiment(user_input)
+        sentiment = await self.analyse_sentiment(user_input)
         
         ai_intent = await self.chatbot_respond(
             step_context.context,
@@ -221,7 +221,7 @@ class RestaurantScenarioDialog(BaseDialog):
 
         # Payment guidance
         guidance = "Tell the waiter how you want to pay (cash or card)."
-        example = self.translate_text("Example: I'll pay by credit card, please.", self.language)
+        example = await self.translate_text("Example: I'll pay by credit card, please.", self.language)
 
         await step_context.context.send_activity(MessageFactory.text(guidance))
         await step_context.context.send_activity(MessageFactory.text(example))
@@ -254,6 +254,7 @@ class RestaurantScenarioDialog(BaseDialog):
         # Calculate score
         self.score = self.calculate_score(step_context)
         self.user_state.update_xp(self.score)
+        self.user_state.record_scenario_completed("restaurant", self.score)
         
         await step_context.context.send_activity(MessageFactory.text("Your restaurant conversation is now complete. Let's see how you did!"))
         return await step_context.next(None)
@@ -287,7 +288,7 @@ class RestaurantScenarioDialog(BaseDialog):
         """Completes the restaurant scenario dialog."""
         thank_you = "Thank you for completing the Restaurant scenario!"
         await step_context.context.send_activity(MessageFactory.text(thank_you))
-        await step_context.context.send_activity(MessageFactory.text(self.translate_text(thank_you, self.language)))
+        await step_context.context.send_activity(MessageFactory.text(await self.translate_text(thank_you, self.language)))
         
         return await step_context.end_dialog(result=True)
 
@@ -64,7 +64,7 @@ class ShoppingScenarioDialog(BaseDialog):
         )
         
         guidance = "Greet the clerk and ask about what's available in the store."
-        example = self.translate_text(
+        example = await self.translate_text(
             "Example: Hello! Can you tell me what items are popular today?", 
             self.language
         )
@@ -99,7 +99,7 @@ class ShoppingScenarioDialog(BaseDialog):
         await step_context.context.send_activity(MessageFactory.text(products_response))
         
         guidance = "Ask about a specific item you're interested in."
-        example = self.translate_text(
+        example = await self.translate_text(
             "Example: Those sunglasses look nice. Can I see them?", 
             self.language
         )
@@ -135,7 +135,7 @@ class ShoppingScenarioDialog(BaseDialog):
         await step_context.context.send_activity(MessageFactory.text(item_response))
         
         guidance = "Ask how much the item costs."
-        example = self.translate_text(
+        example = await self.translate_text(
             "Example: How much does this cost?", 
             self.language
         )
@@ -171,7 +171,7 @@ class ShoppingScenarioDialog(BaseDialog):
         await step_context.context.send_activity(MessageFactory.text(price_response))
         
         guidance = "Decide if you want to buy the item or not."
-        example = self.translate_text(
+        example = await self.translate_text(
             "Example: Yes, I'll take it. I'll pay with my credit card.", 
             self.language
         )
@@ -192,7 +192,7 @@ class ShoppingScenarioDialog(BaseDialog):
         feedback = await self.check_spelling_grammar(user_input)
         await step_context.context.send_activity(MessageFactory.text(feedback))
         
-        intent = self.analyse_sentiment(user_input)
+        intent = await self.analyse_sentiment(user_input)
         
         ai_intent = await self.chatbot_respond(
             step_context.context,
@@ -223,7 +223,7 @@ class ShoppingScenarioDialog(BaseDialog):
         
         # Final response from customer
         guidance = "Thank the clerk before leaving the store."
-        example = self.translate_text(
+        example = await self.translate_text(
             "Example: Thank you for your help. Have a nice day!", 
             self.language
         )
@@ -256,6 +256,7 @@ class ShoppingScenarioDialog(BaseDialog):
         # Calculate score
         self.score = self.calculate_score(step_context)
         self.user_state.update_xp(self.score)
+        self.user_state.record_scenario_completed("shopping", self.score)
         
         # Update user streak
         self.update_user_streak()
@@ -293,7 +294,7 @@ class ShoppingScenarioDialog(BaseDialog):
         """Completes the shopping scenario dialog."""
         thank_you = "Thank you for completing the Shopping scenario!"
         await step_context.context.send_activity(MessageFactory.text(thank_you))
-        await step_context.context.send_activity(MessageFactory.text(self.translate_text(thank_you, self.language)))
+        await step_context.context.send_activity(MessageFactory.text(await self.translate_text(thank_you, self.language)))
         
         return await step_context.end_dialog(result=True)
         
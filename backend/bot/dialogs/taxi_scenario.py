@@ -66,9 +66,9 @@ class TaxiScenarioDialog(BaseDialog):
         )
         self.initial_dialog_id = "TaxiScenarioDialog.waterfall"
 
-    def get_fallback(self):
+    async def get_fallback(self):
         """Returns a fallback message when user input is not understood."""
-        return self.translate_text("I didn't catch that. Could you repeat it?", self.language)
+        return await self.translate_text("I didn't catch that. Could you repeat it?", self.language)
     
     def add_to_memory(self, user_message: str, bot_response: str):
         """Add a user message and bot response to memory for context tracking."""
@@ -89,7 +89,7 @@ class TaxiScenarioDialog(BaseDialog):
                 "start",
                 f"Greet the user and ask how they are doing. That is all."
             )
-            example = self.translate_text("Example: Hello! I am good, how are you?", self.language)
+            example = await self.translate_text("Example: Hello! I am good, how are you?", self.language)
             self.greeted = True
             self.greet_success = True
 
@@ -116,7 +116,7 @@ class TaxiScenarioDialog(BaseDialog):
             step_context.result,
             f"{self.taxi_persona} Ask the passenger where they would like to go. Don't mention the price. You have already greeted them."
         )
-        example = self.translate_text("Example: I want to go to the city centre.", self.language)
+        example = await self.translate_text("Example: I want to go to the city centre.", self.language)
         await step_context.context.send_activity(MessageFactory.text(example))
         return await step_context.prompt(TextPrompt.__name__, PromptOptions(prompt=MessageFactory.text(prompt)))
 
@@ -129,7 +129,7 @@ class TaxiScenarioDialog(BaseDialog):
         await step_context.context.send_activity(MessageFactory.text(feedback))
         
         response = step_context.result
-        locations = self.entity_extraction(response, "Location")
+        locations = await self.entity_extraction(response, "Location")
         if locations:
             self.destination = locations[0]
             self.user_gave_destination = True
@@ -146,7 +146,7 @@ class TaxiScenarioDialog(BaseDialog):
             )
             return await step_context.prompt(TextPrompt.__name__, PromptOptions(prompt=MessageFactory.text(prompt)))
         else:
-            await step_context.context.send_activity(MessageFactory.text(self.get_fallback()))
+            await step_context.context.send_activity(MessageFactory.text(await self.get_fallback()))
             self.destination_changed = True
 
             # Add to memory
@@ -173,7 +173,7 @@ class TaxiScenarioDialog(BaseDialog):
             f"{self.taxi_persona} The user said '{step_context.result}'. Did they clearly confirm the destination? Reply ONLY 'yes' or 'no'.",
             temperature=0.1  # Lower temperature for intent detection
         )
-        sentiment = self.analyse_sentiment(step_context.result)
+        sentiment = await self.analyse_sentiment(step_context.result)
         if sentiment == "positive" or ("yes" in ai_intent.lower()):
             self.destination_confirmed = True
             self.destination_changed = False
@@ -222,7 +222,7 @@ class TaxiScenarioDialog(BaseDialog):
             return await step_context.next(None)
 
         response = step_context.result
-        sentiment = self.analyse_sentiment(response)
+        sentiment = await self.analyse_sentiment(response)
             
         ai_intent = await self.chatbot_respond(
             step_context.context,
@@ -274,10 +274,10 @@ class TaxiScenarioDialog(BaseDialog):
             temperature=0.1  # Lower temperature for price extraction
         )
 
-        price = self.entity_extraction(response, "Quantity")
+        price = await self.entity_extraction(response, "Quantity")
         
         if not price:
-            await step_context.context.send_activity(MessageFactory.text(self.get_fallback()))
+            await step_context.context.send_activity(MessageFactory.text(await self.get_fallback()))
             prompt = await self.chatbot_respond(
                 step_context.context,
                 response,
@@ -297,16 +297,16 @@ class TaxiScenarioDialog(BaseDialog):
             self.price = int(price)
             self.user_accepted_price = True
             self.valid_negotiated_price = True
-            await step_context.context.send_activity(MessageFactory.text(self.translate_text("That's a bit too much. I can only accept 20 euros.", self.language)))
+            await step_context.context.send_activity(MessageFactory.text(await self.translate_text("That's a bit too much. I can only accept 20 euros.", self.language)))
             return await step_context.next(None)
         elif int(price) < 15:
             self.price = int(price)
             self.user_accepted_price = True
             self.valid_negotiated_price = True
-            await step_context.context.send_activity(MessageFactory.text(self.translate_text("That's a bit too low. I can only accept up to 15 euros at the lowest.", self.language)))
+            await step_context.context.send_activity(MessageFactory.text(await self.translate_text("That's a bit too low. I can only accept up to 15 euros at the lowest.", self.language)))
             return await step_context.next(None)
         else:
-            await step_context.context.send_activity(MessageFactory.text(self.get_fallback()))
+            await step_context.context.send_activity(MessageFactory.text(await self.get_fallback()))
             prompt = await self.chatbot_respond(
                 step_context.context,
                 response,
@@ -329,6 +329,7 @@ class TaxiScenarioDialog(BaseDialog):
         await step_context.context.send_activity("Step 5 of 5: Feedback")
         self.score = self.calculate_score(step_context)  # Pass step_context to use its values
         self.user_state.update_xp(self.score)
+        self.user_state.record_scenario_completed("taxi", self.score)
         
         await step_context.context.send_activity(self.generate_feedback())
         return await step_context.next(None)
@@ -361,7 +362,7 @@ class TaxiScenarioDialog(BaseDialog):
     async def display_user_score(self, step_context: WaterfallStepContext) -> DialogTurnResult:
         """Displays the user's score and completes the scenario."""
         message = f"You finished the scenario! Your score: {self.score}/100"
-        translated = self.translate_text(message, self.language)
+        translated = await self.translate_text(message, self.language)
 
         # Retrieve memory and display it
         memory = self.get_memory()
@@ -383,9 +384,9 @@ class TaxiScenarioDialog(BaseDialog):
     async def end_taxi_scenario(self, step_context: WaterfallStepContext) -> DialogTurnResult:
         """Concludes the taxi scenario with farewell messages."""
         await step_context.context.send_activity("Thank you for using the taxi scenario!")
-        await step_context.context.send_activity(self.translate_text("Thank you for using the taxi scenario!", self.language))
+        await step_context.context.send_activity(await self.translate_text("Thank you for using the taxi scenario!", self.language))
         await step_context.context.send_activity("Goodbye!")
-        await step_context.context.send_activity(self.translate_text("Goodbye!", self.language))
+        await step_context.context.send_activity(await self.translate_text("Goodbye!", self.language))
         return await step_context.end_dialog(result=True)
 
     def calculate_score(self, step_context: WaterfallStepContext = None) -> int:
@@ -0,0 +1,163 @@
+"""
+Bot server that accepts connections before the bot itself has loaded.
+
+Importing backend.bot.bot_app pulls in botbuilder, msrest, the Azure SDKs and
+OpenAI, and a new deployment's database still has to be bootstrapped. Here
+the port is bound first with a small aiohttp app, and all of that is done by a
+warm-up task in a worker thread, one timed phase at a time (see
+backend/bot/startup.py). Requests that arrive before the warm-up finishes get
+a 503 with Retry-After, and /health reports "starting" with the phases so far.
+A phase that fails, for example because the database is briefly down, is
+retried with backoff up to STARTUP_PHASE_ATTEMPTS times. If it still fails
+the process is marked failed and /live answers 500, so the platform restarts
+it instead of leaving a live process that answers every route with 500.
+After that every route is handed to the handler of the same name in bot_app,
+and /ready waits for the connection and cache warm-up in backend/bot/warmup.py.
+"""
+import asyncio
+import importlib
+import json
+import logging
+import os
+
+from aiohttp import web
+
+from backend.bot import startup
+from backend.logging_config import configure_logging
+
+configure_logging("bot")
+LOGGER = logging.getLogger(__name__)
+
+# Heavy third-party packages, imported first so their cost shows up as its own phase
+SDK_MODULES = (
+    "botbuilder.core",
+    "botbuilder.dialogs",
+    "botbuilder.schema",
+    "openai",
+    "azure.ai.textanalytics",
+    "azure.appconfiguration"
+)
+
+# Attempts per start-up phase before the process gives up and reports itself dead
+STARTUP_PHASE_ATTEMPTS = int(os.getenv("STARTUP_PHASE_ATTEMPTS", "5"))
+STARTUP_MAX_BACKOFF = 30
+
+_bot_app = None
+
+
+def _import_all(names) -> None:
+    for name in names:
+        importlib.import_module(name)
+
+
+def _start_configuration() -> None:
+    from backend.common import configuration
+    configuration.start()
+
+
+def _bootstrap_database() -> None:
+    from backend.common import bootstrap, get_app
+    bootstrap.bootstrap(get_app())
+
+
+async def _run_phase(name: str, func, *args):
+    """Run one phase in a worker thread, retrying it with backoff; raises once the attempts are used up."""
+    backoff = 1.0
+    for attempt in range(1, STARTUP_PHASE_ATTEMPTS + 1):
+        try:
+            with startup.phase(name if attempt == 1 else f"{name} (attempt {attempt})"):
+                return await asyncio.to_thread(func, *args)
+        except Exception as e:
+            if attempt == STARTUP_PHASE_ATTEMPTS:
+                raise
+            LOGGER.warning(f"Start-up phase {name} failed (attempt {attempt} of {STARTUP_PHASE_ATTEMPTS}), "
+                           f"retrying in {backoff:.0f}s: {e}")
+            await asyncio.sleep(backoff)
+            backoff = min(backoff * 2, STARTUP_MAX_BACKOFF)
+
+
+async def warm_up(app: web.Application) -> None:
+    """Load the bot in the background, phase by phase, then mark the process ready."""
+    global _bot_app
+    try:
+        await _run_phase("sdk_imports", _import_all, SDK_MODULES)
+        await _run_phase("configuration", _start_configuration)
+        await _run_phase("database", _bootstrap_database)
+        await _run_phase("dialogs", importlib.import_module, "backend.bot.dialogs.main_dialog")
+        _bot_app = await _run_phase("bot_app", importlib.import_module, "backend.bot.bot_app")
+    except Exception as e:
+        LOGGER.error(f"Bot warm-up failed, the process needs restarting: {e}", exc_info=True)
+        startup.mark_failed(e)
+        return
+    startup.mark_ready()
+    # Connections and caches; /ready stays 503 until this is done. Its steps
+    # fail on their own without making the bot unusable.
+    from backend.bot import warmup
+    with startup.phase("connections_and_caches"):
+        await warmup.run()
+
+
+def _not_ready() -> web.Response:
+    status = 500 if startup.state() == startup.FAILED else 503
+    return web.json_response(
+        {"error": "Bot is starting", "reply": "I'm just getting ready. Please try again in a moment."},
+        status=status,
+        headers={"Retry-After": "1"}
+    )
+
+
+async def live(req: web.Request) -> web.Response:
+    """Liveness probe: constant time, answered while the bot is still loading; 500 once the warm-up has failed."""
+    if startup.state() == startup.FAILED:
+        return web.json_response({"status": "failed", "service": "bot", "startup": startup.snapshot()}, status=500)
+    return web.json_response({"status": "alive", "service": "bot", "startup": startup.state()})
+
+
+async def health(req: web.Request) -> web.Response:
+    if not startup.is_ready():
+        status = 500 if startup.state() == startup.FAILED else 503
+        return web.json_response({"status": startup.state(), "startup": startup.snapshot()},
+                                 status=status, headers={"Retry-After": "1"})
+    response = await _bot_app.health_check(req)
+    body = json.loads(response.text)
+    body["startup"] = startup.snapshot()
+    return web.json_response(body, status=response.status)
+
+
+def delegate(name: str):
+    """Handler that passes requests to bot_app.<name> once the bot has loaded."""
+    async def handler(req: web.Request) -> web.StreamResponse:
+        if not startup.is_ready():
+            return _not_ready()
+        return await getattr(_bot_app, name)(req)
+    handler.__name__ = name
+    return handler
+
+
+async def _start_warm_up(app: web.Application) -> None:
+    # Runs before the port is bound, so only start the task here
+    app["warm_up"] = asyncio.create_task(warm_up(app))
+
+
+async def _stop_warm_up(app: web.Application) -> None:
+    app["warm_up"].cancel()
+
+
+def create_app() -> web.Application:
+    app = web.Application()
+    app.router.add_get("/live", live)
+    app.router.add_get("/health", health)
+    app.router.add_get("/ready", delegate("ready"))
+    app.router.add_get("/metrics", delegate("metrics_endpoint"))
+    app.router.add_get("/debug/slow-turns", delegate("slow_turns"))
+    app.router.add_get("/debug/profile", delegate("sampling_profile"))
+    app.router.add_post("/api/messages", delegate("messages"))
+    app.on_startup.append(_start_warm_up)
+    app.on_cleanup.append(_stop_warm_up)
+    return app
+
+
+if __name__ == "__main__":
+    port = int(os.getenv("PORT", 3978))
+    LOGGER.info(f"Starting bot on port {port}")
+    web.run_app(create_app(), host="0.0.0.0", port=port)
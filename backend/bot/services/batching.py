@@ -0,0 +1,143 @@
+"""
+Cross-request micro-batching for services that accept several documents per call.
+
+Calls made by concurrent turns within a few milliseconds of each other are
+collected and sent as one request, then each result is handed back to the
+coroutine that asked for it. A batch is sent as soon as it reaches the
+service's size limit, or when the oldest call has waited BATCH_MAX_DELAY_MS.
+
+Each waiting turn is still bounded by its own deadline: if it runs out of
+time it stops waiting and uses its fallback, while the batch carries on for
+the other turns in it.
+
+A batch is sent in a span of its own, under the span of a turn waiting on it.
+Its links attribute holds the traceparents of the other turns' spans, and
+each of those spans gets the batch's traceparent, so every turn's trace can
+be followed into the shared request.
+"""
+import asyncio
+import contextvars
+import logging
+import os
+import threading
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from backend.bot.services.deadline import DeadlineExceeded, remaining
+from backend.common import tracing
+
+logger = logging.getLogger(__name__)
+
+BATCHING_ENABLED = os.getenv("BATCHING_ENABLED", "true").lower() == "true"
+BATCH_MAX_DELAY = int(os.getenv("BATCH_MAX_DELAY_MS", "5")) / 1000
+
+
+class MicroBatcher:
+    """Collects single items into batches and sends them with one call."""
+
+    def __init__(self, name: str, send_batch: Callable[[List[Any]], Awaitable[List[Any]]],
+                 max_batch_size: int, max_delay: float = BATCH_MAX_DELAY):
+        self.name = name
+        self.send_batch = send_batch
+        self.max_batch_size = max_batch_size if BATCHING_ENABLED else 1
+        self.max_delay = max_delay
+        self._pending: List[tuple] = []
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self.batches = 0
+        self.items = 0
+        self.largest_batch = 0
+
+    async def submit(self, item: Any) -> Any:
+        """Add an item to the next batch and wait for its result."""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        # Mark errors as retrieved even if the waiting turn has already given up
+        future.add_done_callback(lambda f: f.cancelled() or f.exception())
+        self._pending.append((item, future, tracing.current_span()))
+
+        if len(self._pending) >= self.max_batch_size:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.max_delay, self._flush)
+
+        left = remaining()
+        try:
+            # Shield so one turn giving up doesn't cancel the result for the others
+            return await asyncio.wait_for(asyncio.shield(future), timeout=left)
+        except asyncio.TimeoutError:
+            raise DeadlineExceeded(f"{self.name} batch did not finish before the turn deadline", started=True)
+
+    def _flush(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending = self._pending[:self.max_batch_size], self._pending[self.max_batch_size:]
+        if self._pending:
+            self._timer = asyncio.get_running_loop().call_later(self.max_delay, self._flush)
+        if not batch:
+            return
+        # The batch serves several turns, so it must not inherit one turn's deadline
+        # or trace; _send starts its span from the turns' spans explicitly
+        contextvars.Context().run(asyncio.ensure_future, self._send(batch))
+
+    def _start_span(self, batch: List[tuple]) -> tracing.Span:
+        """A span for the batch, under the first sampled turn waiting on it and linked to the rest."""
+        spans = [span for _, _, span in batch if span is not None]
+        parent = next((span for span in spans if span.sampled), spans[0] if spans else None)
+        links = [span.traceparent for span in spans if span is not parent]
+        return tracing.start_span(f"{self.name}.batch", parent.traceparent if parent else None,
+                                  size=len(batch), links=links)
+
+    async def _send(self, batch: List[tuple]) -> None:
+        items = [item for item, _, _ in batch]
+        self.batches += 1
+        self.items += len(items)
+        self.largest_batch = max(self.largest_batch, len(items))
+        with self._start_span(batch) as span:
+            for _, _, waiting in batch:
+                if waiting is not None:
+                    waiting.set(batch=span.traceparent)
+            try:
+                results = await self.send_batch(items)
+            except Exception as e:
+                span.status = "error"
+                span.set(error=f"{type(e).__name__}: {e}")
+                for _, future, _ in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                return
+        for (_, future, _), result in zip(batch, results):
+            if not future.done():
+                future.set_result(result)
+        for _, future, _ in batch[len(results):]:
+            if not future.done():
+                future.set_exception(RuntimeError(f"{self.name} returned fewer results than documents sent"))
+
+    def snapshot(self) -> dict:
+        return {
+            "batches": self.batches,
+            "items": self.items,
+            "average_batch_size": round(self.items / self.batches, 2) if self.batches else 0,
+            "largest_batch": self.largest_batch,
+            "max_batch_size": self.max_batch_size
+        }
+
+
+_batchers: Dict[str, MicroBatcher] = {}
+_batchers_lock = threading.Lock()
+
+
+def get_batcher(name: str, send_batch: Callable[[List[Any]], Awaitable[List[Any]]], max_batch_size: int) -> MicroBatcher:
+    """Return the batcher with this name, creating it on first use."""
+    batcher = _batchers.get(name)
+    if batcher is None:
+        with _batchers_lock:
+            batcher = _batchers.get(name)
+            if batcher is None:
+                batcher = MicroBatcher(name, send_batch, max_batch_size)
+                _batchers[name] = batcher
+    return batcher
+
+
+def snapshot() -> dict:
+    """Batch counts and sizes for every batcher created so far."""
+    return {name: batcher.snapshot() for name, batcher in list(_batchers.items())}
@@ -0,0 +1,88 @@
+"""
+Per-turn deadline tracking for the bot.
+
+Flask tells the bot how long it is still willing to wait for a reply using the
+X-Turn-Deadline-Ms header. bot_app turns that into an absolute deadline stored
+in a context variable, so every external call made while handling the turn can
+check how much time is left without passing it through each dialog.
+"""
+import asyncio
+import contextvars
+import os
+import time
+from typing import Optional
+
+DEADLINE_HEADER = "X-Turn-Deadline-Ms"
+
+# Budget used when the caller does not send a deadline header
+DEFAULT_TURN_BUDGET_MS = int(os.getenv("TURN_DEFAULT_BUDGET_MS", "12000"))
+# Upper bound so a caller can't ask the bot to work on one turn forever
+MAX_TURN_BUDGET_MS = int(os.getenv("TURN_MAX_BUDGET_MS", "30000"))
+# Calls are not started at all if less than this is left
+MIN_CALL_BUDGET_SECONDS = int(os.getenv("TURN_MIN_CALL_BUDGET_MS", "150")) / 1000
+
+_turn_deadline: contextvars.ContextVar[Optional[float]] = contextvars.ContextVar("turn_deadline", default=None)
+
+
+class DeadlineExceeded(Exception):
+    """Raised when an external call can't finish before the turn deadline."""
+
+    def __init__(self, message: str, started: bool = False):
+        super().__init__(message)
+        # False if the call was skipped without being sent
+        self.started = started
+
+
+def budget_from_header(value: Optional[str]) -> int:
+    """Parse the deadline header into a budget in milliseconds, clamped to the allowed range."""
+    try:
+        budget_ms = int(value) if value else DEFAULT_TURN_BUDGET_MS
+    except ValueError:
+        budget_ms = DEFAULT_TURN_BUDGET_MS
+    return max(0, min(budget_ms, MAX_TURN_BUDGET_MS))
+
+
+def start_turn(budget_ms: int) -> contextvars.Token:
+    """Set the deadline for the current turn. Returns a token for end_turn()."""
+    return _turn_deadline.set(time.monotonic() + budget_ms / 1000)
+
+
+def end_turn(token: contextvars.Token) -> None:
+    """Clear the deadline set by start_turn()."""
+    _turn_deadline.reset(token)
+
+
+def remaining() -> Optional[float]:
+    """Seconds left before the turn deadline, or None if no deadline is set."""
+    deadline = _turn_deadline.get()
+    if deadline is None:
+        return None
+    return max(0.0, deadline - time.monotonic())
+
+
+def call_timeout(default: float) -> float:
+    """Timeout to hand to a client library: its usual timeout, capped by the time left in the turn."""
+    left = remaining()
+    if left is None:
+        return default
+    return max(0.001, min(default, left))
+
+
+async def run_with_deadline(func, *args, **kwargs):
+    """
+    Run a blocking client call in a worker thread, bounded by the turn deadline.
+
+    Raises DeadlineExceeded without starting the call if there isn't enough time
+    left, or if the call is still running when the deadline passes.
+    """
+    left = remaining()
+    if left is None:
+        return await asyncio.to_thread(func, *args, **kwargs)
+
+    if left < MIN_CALL_BUDGET_SECONDS:
+        raise DeadlineExceeded(f"Only {left * 1000:.0f}ms left in turn, skipping {getattr(func, '__name__', 'call')}")
+
+    try:
+        return await asyncio.wait_for(asyncio.to_thread(func, *args, **kwargs), timeout=left)
+    except asyncio.TimeoutError:
+        raise DeadlineExceeded(f"{getattr(func, '__name__', 'call')} did not finish before the turn deadline", started=True)
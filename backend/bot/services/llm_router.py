@@ -0,0 +1,307 @@
+"""
+Routing of chat completions across several OpenAI-compatible endpoints.
+
+Endpoints are configured with AI_ENDPOINTS, a JSON list such as:
+
+    [{"endpoint": "https://api.deepseek.com", "api_key": "...", "weight": 2, "max_concurrency": 16},
+     {"endpoint": "https://eu.example.com/v1", "api_key": "...", "model": "deepseek-chat"}]
+
+If AI_ENDPOINTS is not set, the single AI_ENDPOINT / AI_API_KEY pair is used,
+so existing deployments keep working unchanged.
+
+Each call picks two endpoints at random (weighted) and uses the one with the
+lower latency estimate (power of two choices). A failed call counts as taking
+at least AI_ENDPOINT_ERROR_PENALTY_MS, so an endpoint that fails fast does not
+look like the fastest one. After AI_ENDPOINT_EJECT_ERRORS consecutive errors an endpoint
+is left out for AI_ENDPOINT_EJECT_MS, unless every endpoint is.
+
+Once enough latencies have been seen, a call that is still running after the observed p95 gets a hedged copy
+sent to another endpoint and whichever answers first wins.
+
+The blocking client calls run on the router's own thread pool, one thread per
+concurrency slot, so they neither queue behind nor starve the Translator and
+Text Analytics calls on asyncio's default executor. A slot is only given back
+when its thread returns: abandoning a call (the losing half of a hedge, or a
+turn deadline) does not stop the HTTP request, so it still counts against
+the endpoint's max_concurrency until it ends. Its elapsed time is recorded as
+a censored latency sample, a lower bound, so slow endpoints are still seen as
+slow and the hedge delay is not worked out from the winners alone.
+"""
+import asyncio
+import contextvars
+import functools
+import json
+import logging
+import os
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional
+
+from openai import APIStatusError, OpenAI
+
+from backend.bot.services.deadline import MIN_CALL_BUDGET_SECONDS, DeadlineExceeded, remaining
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_CONCURRENCY = int(os.getenv("AI_ENDPOINT_MAX_CONCURRENCY", "16"))
+HEDGING_ENABLED = os.getenv("AI_HEDGING", "true").lower() == "true"
+# Hedging only starts once the p95 is based on this many calls
+HEDGE_MIN_SAMPLES = int(os.getenv("AI_HEDGE_MIN_SAMPLES", "20"))
+# Never hedge sooner than this, in seconds
+HEDGE_MIN_DELAY = int(os.getenv("AI_HEDGE_MIN_DELAY_MS", "500")) / 1000
+# Consecutive errors after which an endpoint is left out for a while
+EJECT_ERRORS = int(os.getenv("AI_ENDPOINT_EJECT_ERRORS", "5"))
+EJECT_DURATION = int(os.getenv("AI_ENDPOINT_EJECT_MS", "30000")) / 1000
+# The latency a failed call is recorded with, at least
+ERROR_PENALTY = int(os.getenv("AI_ENDPOINT_ERROR_PENALTY_MS", "5000")) / 1000
+EWMA_ALPHA = 0.2
+LATENCY_WINDOW = 200
+
+
+class Endpoint:
+    """One OpenAI-compatible endpoint with its own client, concurrency limit and latency estimate."""
+
+    def __init__(self, endpoint: str, api_key: str, weight: float = 1.0,
+                 max_concurrency: int = DEFAULT_MAX_CONCURRENCY, model: Optional[str] = None):
+        self.endpoint = endpoint
+        self.weight = max(float(weight), 0.01)
+        self.max_concurrency = max_concurrency
+        self.model = model
+        self.client = OpenAI(api_key=api_key, base_url=endpoint, max_retries=0)
+        self.semaphore = asyncio.Semaphore(max_concurrency)
+        self.in_flight = 0
+        self.ewma_latency: Optional[float] = None
+        self.errors = 0
+        self.consecutive_errors = 0
+        self.ejections = 0
+        self.ejected_until = 0.0
+        self.calls = 0
+
+    def warm_up(self, timeout: float) -> None:
+        """Open a pooled connection to the endpoint; any HTTP answer will do."""
+        try:
+            self.client.models.list(timeout=timeout)
+        except APIStatusError:
+            pass
+
+    def score(self) -> float:
+        """Lower is better: expected latency, adjusted for queued calls and weight."""
+        # Untried endpoints look fast so they get a chance to be measured
+        latency = self.ewma_latency if self.ewma_latency is not None else 0.0
+        return (latency + 0.001) * (self.in_flight + 1) / self.weight
+
+    def available(self) -> bool:
+        return time.monotonic() >= self.ejected_until
+
+    def record(self, latency: float, ok: bool) -> None:
+        self.calls += 1
+        if ok:
+            self.consecutive_errors = 0
+        else:
+            self.errors += 1
+            self.consecutive_errors += 1
+            latency = max(latency, ERROR_PENALTY)
+            # Still failing after a cool-down: the first error ejects it again
+            if self.consecutive_errors >= EJECT_ERRORS:
+                self.ejected_until = time.monotonic() + EJECT_DURATION
+                self.ejections += 1
+                logger.warning(f"AI endpoint {self.endpoint} failed {self.consecutive_errors} times in a row, "
+                               f"leaving it out for {EJECT_DURATION:.0f}s")
+        if self.ewma_latency is None:
+            self.ewma_latency = latency
+        else:
+            self.ewma_latency = EWMA_ALPHA * latency + (1 - EWMA_ALPHA) * self.ewma_latency
+
+    def snapshot(self) -> dict:
+        return {
+            "endpoint": self.endpoint,
+            "weight": self.weight,
+            "in_flight": self.in_flight,
+            "max_concurrency": self.max_concurrency,
+            "ewma_latency_ms": round(self.ewma_latency * 1000, 1) if self.ewma_latency is not None else None,
+            "calls": self.calls,
+            "errors": self.errors,
+            "ejections": self.ejections,
+            "ejected_for_seconds": round(max(0.0, self.ejected_until - time.monotonic()), 1)
+        }
+
+
+class LLMRouter:
+    """Sends chat completions to the best available endpoint, hedging slow calls."""
+
+    def __init__(self, endpoints: List[Endpoint], hedging: bool = HEDGING_ENABLED):
+        if not endpoints:
+            raise ValueError("At least one AI endpoint must be configured")
+        self.endpoints = endpoints
+        self.hedging = hedging and len(endpoints) > 1
+        self._latencies = deque(maxlen=LATENCY_WINDOW)
+        self.hedged_calls = 0
+        self.abandoned_calls = 0
+        # Every slot of every endpoint can hold a thread, so calls never wait for one
+        self.executor = ThreadPoolExecutor(max_workers=sum(e.max_concurrency for e in endpoints),
+                                           thread_name_prefix="llm-call")
+
+    def choose(self, exclude: Optional[Endpoint] = None) -> Endpoint:
+        """Pick an endpoint using weighted power of two choices."""
+        candidates = [e for e in self.endpoints if e is not exclude] or self.endpoints
+        # Leave ejected endpoints out, unless that leaves nothing
+        candidates = [e for e in candidates if e.available()] or candidates
+        if len(candidates) == 1:
+            return candidates[0]
+        first, second = random.choices(candidates, weights=[e.weight for e in candidates], k=2)
+        if first is second:
+            second = random.choice([e for e in candidates if e is not first])
+        # Prefer an endpoint that has a free slot over one that would queue
+        first_full = first.in_flight >= first.max_concurrency
+        second_full = second.in_flight >= second.max_concurrency
+        if first_full != second_full:
+            return second if first_full else first
+        return first if first.score() <= second.score() else second
+
+    def hedge_delay(self) -> Optional[float]:
+        """Seconds to wait before hedging, or None if there isn't enough data yet."""
+        if not self.hedging or len(self._latencies) < HEDGE_MIN_SAMPLES:
+            return None
+        ordered = sorted(self._latencies)
+        p95 = ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))]
+        return max(p95, HEDGE_MIN_DELAY)
+
+    def _release(self, endpoint: Endpoint, started: float, abandoned: list, future) -> None:
+        """Give the slot back once the worker thread has returned, and record the call unless abandoned."""
+        endpoint.in_flight -= 1
+        endpoint.semaphore.release()
+        if abandoned:
+            return
+        latency = time.monotonic() - started
+        ok = not future.cancelled() and future.exception() is None
+        endpoint.record(latency, ok)
+        if ok:
+            self._latencies.append(latency)
+
+    def _abandon(self, endpoint: Endpoint, started: float, abandoned: list) -> None:
+        """Record a call nobody waits for any more with its elapsed time, a lower bound on its latency."""
+        abandoned.append(True)
+        self.abandoned_calls += 1
+        latency = time.monotonic() - started
+        endpoint.record(latency, True)
+        self._latencies.append(latency)
+
+    async def _call(self, endpoint: Endpoint, kwargs: dict):
+        left = remaining()
+        if left is not None and left < MIN_CALL_BUDGET_SECONDS:
+            raise DeadlineExceeded(f"Only {left * 1000:.0f}ms left in turn, skipping the call to {endpoint.endpoint}")
+        try:
+            await asyncio.wait_for(endpoint.semaphore.acquire(), timeout=left)
+        except asyncio.TimeoutError:
+            raise DeadlineExceeded(f"No free slot on {endpoint.endpoint} before the turn deadline")
+        endpoint.in_flight += 1
+        started = time.monotonic()
+        abandoned = []
+        if endpoint.model:
+            kwargs = dict(kwargs, model=endpoint.model)
+        # The thread sees the turn's context variables, as with asyncio.to_thread
+        call = functools.partial(contextvars.copy_context().run, endpoint.client.chat.completions.create, **kwargs)
+        future = asyncio.get_running_loop().run_in_executor(self.executor, call)
+        future.add_done_callback(functools.partial(self._release, endpoint, started, abandoned))
+        left = remaining()
+        try:
+            # Shielded, so cancelling this call leaves the future to release the slot when the thread ends
+            return await asyncio.wait_for(asyncio.shield(future), timeout=left)
+        except asyncio.TimeoutError:
+            self._abandon(endpoint, started, abandoned)
+            raise DeadlineExceeded(f"The call to {endpoint.endpoint} did not finish before the turn deadline",
+                                   started=True)
+        except asyncio.CancelledError:
+            # The other half of a hedged pair answered first
+            if not future.done():
+                self._abandon(endpoint, started, abandoned)
+            raise
+
+    async def create(self, **kwargs):
+        """Drop-in replacement for client.chat.completions.create."""
+        primary = self.choose()
+        delay = self.hedge_delay()
+        if delay is None:
+            return await self._call(primary, kwargs)
+
+        first = asyncio.ensure_future(self._call(primary, kwargs))
+        pending = {first}
+        try:
+            done, _ = await asyncio.wait(pending, timeout=delay)
+            if done:
+                return first.result()
+
+            # Only hedge if the turn has time for it and another endpoint has room
+            left = remaining()
+            backup = self.choose(exclude=primary)
+            if (left is not None and left < HEDGE_MIN_DELAY) or backup.in_flight >= backup.max_concurrency:
+                return await first
+
+            self.hedged_calls += 1
+            logger.info(f"Hedging slow AI call from {primary.endpoint} to {backup.endpoint}")
+            pending.add(asyncio.ensure_future(self._call(backup, kwargs)))
+            error = None
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        return task.result()
+                    error = task.exception()
+            raise error
+        finally:
+            for task in pending:
+                if not task.done():
+                    task.cancel()
+
+    def snapshot(self) -> dict:
+        return {
+            "hedging": self.hedging,
+            "hedge_delay_ms": round(self.hedge_delay() * 1000, 1) if self.hedge_delay() is not None else None,
+            "hedged_calls": self.hedged_calls,
+            "abandoned_calls": self.abandoned_calls,
+            "endpoints": [e.snapshot() for e in self.endpoints]
+        }
+
+
+def load_endpoints() -> List[Endpoint]:
+    """Build endpoints from AI_ENDPOINTS, falling back to AI_ENDPOINT / AI_API_KEY."""
+    raw = os.getenv("AI_ENDPOINTS")
+    if raw:
+        try:
+            configured = json.loads(raw)
+            return [
+                Endpoint(
+                    endpoint=item["endpoint"],
+                    api_key=item.get("api_key") or os.getenv("AI_API_KEY"),
+                    weight=item.get("weight", 1.0),
+                    max_concurrency=int(item.get("max_concurrency", DEFAULT_MAX_CONCURRENCY)),
+                    model=item.get("model")
+                )
+                for item in configured
+            ]
+        except (ValueError, KeyError, TypeError) as e:
+            logger.error(f"Invalid AI_ENDPOINTS configuration, using AI_ENDPOINT instead: {e}")
+    return [Endpoint(endpoint=os.getenv("AI_ENDPOINT"), api_key=os.getenv("AI_API_KEY"))]
+
+
+_router: Optional[LLMRouter] = None
+_router_lock = threading.Lock()
+
+
+def get_router() -> LLMRouter:
+    """Return the process-wide router, creating it on first use."""
+    global _router
+    if _router is None:
+        with _router_lock:
+            if _router is None:
+                _router = LLMRouter(load_endpoints())
+                logger.info(f"AI router using {len(_router.endpoints)} endpoint(s)")
+    return _router
+
+
+def snapshot() -> Optional[dict]:
+    """Router state for /health, or None if no AI call has been made yet."""
+    return _router.snapshot() if _router is not None else None
@@ -0,0 +1,144 @@
+"""
+Metrics for the bot, served at /metrics.
+
+Turn latency is recorded per scenario, waterfall step latency per dialog and
+step, and external call latency per call type (llm, translate, sentiment,
+entities, language_detection, db), along with error and fallback counters
+and gauges for turns and calls currently in flight.
+"""
+import functools
+import time
+from typing import Optional
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from backend.bot.services import profiler
+from backend.common import tracing
+from backend.common.metrics import CONTENT_TYPE, Registry
+from backend.bot.services.resilience import CLOSED
+
+# Scenarios the main dialog routes to; anything else falls through to the job interview
+SCENARIOS = {"taxi", "restaurant", "shopping", "hotel", "doctor"}
+
+LLM = "llm"
+TRANSLATE = "translate"
+SENTIMENT = "sentiment"
+ENTITIES = "entities"
+LANGUAGE_DETECTION = "language_detection"
+DB = "db"
+
+REGISTRY = Registry()
+
+TURN_SECONDS = REGISTRY.histogram(
+    "bot_turn_seconds", "Time to process one message, by scenario.", ["scenario"])
+TURNS_IN_FLIGHT = REGISTRY.gauge(
+    "bot_turns_in_flight", "Messages currently being processed, by scenario.", ["scenario"])
+TURN_ERRORS = REGISTRY.counter(
+    "bot_turn_errors_total", "Messages that failed with an unhandled error, by scenario.", ["scenario"])
+STEP_SECONDS = REGISTRY.histogram(
+    "bot_step_seconds", "Time spent in each waterfall step.", ["dialog", "step"])
+STEP_ERRORS = REGISTRY.counter(
+    "bot_step_errors_total", "Waterfall steps that raised an error.", ["dialog", "step"])
+CALL_SECONDS = REGISTRY.histogram(
+    "bot_external_call_seconds", "Latency of external calls as seen by the dialog, by call type and outcome.",
+    ["call", "outcome"])
+CALLS_IN_FLIGHT = REGISTRY.gauge(
+    "bot_external_calls_in_flight", "External calls currently waiting, by call type.", ["call"])
+CALL_ERRORS = REGISTRY.counter(
+    "bot_external_call_errors_total", "External calls that failed, by call type.", ["call"])
+FALLBACKS = REGISTRY.counter(
+    "bot_fallbacks_total", "External calls replaced by a fallback, by call type and reason.", ["call", "reason"])
+CIRCUIT_OPEN = REGISTRY.gauge(
+    "bot_circuit_open", "1 if the circuit breaker for a service is not closed.", ["service"])
+
+
+def scenario_label(scenario: Optional[str]) -> str:
+    """Map the X-Scenario header onto a fixed set of label values."""
+    scenario = (scenario or "").lower()
+    return scenario if scenario in SCENARIOS else "job_interview"
+
+
+class track_call:
+    """
+    Times and traces one external call from the dialog's point of view,
+    including any time spent queued or batched. Use call.fallback(e) or
+    call.error(e) in the dialog's except branches to record how the call ended.
+    """
+
+    def __init__(self, call: str):
+        self.call = call
+        self.outcome = "ok"
+        self.span = tracing.start_span(call)
+
+    def fallback(self, error: Exception) -> None:
+        self.outcome = "fallback"
+        self.span.set(fallback=type(error).__name__)
+        FALLBACKS.inc(call=self.call, reason=type(error).__name__)
+
+    def error(self, error: Exception) -> None:
+        self.outcome = "error"
+        self.span.status = "error"
+        self.span.set(error=f"{type(error).__name__}: {error}")
+        CALL_ERRORS.inc(call=self.call)
+
+    def __enter__(self):
+        CALLS_IN_FLIGHT.inc(call=self.call)
+        self.span.__enter__()
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc is not None and self.outcome == "ok":
+            self.error(exc)
+        elapsed = time.perf_counter() - self.started
+        CALL_SECONDS.observe(elapsed, call=self.call, outcome=self.outcome)
+        profiler.record_call(self.call, elapsed, self.outcome)
+        CALLS_IN_FLIGHT.dec(call=self.call)
+        self.span.set(outcome=self.outcome)
+        self.span.__exit__(exc_type, exc, tb)
+        return False
+
+
+def timed_step(dialog_id: str, step):
+    """Wrap a waterfall step so its duration is recorded under the dialog and step name."""
+    step_name = step.__name__
+
+    @functools.wraps(step)
+    async def wrapper(step_context):
+        started = time.perf_counter()
+        try:
+            return await step(step_context)
+        except Exception:
+            STEP_ERRORS.inc(dialog=dialog_id, step=step_name)
+            raise
+        finally:
+            STEP_SECONDS.observe(time.perf_counter() - started, dialog=dialog_id, step=step_name)
+
+    return wrapper
+
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = conn.info["query_started"].pop()
+    CALL_SECONDS.observe(time.perf_counter() - started, call=DB, outcome="ok")
+
+
+@event.listens_for(Engine, "handle_error")
+def _handle_error(context):
+    started = context.connection.info.get("query_started") if context.connection is not None else None
+    if started:
+        CALL_SECONDS.observe(time.perf_counter() - started.pop(), call=DB, outcome="error")
+    CALL_ERRORS.inc(call=DB)
+
+
+def render(breakers: dict) -> str:
+    """The metrics page, with breaker states refreshed at scrape time."""
+    for service, breaker in breakers.items():
+        CIRCUIT_OPEN.set(0 if breaker["state"] == CLOSED else 1, service=service)
+    return REGISTRY.render()
@@ -0,0 +1,208 @@
+"""
+Per-step profiling of bot turns, with capture of slow turns.
+
+Every waterfall step is driven through a small coroutine wrapper that times
+each stretch the step spends running on the event loop. From that we get,
+per step:
+
+- wall time, from start to finish;
+- on-loop time, spent running Python code, which blocks every other turn;
+- CPU time of the event loop thread during those stretches;
+- awaited time, spent waiting on I/O or threads (wall minus on-loop);
+- optionally, memory allocated while the step was running (PROFILE_MEMORY).
+
+Steps started from inside another step (step_context.next) are shown
+separately and their time is taken out of the outer step's figures.
+
+A turn slower than SLOW_TURN_THRESHOLD_MS keeps its full breakdown, including
+external calls, in a ring buffer served at /debug/slow-turns.
+"""
+import contextvars
+import functools
+import os
+import threading
+import time
+import tracemalloc
+from collections import deque
+from typing import Optional
+
+from backend.common import tracing
+
+SLOW_TURN_THRESHOLD = int(os.getenv("SLOW_TURN_THRESHOLD_MS", "2000")) / 1000
+SLOW_TURN_BUFFER_SIZE = int(os.getenv("SLOW_TURN_BUFFER_SIZE", "50"))
+# Tracing allocations slows Python down noticeably, so it is off unless asked for
+PROFILE_MEMORY = os.getenv("PROFILE_MEMORY", "false").lower() == "true"
+
+if PROFILE_MEMORY and not tracemalloc.is_tracing():
+    tracemalloc.start(1)
+
+_current_turn = contextvars.ContextVar("turn_profile", default=None)
+_slow_turns = deque(maxlen=SLOW_TURN_BUFFER_SIZE)
+_slow_turns_lock = threading.Lock()
+
+
+def _traced_memory() -> int:
+    return tracemalloc.get_traced_memory()[0] if PROFILE_MEMORY else 0
+
+
+class StepProfile:
+    """Timings for one waterfall step."""
+
+    def __init__(self, dialog: str, step: str, depth: int):
+        self.dialog = dialog
+        self.step = step
+        self.depth = depth
+        self.wall = 0.0
+        self.on_loop = 0.0
+        self.cpu = 0.0
+        self.allocated = 0
+        # Time of steps started from inside this one, taken out of its own figures
+        self.nested_wall = 0.0
+        self.nested_on_loop = 0.0
+        self.nested_cpu = 0.0
+        self.nested_allocated = 0
+        self.error = None
+
+    def to_dict(self) -> dict:
+        on_loop = max(0.0, self.on_loop - self.nested_on_loop)
+        wall = max(0.0, self.wall - self.nested_wall)
+        result = {
+            "dialog": self.dialog,
+            "step": self.step,
+            "depth": self.depth,
+            "wall_ms": round(wall * 1000, 2),
+            "on_loop_ms": round(on_loop * 1000, 2),
+            "cpu_ms": round(max(0.0, self.cpu - self.nested_cpu) * 1000, 2),
+            "awaited_ms": round(max(0.0, wall - on_loop) * 1000, 2)
+        }
+        if PROFILE_MEMORY:
+            result["allocated_kb"] = round((self.allocated - self.nested_allocated) / 1024, 1)
+        if self.error:
+            result["error"] = self.error
+        return result
+
+
+class TurnProfile:
+    """Everything measured during one turn."""
+
+    def __init__(self, **details):
+        self.details = details
+        self.started_at = time.time()
+        self.started = time.perf_counter()
+        self.steps = []
+        self.calls = []
+        self._stack = []
+
+    def record_call(self, call: str, elapsed: float, outcome: str) -> None:
+        self.calls.append({
+            "call": call,
+            "offset_ms": round((time.perf_counter() - elapsed - self.started) * 1000, 2),
+            "duration_ms": round(elapsed * 1000, 2),
+            "outcome": outcome
+        })
+
+    def to_dict(self, elapsed: float) -> dict:
+        return {
+            **self.details,
+            "started_at": self.started_at,
+            "duration_ms": round(elapsed * 1000, 2),
+            "steps": [step.to_dict() for step in self.steps],
+            "calls": self.calls
+        }
+
+
+class _ProfiledCoroutine:
+    """Drives a step's coroutine, timing every stretch it runs on the event loop."""
+
+    def __init__(self, turn: TurnProfile, profile: StepProfile, coro):
+        self.turn = turn
+        self.profile = profile
+        self.coro = coro
+
+    def __await__(self):
+        profile = self.profile
+        parent = self.turn._stack[-1] if self.turn._stack else None
+        self.turn._stack.append(profile)
+        started = time.perf_counter()
+        value, error = None, None
+        try:
+            while True:
+                slice_started = time.perf_counter()
+                cpu_started = time.thread_time()
+                memory_started = _traced_memory()
+                try:
+                    if error is not None:
+                        awaiting = self.coro.throw(error)
+                    else:
+                        awaiting = self.coro.send(value)
+                except StopIteration as e:
+                    return e.value
+                except BaseException as e:
+                    profile.error = type(e).__name__
+                    raise
+                finally:
+                    profile.on_loop += time.perf_counter() - slice_started
+                    profile.cpu += time.thread_time() - cpu_started
+                    profile.allocated += _traced_memory() - memory_started
+                try:
+                    value, error = (yield awaiting), None
+                except BaseException as e:
+                    value, error = None, e
+        finally:
+            profile.wall = time.perf_counter() - started
+            self.turn._stack.pop()
+            if parent is not None:
+                parent.nested_wall += profile.wall
+                parent.nested_on_loop += profile.on_loop
+                parent.nested_cpu += profile.cpu
+                parent.nested_allocated += profile.allocated
+
+
+def profiled_step(dialog_id: str, step):
+    """Wrap a waterfall step so it is profiled when it runs inside a profiled turn."""
+    step_name = step.__name__
+
+    @functools.wraps(step)
+    async def wrapper(step_context):
+        turn = _current_turn.get()
+        if turn is None:
+            return await step(step_context)
+        profile = StepProfile(dialog_id, step_name, len(turn._stack))
+        turn.steps.append(profile)
+        return await _ProfiledCoroutine(turn, profile, step(step_context))
+
+    return wrapper
+
+
+def start_turn(**details) -> contextvars.Token:
+    """Start profiling a turn; details such as the scenario are kept with a slow turn's record."""
+    span = tracing.current_span()
+    if span is not None:
+        details.setdefault("trace_id", span.trace_id)
+    return _current_turn.set(TurnProfile(**details))
+
+
+def end_turn(token: contextvars.Token) -> None:
+    """Finish the turn, keeping its breakdown if it was slow."""
+    turn = _current_turn.get()
+    _current_turn.reset(token)
+    if turn is None:
+        return
+    elapsed = time.perf_counter() - turn.started
+    if elapsed >= SLOW_TURN_THRESHOLD:
+        with _slow_turns_lock:
+            _slow_turns.append(turn.to_dict(elapsed))
+
+
+def record_call(call: str, elapsed: float, outcome: str) -> None:
+    """Add an external call to the current turn's breakdown."""
+    turn = _current_turn.get()
+    if turn is not None:
+        turn.record_call(call, elapsed, outcome)
+
+
+def slow_turns(limit: Optional[int] = None) -> list:
+    """Slow turns captured so far, newest first."""
+    with _slow_turns_lock:
+        turns = list(reversed(_slow_turns))
+    return turns[:limit] if limit else turns
@@ -0,0 +1,189 @@
+"""
+Client-side rate limiting for the Azure services the bot calls.
+
+Each (service, API key) pair gets an async token bucket. A call that arrives
+when the bucket is empty waits briefly in line instead of being sent and
+coming back as a 429. If the wait would be longer than the limiter allows, or
+longer than the turn has left, RateLimitExceeded is raised so the dialog can
+use its fallback straight away.
+
+When a service does answer 429, its Retry-After header pauses the bucket so
+that no further calls are sent with that key until the service is ready.
+
+Limits are configured with RATE_LIMITS, a JSON object keyed by service:
+
+    {"translator": {"rate": 10, "burst": 20, "max_wait_ms": 2000,
+                    "keys": {"ab12": {"rate": 30, "burst": 60}}}}
+
+Per-key overrides are keyed by the last four characters of the API key.
+"""
+import asyncio
+import bisect
+import json
+import logging
+import os
+import threading
+import time
+from typing import Dict, Optional, Tuple
+
+from backend.bot.services.deadline import remaining
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_LIMITS = {
+    "translator": {"rate": 10, "burst": 20, "max_wait_ms": 2000},
+    "text_analytics": {"rate": 15, "burst": 30, "max_wait_ms": 2000}
+}
+
+# Upper bounds, in seconds, of the queue wait histogram buckets
+WAIT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+# Longest Retry-After we will honour, so a bad header can't stall a key forever
+MAX_RETRY_AFTER = 60.0
+
+
+class RateLimitExceeded(Exception):
+    """Raised when a call would have to queue for longer than allowed."""
+
+
+class TokenBucket:
+    """Async token bucket that queues callers in order and records how long they waited."""
+
+    def __init__(self, name: str, rate: float, burst: float, max_wait: float):
+        self.name = name
+        self.rate = max(float(rate), 0.001)
+        self.capacity = max(float(burst), 1.0)
+        self.max_wait = max_wait
+        self._tokens = self.capacity
+        self._last = time.monotonic()
+        self._lock = threading.Lock()
+        self.waiting = 0
+        self.acquired = 0
+        self.rejected = 0
+        self.throttled = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+        self.wait_counts = [0] * (len(WAIT_BUCKETS) + 1)
+
+    def _refill(self, now: float) -> None:
+        # _last is in the future while the bucket is paused by a Retry-After
+        elapsed = now - self._last
+        if elapsed > 0:
+            self._tokens = min(self.capacity, self._tokens + elapsed * self.rate)
+            self._last = now
+
+    def _reserve(self, max_wait: float) -> Optional[float]:
+        """Take a token, returning how long to wait for it, or None if that is longer than max_wait."""
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            wait = max(0.0, self._last - now)
+            if self._tokens < 1:
+                wait += (1 - self._tokens) / self.rate
+            if wait > max_wait:
+                self.rejected += 1
+                return None
+            self._tokens -= 1
+            return wait
+
+    def _record_wait(self, wait: float) -> None:
+        self.acquired += 1
+        self.wait_total += wait
+        self.wait_max = max(self.wait_max, wait)
+        self.wait_counts[bisect.bisect_left(WAIT_BUCKETS, wait)] += 1
+
+    async def acquire(self) -> float:
+        """Wait for a token. Returns the time spent waiting in seconds."""
+        max_wait = self.max_wait
+        left = remaining()
+        if left is not None:
+            max_wait = min(max_wait, left)
+        wait = self._reserve(max_wait)
+        if wait is None:
+            raise RateLimitExceeded(f"{self.name} rate limit would need more than {max_wait * 1000:.0f}ms of queueing")
+        if wait > 0:
+            self.waiting += 1
+            try:
+                await asyncio.sleep(wait)
+            finally:
+                self.waiting -= 1
+        self._record_wait(wait)
+        return wait
+
+    def try_acquire(self) -> bool:
+        """Take a token without waiting, for synchronous callers."""
+        if self._reserve(0.0) is None:
+            return False
+        self._record_wait(0.0)
+        return True
+
+    def pause(self, seconds: float) -> None:
+        """Stop handing out tokens for the given time, e.g. after a 429 with Retry-After."""
+        seconds = min(max(seconds, 0.0), MAX_RETRY_AFTER)
+        with self._lock:
+            self.throttled += 1
+            self._tokens = min(self._tokens, 0.0)
+            self._last = max(self._last, time.monotonic() + seconds)
+        logger.warning(f"{self.name} throttled by the service, pausing for {seconds:.1f}s")
+
+    def snapshot(self) -> dict:
+        return {
+            "rate_per_second": self.rate,
+            "burst": self.capacity,
+            "waiting": self.waiting,
+            "acquired": self.acquired,
+            "rejected": self.rejected,
+            "throttled": self.throttled,
+            "queue_wait_seconds_total": round(self.wait_total, 3),
+            "queue_wait_seconds_max": round(self.wait_max, 3),
+            "queue_wait_buckets": {
+                **{str(bound): count for bound, count in zip(WAIT_BUCKETS, self.wait_counts)},
+                "+Inf": self.wait_counts[-1]
+            }
+        }
+
+
+def _key_id(api_key: Optional[str]) -> str:
+    """Short, non-secret label for an API key."""
+    return api_key[-4:] if api_key else "none"
+
+
+def _load_config() -> dict:
+    config = {service: dict(limits) for service, limits in DEFAULT_LIMITS.items()}
+    raw = os.getenv("RATE_LIMITS")
+    if raw:
+        try:
+            for service, limits in json.loads(raw).items():
+                config.setdefault(service, {}).update(limits)
+        except (ValueError, AttributeError) as e:
+            logger.error(f"Invalid RATE_LIMITS configuration, using defaults: {e}")
+    return config
+
+
+_config = _load_config()
+_limiters: Dict[Tuple[str, str], TokenBucket] = {}
+_limiters_lock = threading.Lock()
+
+
+def get_limiter(service: str, api_key: Optional[str]) -> TokenBucket:
+    """Return the bucket for this service and key, creating it from config on first use."""
+    key_id = _key_id(api_key)
+    limiter = _limiters.get((service, key_id))
+    if limiter is None:
+        with _limiters_lock:
+            limiter = _limiters.get((service, key_id))
+            if limiter is None:
+                limits = dict(_config.get(service, {"rate": 10, "burst": 20, "max_wait_ms": 2000}))
+                limits.update(limits.pop("keys", {}).get(key_id, {}))
+                limiter = TokenBucket(
+                    name=f"{service}[{key_id}]",
+                    rate=limits.get("rate", 10),
+                    burst=limits.get("burst", limits.get("rate", 10)),
+                    max_wait=limits.get("max_wait_ms", 2000) / 1000
+                )
+                _limiters[(service, key_id)] = limiter
+    return limiter
+
+
+def snapshot() -> dict:
+    """Queue-wait metrics for every limiter created so far."""
+    return {limiter.name: limiter.snapshot() for limiter in list(_limiters.values())}
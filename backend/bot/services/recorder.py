@@ -0,0 +1,185 @@
+"""
+Record and replay of the bot's external service calls, for repeatable performance tests.
+
+The service methods of BaseDialog (chatbot_respond, translate_text,
+detect_language, analyse_sentiment and entity_extraction) are wrapped with
+recorded(). What happens then depends on CASSETTE_MODE:
+
+- "off" (default): the wrapper is not applied at all.
+- "record": every call runs normally, and its request, result and latency are
+  appended to the cassette file at CASSETTE_PATH.
+- "replay": calls are answered from the cassette without touching the
+  network. Each answer waits for its recorded latency divided by
+  CASSETTE_SPEED (e.g. 10 for ten times faster, 0 for no wait at all).
+
+Replay looks up the recorded answers to the same request, in recording order,
+and starts again from the first when they run out. A request that was never
+recorded gets the next answer recorded for the same kind of call, so replays
+still work when a concurrency change alters the order or content of turns.
+Calls of a kind that was never recorded go to the real service. A replayed
+chatbot_respond does not add to the conversation history, as nothing reads it
+apart from the LLM request that replay skips.
+
+Cassettes are JSON lines, gzipped when the path ends in .gz, and record mode
+appends to an existing file.
+"""
+import asyncio
+import functools
+import gzip
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from collections import defaultdict
+from typing import Optional
+
+from backend.bot.services import metrics
+
+CASSETTE_MODE = os.getenv("CASSETTE_MODE", "off").lower()
+CASSETTE_PATH = os.getenv("CASSETTE_PATH", os.path.join(tempfile.gettempdir(), "lingolizard_cassette.jsonl.gz"))
+CASSETTE_SPEED = float(os.getenv("CASSETTE_SPEED", "1"))
+
+RECORD = "record"
+REPLAY = "replay"
+
+logger = logging.getLogger(__name__)
+
+
+def _open(path: str, mode: str):
+    if path.endswith(".gz"):
+        return gzip.open(path, mode + "t", encoding="utf-8")
+    return open(path, mode, encoding="utf-8")
+
+
+def request_key(call: str, request: list) -> str:
+    return hashlib.sha1(json.dumps([call, request], ensure_ascii=False).encode("utf-8")).hexdigest()[:16]
+
+
+class Cassette:
+    """The interactions in one cassette file, indexed for replay."""
+
+    def __init__(self, path: str, speed: float = 1.0):
+        self.path = path
+        self.speed = speed
+        self._lock = threading.Lock()
+        self._by_key = defaultdict(list)
+        self._by_call = defaultdict(list)
+        self._next = defaultdict(int)
+        self._writer = None
+        self.counts = defaultdict(int)
+
+    def load(self) -> "Cassette":
+        if not os.path.exists(self.path):
+            return self
+        with _open(self.path, "r") as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    continue
+                self._by_key[entry["key"]].append(entry)
+                self._by_call[entry["call"]].append(entry)
+        logger.info(f"Loaded {sum(len(v) for v in self._by_call.values())} recorded calls from {self.path}")
+        return self
+
+    def _take(self, index_key, entries: list) -> dict:
+        position = self._next[index_key]
+        self._next[index_key] = position + 1
+        return entries[position % len(entries)]
+
+    def lookup(self, call: str, request: list) -> Optional[dict]:
+        """Next recorded answer for this request, or for this kind of call; None if there is none."""
+        key = request_key(call, request)
+        with self._lock:
+            if self._by_key.get(key):
+                self.counts[f"{call}.hit"] += 1
+                return self._take(key, self._by_key[key])
+            if self._by_call.get(call):
+                self.counts[f"{call}.substituted"] += 1
+                return self._take(call, self._by_call[call])
+            self.counts[f"{call}.unrecorded"] += 1
+            return None
+
+    def record(self, call: str, request: list, result, latency: float) -> None:
+        entry = {
+            "call": call,
+            "key": request_key(call, request),
+            "request": request,
+            "result": result,
+            "latency_ms": round(latency * 1000, 2)
+        }
+        line = json.dumps(entry, ensure_ascii=False, separators=(",", ":"), default=str)
+        with self._lock:
+            if self._writer is None:
+                os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+                self._writer = _open(self.path, "a")
+            self._writer.write(line + "\n")
+            self._writer.flush()
+            self.counts[f"{call}.recorded"] += 1
+
+    def delay(self, entry: dict) -> float:
+        """Seconds to wait before returning a replayed answer."""
+        return entry["latency_ms"] / 1000 / self.speed if self.speed > 0 else 0.0
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {"path": self.path, "mode": CASSETTE_MODE, "speed": self.speed, "counts": dict(self.counts)}
+
+
+_cassette: Optional[Cassette] = None
+_cassette_lock = threading.Lock()
+
+
+def get_cassette() -> Cassette:
+    global _cassette
+    with _cassette_lock:
+        if _cassette is None:
+            _cassette = Cassette(CASSETTE_PATH, CASSETTE_SPEED)
+            if CASSETTE_MODE == REPLAY:
+                _cassette.load()
+        return _cassette
+
+
+def snapshot() -> Optional[dict]:
+    return _cassette.snapshot() if _cassette is not None else None
+
+
+def _request(dialog, args: tuple, kwargs: dict) -> list:
+    """The parts of a call that decide its answer: the learner's language and the plain arguments."""
+    language = dialog.user_state.get_language() if getattr(dialog, "user_state", None) else None
+    plain = (str, int, float, bool, type(None), list)
+    values = [a for a in args if isinstance(a, plain)]
+    values += [[k, v] for k, v in sorted(kwargs.items()) if isinstance(v, plain)]
+    return [language] + values
+
+
+def recorded(call: str):
+    """Wrap a BaseDialog service method so it is recorded or replayed when CASSETTE_MODE asks for it."""
+    def decorator(method):
+        if CASSETTE_MODE not in (RECORD, REPLAY):
+            return method
+
+        @functools.wraps(method)
+        async def wrapper(self, *args, **kwargs):
+            cassette = get_cassette()
+            request = _request(self, args, kwargs)
+            if CASSETTE_MODE == RECORD:
+                started = time.perf_counter()
+                result = await method(self, *args, **kwargs)
+                cassette.record(call, request, result, time.perf_counter() - started)
+                return result
+
+            entry = cassette.lookup(call, request)
+            if entry is None:
+                return await method(self, *args, **kwargs)
+            with metrics.track_call(call):
+                delay = cassette.delay(entry)
+                if delay:
+                    await asyncio.sleep(delay)
+            return entry["result"]
+        return wrapper
+    return decorator
+
@@ -0,0 +1,249 @@
+"""
+Circuit breakers and a shared retry budget for the bot's external services.
+
+Each dependency (DeepSeek, Translator, Text Analytics) has its own breaker.
+After enough consecutive failures the breaker opens and calls fail straight
+away, so dialogs use their fallbacks instead of waiting for a client timeout
+on every turn. Once the recovery time has passed a single probe
+call is let through (half-open); if it succeeds the breaker closes again. A
+probe that never reports back (its task was cancelled) stops blocking others
+after the recovery time.
+
+Retries are limited by one global budget so that during an outage retries
+can't multiply the load on a service that is already struggling.
+"""
+import asyncio
+import os
+import threading
+import time
+from collections import deque
+from typing import Dict
+
+from backend.bot.services.deadline import DeadlineExceeded, remaining, run_with_deadline
+from backend.bot.services.rate_limit import RateLimitExceeded
+from backend.common.retry_after import retry_after_seconds
+
+LLM = "llm"
+TRANSLATOR = "translator"
+TEXT_ANALYTICS = "text_analytics"
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+FAILURE_THRESHOLD = int(os.getenv("BREAKER_FAILURE_THRESHOLD", "5"))
+RECOVERY_TIMEOUT = float(os.getenv("BREAKER_RECOVERY_SECONDS", "30"))
+
+# Retries allowed as a fraction of requests in the window, plus a small floor
+RETRY_RATIO = float(os.getenv("RETRY_BUDGET_RATIO", "0.1"))
+RETRY_MIN_PER_SECOND = float(os.getenv("RETRY_BUDGET_MIN_PER_SECOND", "0.5"))
+RETRY_WINDOW = float(os.getenv("RETRY_BUDGET_WINDOW_SECONDS", "10"))
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling a service whose circuit breaker is open."""
+
+
+class CircuitBreaker:
+    """Tracks consecutive failures for one service and decides whether calls may go through."""
+
+    def __init__(self, name: str, failure_threshold: int = FAILURE_THRESHOLD, recovery_timeout: float = RECOVERY_TIMEOUT):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.recovery_timeout = recovery_timeout
+        self._state = CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probe_in_flight = False
+        self._probe_started_at = 0.0
+        self._rejected = 0
+        # Calls can be recorded from worker threads
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            return self._current_state()
+
+    def _current_state(self) -> str:
+        if self._state == OPEN and time.monotonic() - self._opened_at >= self.recovery_timeout:
+            self._state = HALF_OPEN
+        return self._state
+
+    def allow_request(self) -> bool:
+        """Return True if a call may be made now. In half-open state only one probe is allowed."""
+        with self._lock:
+            state = self._current_state()
+            if state == CLOSED:
+                return True
+            now = time.monotonic()
+            if state == HALF_OPEN and (not self._probe_in_flight
+                                       or now - self._probe_started_at >= self.recovery_timeout):
+                self._probe_in_flight = True
+                self._probe_started_at = now
+                return True
+            self._rejected += 1
+            return False
+
+    def record_success(self) -> None:
+        with self._lock:
+            self._state = CLOSED
+            self._failures = 0
+            self._probe_in_flight = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self._failures += 1
+            if self._state == HALF_OPEN or self._failures >= self.failure_threshold:
+                self._state = OPEN
+                self._opened_at = time.monotonic()
+            self._probe_in_flight = False
+
+    def release(self) -> None:
+        """Give back a half-open probe slot for a call that was never sent."""
+        with self._lock:
+            self._probe_in_flight = False
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            state = self._current_state()
+            return {
+                "state": state,
+                "consecutive_failures": self._failures,
+                "rejected_calls": self._rejected,
+                "retry_in_seconds": round(max(0.0, self.recovery_timeout - (time.monotonic() - self._opened_at)), 1) if state == OPEN else 0
+            }
+
+
+class RetryBudget:
+    """Allows retries only up to a fraction of recent requests across all services."""
+
+    def __init__(self, ratio: float = RETRY_RATIO, min_per_second: float = RETRY_MIN_PER_SECOND, window: float = RETRY_WINDOW):
+        self.ratio = ratio
+        self.min_per_second = min_per_second
+        self.window = window
+        self._requests = deque()
+        self._retries = deque()
+        self._lock = threading.Lock()
+
+    def _trim(self, now: float) -> None:
+        for events in (self._requests, self._retries):
+            while events and now - events[0] > self.window:
+                events.popleft()
+
+    def record_request(self) -> None:
+        with self._lock:
+            now = time.monotonic()
+            self._trim(now)
+            self._requests.append(now)
+
+    def try_acquire(self) -> bool:
+        """Take one retry from the budget. Returns False if the budget is used up."""
+        with self._lock:
+            now = time.monotonic()
+            self._trim(now)
+            allowed = max(self.min_per_second * self.window, self.ratio * len(self._requests))
+            if len(self._retries) >= allowed:
+                return False
+            self._retries.append(now)
+            return True
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            self._trim(time.monotonic())
+            return {
+                "requests": len(self._requests),
+                "retries": len(self._retries),
+                "window_seconds": self.window
+            }
+
+
+BREAKERS: Dict[str, CircuitBreaker] = {
+    name: CircuitBreaker(name) for name in (LLM, TRANSLATOR, TEXT_ANALYTICS)
+}
+RETRY_BUDGET = RetryBudget()
+
+
+def get_breaker(service: str) -> CircuitBreaker:
+    return BREAKERS[service]
+
+
+def is_failure(error: Exception) -> bool:
+    """Decide whether an error says something about the service's health."""
+    if isinstance(error, DeadlineExceeded):
+        # Skipped calls never reached the service
+        return error.started
+    if isinstance(error, RateLimitExceeded):
+        return False
+    status = getattr(error, "status_code", None)
+    if status is None and getattr(error, "response", None) is not None:
+        status = getattr(error.response, "status_code", None)
+    # Client errors mean the service answered; only throttling counts against it
+    if status is not None and 400 <= status < 500 and status != 429:
+        return False
+    return True
+
+
+def is_retryable(error: Exception) -> bool:
+    """Only retry errors that another attempt could plausibly fix."""
+    if isinstance(error, DeadlineExceeded):
+        return False
+    return is_failure(error)
+
+
+async def call_service(service: str, func, *args, limiter=None, **kwargs):
+    """
+    Call func for the given service through its circuit breaker, bounded by the turn deadline.
+
+    Raises CircuitOpenError straight away if the breaker is open. Failed calls
+    are retried once if the retry budget and the turn deadline allow it.
+    Blocking functions run in a worker thread; coroutine functions are awaited
+    directly and are expected to respect the deadline themselves.
+
+    If a limiter is given, each attempt first waits for a token from it, and a
+    429 response pauses it for the time given in Retry-After.
+    """
+    breaker = get_breaker(service)
+    RETRY_BUDGET.record_request()
+    attempt = 0
+    while True:
+        if not breaker.allow_request():
+            raise CircuitOpenError(f"Circuit breaker for {service} is open")
+        attempt += 1
+        try:
+            if limiter is not None:
+                await limiter.acquire()
+            if asyncio.iscoroutinefunction(func):
+                result = await func(*args, **kwargs)
+            else:
+                result = await run_with_deadline(func, *args, **kwargs)
+        except Exception as e:
+            if limiter is not None:
+                retry_after = retry_after_seconds(e)
+                if retry_after is not None:
+                    limiter.pause(retry_after)
+            if not is_failure(e):
+                if isinstance(e, (DeadlineExceeded, RateLimitExceeded)):
+                    breaker.release()
+                else:
+                    breaker.record_success()
+                raise
+            breaker.record_failure()
+            left = remaining()
+            if attempt > 1 or not is_retryable(e) or (left is not None and left <= 0) or not RETRY_BUDGET.try_acquire():
+                raise
+            continue
+        except BaseException:
+            # Cancelled (hedge, warm-up timeout, client gone): no verdict on the service
+            breaker.release()
+            raise
+        breaker.record_success()
+        return result
+
+
+def snapshot() -> dict:
+    """Current breaker states and retry budget usage, for /health."""
+    return {
+        "breakers": {name: breaker.snapshot() for name, breaker in BREAKERS.items()},
+        "retry_budget": RETRY_BUDGET.snapshot()
+    }
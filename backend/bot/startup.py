@@ -0,0 +1,66 @@
+"""
+Start-up phases of the bot process and whether it is ready for traffic yet.
+
+backend/bot/server.py binds the port straight away and then loads the heavy
+parts of the bot in a background warm-up, timing each part with phase().
+Until mark_ready() is called the server answers /health with "starting".
+"""
+import logging
+import time
+from contextlib import contextmanager
+from typing import Optional
+
+STARTING = "starting"
+READY = "ready"
+FAILED = "failed"
+
+logger = logging.getLogger(__name__)
+
+_process_started = time.monotonic()
+_state = STARTING
+_ready_after: Optional[float] = None
+_error: Optional[str] = None
+_phases = []
+
+
+@contextmanager
+def phase(name: str):
+    """Time one start-up phase."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - started
+        _phases.append({"name": name, "ms": round(elapsed * 1000, 1)})
+        logger.info(f"Start-up phase {name} took {elapsed * 1000:.0f}ms")
+
+
+def mark_ready() -> None:
+    global _state, _ready_after
+    _state = READY
+    _ready_after = time.monotonic() - _process_started
+    logger.info(f"Bot ready {_ready_after:.2f}s after start")
+
+
+def mark_failed(error: Exception) -> None:
+    global _state, _error
+    _state = FAILED
+    _error = f"{type(error).__name__}: {error}"
+
+
+def state() -> str:
+    return _state
+
+
+def is_ready() -> bool:
+    return _state == READY
+
+
+def snapshot() -> dict:
+    return {
+        "state": _state,
+        "uptime_seconds": round(time.monotonic() - _process_started, 2),
+        "ready_after_seconds": round(_ready_after, 2) if _ready_after is not None else None,
+        "phases": list(_phases),
+        "error": _error
+    }
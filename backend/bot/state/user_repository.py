@@ -0,0 +1,102 @@
+"""
+Set-based writes to learners' rows.
+
+add_xp adds XP and moves the level on in a single UPDATE ... RETURNING, so
+the database does the arithmetic under its own row lock: concurrent awards
+for the same learner (two tabs, a retried /send, two bot workers) cannot
+overwrite each other, and an award costs one statement instead of a SELECT,
+an UPDATE and the object reload after it.
+
+The level is 1 + floor(sqrt(xp / 100)) as in backend/common/levels.py, and
+never goes down. SQLite builds without sqrt() get Python's, see
+backend/common/extensions.py.
+
+upsert_scenario_progress records scenario completions for any number of
+learners in one INSERT ... ON CONFLICT (user_id, scenario_name) DO UPDATE.
+"""
+from typing import List, Optional, Tuple
+
+from sqlalchemy import Integer, case, cast, func, literal, select, update
+
+
+def level_expression(xp, dialect_name: str):
+    """SQL for the level at a total XP."""
+    root = func.sqrt(xp / literal(100.0))
+    if dialect_name == "postgresql":
+        # A cast rounds there, so floor first
+        root = func.floor(root)
+    # Otherwise the cast truncates, which is floor for XP >= 0
+    return cast(root, Integer) + 1
+
+
+def add_xp(user_id: int, xp: int) -> Optional[Tuple[int, int]]:
+    """
+    Add XP to a learner in the current session's transaction, without committing.
+
+    Returns the learner's new (xp, level), or None if there is no such learner.
+    """
+    from backend.common import db
+    from backend.models import User
+
+    users = User.__table__
+    dialect_name = db.session.get_bind().dialect.name
+    new_xp = func.coalesce(users.c.xp, 0) + int(xp)
+    new_level = level_expression(new_xp, dialect_name)
+    current_level = func.coalesce(users.c.level, 1)
+    if dialect_name == "postgresql":
+        level = func.greatest(current_level, new_level)
+    else:
+        level = case((new_level > current_level, new_level), else_=current_level)
+
+    statement = update(users).where(users.c.id == int(user_id)).values(xp=new_xp, level=level)
+    if db.session.get_bind().dialect.update_returning:
+        row = db.session.execute(statement.returning(users.c.xp, users.c.level)).first()
+    else:
+        # SQLite before 3.35: still one atomic UPDATE, read back in the same transaction
+        if db.session.execute(statement).rowcount == 0:
+            return None
+        row = db.session.execute(select(users.c.xp, users.c.level).where(users.c.id == int(user_id))).first()
+    return (row.xp, row.level) if row is not None else None
+
+
+def upsert_scenario_progress(completions: List[dict]) -> None:
+    """
+    Record completed scenarios in the current session's transaction, without committing.
+
+    Each completion has user_id, scenario_name, score, high_score and
+    completed_at. An existing row takes the new score and time and keeps the
+    best high score.
+    """
+    if not completions:
+        return
+    from backend.common import db
+    from backend.models import UserScenarioProgress
+
+    progress = UserScenarioProgress.__table__
+    dialect_name = db.session.get_bind().dialect.name
+    if dialect_name == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+        best = func.greatest
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+        best = func.max
+    statement = insert(progress).values([
+        {
+            "user_id": int(completion["user_id"]),
+            "scenario_name": completion["scenario_name"],
+            "completed": True,
+            "score": completion["score"],
+            "high_score": completion["high_score"],
+            "completed_at": completion["completed_at"]
+        }
+        for completion in completions
+    ])
+    db.session.execute(statement.on_conflict_do_update(
+        index_elements=[progress.c.user_id, progress.c.scenario_name],
+        set_={
+            "completed": True,
+            "score": statement.excluded.score,
+            "high_score": best(func.coalesce(progress.c.high_score, 0), statement.excluded.high_score),
+            "completed_at": statement.excluded.completed_at
+        }
+    ))
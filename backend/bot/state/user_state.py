@@ -2,12 +2,14 @@ from backend.models import User
 from backend.common import app  # Ensure this points to your actual Flask app (flask_app.flask_app)
 import uuid
 import logging
-from backend.common import db
+from backend.bot.state import write_behind
+from backend.common.levels import calculate_level, calculate_level_progress
 from typing import Optional, Any, List, Dict
 
 # Configure logging
 logger = logging.getLogger(__name__)
 
+
 class UserProfile:
     def __init__(self):
         self.streak_count = 0
@@ -188,42 +190,25 @@ class UserState:
         - Level 4: 900-1599 XP
         And so on...
         """
-        import math
-        return 1 + math.floor(math.sqrt(xp / 100))
+        return calculate_level(xp)
 
     def update_xp(self, xp: int) -> int:
         """
-        Update the user's XP in the database and handle level ups.
-        Adds the provided XP amount to the user's total.
+        Award XP to the user; the level follows it.
+        The write is queued (see write_behind.py), so this returns without
+        waiting on the database.
         
         Returns:
-            int: The new total XP
+            int: The new total XP as far as this conversation knows
         """
         try:
-            with app.app_context():
-                user = User.query.get(int(self.user_id))
-                if user:
-                    # Store old level to check for level up
-                    old_level = user.level
-                    
-                    # Update XP
-                    old_xp = user.xp or 0
-                    new_xp = old_xp + xp
-                    user.xp = new_xp
-                    self.xp = new_xp  # Update local state too
-                    
-                    # Calculate and update level if needed
-                    new_level = self.calculate_level(new_xp)
-                    if new_level > old_level:
-                        user.level = new_level
-                        logger.info(f"User {self.user_id} leveled up to {new_level}!")
-                    
-                    db.session.commit()
-                    logger.info(f"Updated XP for user {self.user_id}: {old_xp} -> {new_xp}")
-                    return new_xp
-                else:
-                    logger.error(f"User with ID {self.user_id} not found for XP update")
-                    return 0
+            write_behind.submit(write_behind.XpAwarded(self.user_id, xp))
+            old_xp = self.xp or 0
+            self.xp = old_xp + xp  # Update local state too
+            if self.calculate_level(self.xp) > self.calculate_level(old_xp):
+                logger.info(f"User {self.user_id} leveled up to {self.calculate_level(self.xp)}!")
+            logger.info(f"Queued XP for user {self.user_id}: {old_xp} -> {self.xp}")
+            return self.xp
         except Exception as e:
             logger.error(f"Error updating XP: {str(e)}")
             return 0
@@ -242,21 +227,7 @@ class UserState:
         """
         if xp is None:
             xp = self.xp
-            
-        current_level = self.calculate_level(xp)
-        
-        # Calculate XP thresholds for current and next level
-        xp_for_current_level = 100 * (current_level - 1) ** 2
-        xp_for_next_level = 100 * current_level ** 2
-        
-        # Calculate progress percentage within current level
-        if xp_for_next_level == xp_for_current_level:  # Edge case
-            return 100
-            
-        progress = ((xp - xp_for_current_level) / 
-                   (xp_for_next_level - xp_for_current_level)) * 100
-        
-        return int(progress)
+        return calculate_level_progress(xp)
         
     def get_streak_info(self) -> dict:
         """
@@ -278,69 +249,19 @@ class UserState:
             logger.error(f"Error getting streak info: {str(e)}")
             return {"streak_count": 0, "highest_streak": 0, "last_activity_date": None}
             
-    def update_streak(self) -> dict:
+    def update_streak(self) -> None:
         """
-        Update the user's streak based on their last activity date.
-        Returns the updated streak information.
+        Record activity today for the user's streak.
+        The streak itself is worked out when the queued write is applied.
         """
-        from datetime import datetime, timedelta
-        
         try:
-            with app.app_context():
-                user = User.query.get(int(self.user_id))
-                if not user:
-                    logger.error(f"User with ID {self.user_id} not found for streak update")
-                    return {"streak_count": 0, "highest_streak": 0}
-                
-                current_date = datetime.now().date()
-                
-                # Initialize streak fields if they don't exist
-                if not hasattr(user, 'streak_count'):
-                    user.streak_count = 0
-                
-                if not hasattr(user, 'highest_streak'):
-                    user.highest_streak = 0
-                    
-                if not hasattr(user, 'last_activity_date'):
-                    user.last_activity_date = None
-                
-                # If this is the first activity ever
-                if user.last_activity_date is None:
-                    user.streak_count = 1
-                    user.highest_streak = 1
-                    user.last_activity_date = current_date
-                    db.session.commit()
-                    return {"streak_count": 1, "highest_streak": 1}
-                
-                # Get the last activity date
-                last_date = user.last_activity_date
-                
-                # If it's the same day, don't update streak
-                if current_date == last_date:
-                    return {
-                        "streak_count": user.streak_count,
-                        "highest_streak": user.highest_streak
-                    }
-                    
-                # If it's the next day, increment streak
-                if current_date == last_date + timedelta(days=1):
-                    user.streak_count += 1
-                    # Update highest streak if current streak is higher
-                    if user.streak_count > user.highest_streak:
-                        user.highest_streak = user.streak_count
-                # If more than one day has passed, reset streak
-                elif current_date > last_date + timedelta(days=1):
-                    user.streak_count = 1
-                
-                # Update the last activity date to today
-                user.last_activity_date = current_date
-                db.session.commit()
-                
-                return {
-                    "streak_count": user.streak_count,
-                    "highest_streak": user.highest_streak
-                }
-                
+            write_behind.submit(write_behind.StreakTouched(self.user_id))
         except Exception as e:
             logger.error(f"Error updating streak: {str(e)}")
-            return {"streak_count": 0, "highest_streak": 0}
+
+    def record_scenario_completed(self, scenario: str, score: int) -> None:
+        """Queue a scenario completion with its score for the user's progress."""
+        try:
+            write_behind.submit(write_behind.ScenarioCompleted(self.user_id, scenario, score))
+        except Exception as e:
+            logger.error(f"Error recording scenario completion: {str(e)}")
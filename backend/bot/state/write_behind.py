@@ -0,0 +1,562 @@
+"""
+Write-behind queue for the XP, streak and scenario results the bot records.
+
+A scenario's final step used to load the learner's row and commit, once for
+the XP and again for the streak, before the turn could answer. Instead it now
+submits events to this queue and carries on:
+
+- XpAwarded: XP to add to the learner's total (the level follows it).
+- StreakTouched: the learner was active on a day.
+- ScenarioCompleted: a scenario was finished with a score.
+
+Events are coalesced per learner (XP summed, streak days de-duplicated, the
+latest and best score kept per scenario) and a background thread writes them
+every WRITE_BEHIND_FLUSH_MS, or sooner once WRITE_BEHIND_MAX_USERS learners
+are waiting, in one transaction per batch.
+
+Every event is appended to a spool file before submit() returns. When a
+batch is taken for writing its file is sealed under the batch id, and the id
+is committed in write_behind_batch with the batch's changes, so after a crash
+the next start applies exactly the batches that never committed. Each process
+spools into its own directory under WRITE_BEHIND_SPOOL_DIR, holding a lock on
+it (the directory is locked before it is renamed into place, so it is never
+seen unlocked); directories whose owner has died are picked up by the next
+process to start. Set WRITE_BEHIND_FSYNC=true to survive power loss as well as crashes.
+
+Batch ids are only needed while a spool file could still hold that batch, so
+the writer thread regularly deletes the write_behind_batch rows older than
+the oldest spool file (and older than WRITE_BEHIND_BATCH_RETENTION_HOURS, for
+spools of other hosts it cannot see).
+
+A batch that keeps failing for a reason other than the database being
+unreachable or locked is moved to the dead-letter directory of the spool
+after WRITE_BEHIND_MAX_ATTEMPTS, so it does not hold up every later write.
+
+With WRITE_BEHIND_ENABLED=false events are written straight away instead.
+"""
+import atexit
+import datetime
+import glob
+import json
+import logging
+import os
+import shutil
+import socket
+import tempfile
+import threading
+import time
+import uuid
+from typing import Dict, List, Optional, Tuple
+
+try:
+    import fcntl
+except ImportError:  # Windows: spools of dead processes are not recovered automatically
+    fcntl = None
+
+WRITE_BEHIND_ENABLED = os.getenv("WRITE_BEHIND_ENABLED", "true").lower() == "true"
+WRITE_BEHIND_FLUSH_INTERVAL = int(os.getenv("WRITE_BEHIND_FLUSH_MS", "500")) / 1000
+WRITE_BEHIND_MAX_USERS = int(os.getenv("WRITE_BEHIND_MAX_USERS", "200"))
+WRITE_BEHIND_FSYNC = os.getenv("WRITE_BEHIND_FSYNC", "false").lower() == "true"
+# Keep the spool on persistent storage on Azure App Service, like the database
+WRITE_BEHIND_SPOOL_DIR = os.getenv("WRITE_BEHIND_SPOOL_DIR", os.path.join(
+    "/home" if os.getenv("WEBSITE_SITE_NAME") else tempfile.gettempdir(), "lingolizard_write_behind"))
+WRITE_BEHIND_MAX_ATTEMPTS = int(os.getenv("WRITE_BEHIND_MAX_ATTEMPTS", "10"))
+WRITE_BEHIND_BATCH_RETENTION = int(os.getenv("WRITE_BEHIND_BATCH_RETENTION_HOURS", "24")) * 3600
+WRITE_BEHIND_PRUNE_INTERVAL = int(os.getenv("WRITE_BEHIND_PRUNE_SECONDS", "600"))
+DEAD_LETTER_DIR = "dead-letter"
+MAX_BACKOFF = 30
+
+logger = logging.getLogger(__name__)
+
+
+def _utcnow() -> datetime.datetime:
+    return datetime.datetime.now(datetime.timezone.utc)
+
+
+class XpAwarded:
+    kind = "xp"
+
+    def __init__(self, user_id, xp: int):
+        self.user_id = int(user_id)
+        self.xp = int(xp)
+
+    def to_dict(self) -> dict:
+        return {"kind": self.kind, "user_id": self.user_id, "xp": self.xp}
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "XpAwarded":
+        return cls(data["user_id"], data["xp"])
+
+
+class StreakTouched:
+    kind = "streak"
+
+    def __init__(self, user_id, day: Optional[datetime.date] = None):
+        self.user_id = int(user_id)
+        self.day = day or datetime.datetime.now().date()
+
+    def to_dict(self) -> dict:
+        return {"kind": self.kind, "user_id": self.user_id, "day": self.day.isoformat()}
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "StreakTouched":
+        return cls(data["user_id"], datetime.date.fromisoformat(data["day"]))
+
+
+class ScenarioCompleted:
+    kind = "scenario"
+
+    def __init__(self, user_id, scenario: str, score: int, completed_at: Optional[datetime.datetime] = None):
+        self.user_id = int(user_id)
+        self.scenario = scenario
+        self.score = int(score)
+        self.completed_at = completed_at or _utcnow()
+
+    def to_dict(self) -> dict:
+        return {"kind": self.kind, "user_id": self.user_id, "scenario": self.scenario,
+                "score": self.score, "completed_at": self.completed_at.isoformat()}
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "ScenarioCompleted":
+        return cls(data["user_id"], data["scenario"], data["score"],
+                   datetime.datetime.fromisoformat(data["completed_at"]))
+
+
+EVENT_TYPES = {cls.kind: cls for cls in (XpAwarded, StreakTouched, ScenarioCompleted)}
+
+
+class UserWrites:
+    """Everything waiting to be written for one learner, coalesced."""
+
+    def __init__(self):
+        self.xp = 0
+        self.streak_days = set()
+        self.scenarios: Dict[str, dict] = {}
+
+    def add(self, event) -> None:
+        if isinstance(event, XpAwarded):
+            self.xp += event.xp
+        elif isinstance(event, StreakTouched):
+            self.streak_days.add(event.day)
+        elif isinstance(event, ScenarioCompleted):
+            current = self.scenarios.get(event.scenario)
+            if current is None:
+                self.scenarios[event.scenario] = {
+                    "score": event.score, "high_score": event.score, "completed_at": event.completed_at
+                }
+                return
+            current["high_score"] = max(current["high_score"], event.score)
+            if event.completed_at >= current["completed_at"]:
+                current["score"] = event.score
+                current["completed_at"] = event.completed_at
+
+
+def coalesce(events) -> Dict[int, UserWrites]:
+    writes: Dict[int, UserWrites] = {}
+    for event in events:
+        writes.setdefault(event.user_id, UserWrites()).add(event)
+    return writes
+
+
+def touch_streak(user, day: datetime.date) -> None:
+    """Move the learner's streak on for activity on the given day."""
+    if user.last_activity_date is None:
+        user.streak_count = 1
+        user.highest_streak = max(user.highest_streak or 0, 1)
+    elif day <= user.last_activity_date:
+        # Same day, or a late event for a day already counted
+        return
+    elif day == user.last_activity_date + datetime.timedelta(days=1):
+        user.streak_count = (user.streak_count or 0) + 1
+        user.highest_streak = max(user.highest_streak or 0, user.streak_count)
+    else:
+        user.streak_count = 1
+    user.last_activity_date = day
+
+
+def apply_batch(batch_id: str, writes: Dict[int, UserWrites]) -> int:
+    """Write one batch in a single transaction, unless it was committed before; returns learners written."""
+    from backend.common import dashboard, db, get_app
+    from backend.models import User, WriteBehindBatch
+    from backend.bot.state.user_repository import add_xp, upsert_scenario_progress
+
+    with get_app().app_context():
+        try:
+            if db.session.get(WriteBehindBatch, batch_id) is not None:
+                logger.info(f"Write-behind batch {batch_id} was already applied")
+                return 0
+            user_ids = list(writes)
+            users = {user.id: user for user in User.query.filter(User.id.in_(user_ids))}
+            completions = []
+            for user_id, pending in writes.items():
+                user = users.get(user_id)
+                if user is None:
+                    logger.warning(f"Dropping write-behind events for missing user {user_id}")
+                    continue
+                if pending.xp:
+                    # In SQL, so awards from other processes in between are not lost
+                    add_xp(user_id, pending.xp)
+                for day in sorted(pending.streak_days):
+                    touch_streak(user, day)
+                for scenario, completion in pending.scenarios.items():
+                    completions.append(dict(completion, user_id=user_id, scenario_name=scenario))
+            upsert_scenario_progress(completions)
+            # Every Flask worker's cached dashboard for these learners is stale once this commits
+            dashboard.bump_version(*users)
+            db.session.add(WriteBehindBatch(id=batch_id, applied_at=_utcnow()))
+            db.session.commit()
+            return len(users)
+        except Exception:
+            db.session.rollback()
+            raise
+
+
+def prune_batches(spool_root: str) -> int:
+    """Delete the batch ids no spool file can still need; returns how many were deleted."""
+    from backend.common import db, get_app
+    from backend.models import WriteBehindBatch
+
+    cutoff = time.time() - WRITE_BEHIND_BATCH_RETENTION
+    for path in glob.glob(os.path.join(spool_root, "*", "*.jsonl")):
+        if os.path.basename(os.path.dirname(path)) == DEAD_LETTER_DIR:
+            continue
+        try:
+            cutoff = min(cutoff, os.path.getmtime(path))
+        except OSError:
+            pass  # Applied and removed meanwhile
+    cutoff_at = datetime.datetime.fromtimestamp(cutoff, datetime.timezone.utc)
+    with get_app().app_context():
+        try:
+            deleted = WriteBehindBatch.query.filter(WriteBehindBatch.applied_at < cutoff_at).delete(
+                synchronize_session=False)
+            db.session.commit()
+            return deleted
+        except Exception:
+            db.session.rollback()
+            raise
+
+
+def _is_transient(error: Exception) -> bool:
+    """Errors from the database being unreachable or locked, which say nothing about the batch."""
+    from sqlalchemy.exc import DisconnectionError, OperationalError
+
+    return isinstance(error, (OperationalError, DisconnectionError))
+
+
+def _try_lock(path: str, create: bool = True):
+    """Open and lock a file without waiting; the open file while locked, else None."""
+    try:
+        handle = open(path, "a" if create else "r+")
+    except FileNotFoundError:
+        # Its directory was removed meanwhile, or never finished being created
+        return None
+    if fcntl is None:
+        return handle
+    try:
+        fcntl.flock(handle, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        return handle
+    except BlockingIOError:
+        handle.close()
+        return None
+
+
+def _still_linked(handle, path: str) -> bool:
+    """Whether an open file is still the one at path, and not one recover() has since removed."""
+    try:
+        return os.fstat(handle.fileno()).st_ino == os.stat(path).st_ino
+    except OSError:
+        return False
+
+
+def read_events(path: str) -> list:
+    events = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                data = json.loads(line)
+                events.append(EVENT_TYPES[data["kind"]].from_dict(data))
+            except (ValueError, KeyError) as e:
+                # A torn last line from a crash mid-write
+                logger.warning(f"Skipping unreadable write-behind event in {path}: {e}")
+    return events
+
+
+class Spool:
+    """This process's spool directory: the active file events are appended to, and sealed batches."""
+
+    def __init__(self, root: str):
+        self.root = root
+        os.makedirs(root, exist_ok=True)
+        self.dir, self._lock_file = self._claim(f"{socket.gethostname()}-{os.getpid()}")
+        self._active_path = None
+        self._active = None
+        self._open_active()
+
+    def _claim(self, name: str):
+        """
+        Create and lock this process's directory; returns (path, open lock file).
+
+        The directory only appears under its name once it is locked, so another
+        process's recover() can never take it over while this one starts.
+        """
+        path = os.path.join(self.root, name)
+        if fcntl is None:
+            os.makedirs(path, exist_ok=True)
+            return path, _try_lock(os.path.join(path, ".lock"))
+        if os.path.isdir(path):
+            # Left by an earlier process with the same pid: adopt it unless someone else holds it
+            lock = _try_lock(os.path.join(path, ".lock"), create=False)
+            if lock is not None and _still_linked(lock, os.path.join(path, ".lock")):
+                return path, lock
+            if lock is not None:
+                lock.close()
+            path = os.path.join(self.root, f"{name}-{uuid.uuid4().hex[:8]}")
+        staging = os.path.join(self.root, f".new-{uuid.uuid4().hex}")
+        os.makedirs(staging)
+        lock = _try_lock(os.path.join(staging, ".lock"))
+        if lock is None:
+            raise RuntimeError(f"Could not lock the new write-behind spool directory {staging}")
+        os.rename(staging, path)
+        return path, lock
+
+    def _open_active(self) -> None:
+        self._active_path = os.path.join(self.dir, f"active-{uuid.uuid4().hex}.jsonl")
+        self._active = open(self._active_path, "a", encoding="utf-8")
+
+    def append(self, event) -> None:
+        self._active.write(json.dumps(event.to_dict(), separators=(",", ":")) + "\n")
+        self._active.flush()
+        if WRITE_BEHIND_FSYNC:
+            os.fsync(self._active.fileno())
+
+    def seal(self) -> Tuple[str, str]:
+        """Close the active file as a batch and start a new one; returns (batch id, path)."""
+        batch_id = uuid.uuid4().hex
+        path = os.path.join(self.dir, f"batch-{batch_id}.jsonl")
+        self._active.close()
+        os.replace(self._active_path, path)
+        self._open_active()
+        return batch_id, path
+
+    def _take(self, directory: str) -> List[Tuple[str, str]]:
+        batches = []
+        files = sorted(glob.glob(os.path.join(directory, "batch-*.jsonl")) +
+                       glob.glob(os.path.join(directory, "active-*.jsonl")), key=os.path.getmtime)
+        for path in files:
+            if path == self._active_path:
+                continue
+            if os.path.getsize(path) == 0:
+                os.remove(path)
+                continue
+            name = os.path.basename(path)
+            # Unsealed events were never written, so they get a batch id of their own
+            batch_id = name[len("batch-"):-len(".jsonl")] if name.startswith("batch-") else uuid.uuid4().hex
+            target = os.path.join(self.dir, f"batch-{batch_id}.jsonl")
+            os.replace(path, target)
+            batches.append((batch_id, target))
+        return batches
+
+    def recover(self) -> List[Tuple[str, str]]:
+        """Take over the spools of processes that died; returns their batches, oldest first."""
+        # A restarted container often gets the same pid, and so the same directory
+        batches = self._take(self.dir)
+        if fcntl is not None:
+            for other in sorted(glob.glob(os.path.join(self.root, "*"))):
+                if other == self.dir or not os.path.isdir(other) or os.path.basename(other) == DEAD_LETTER_DIR:
+                    continue
+                lock = _try_lock(os.path.join(other, ".lock"), create=False)
+                if lock is None:
+                    continue  # Its process is still running, or someone else is recovering it
+                try:
+                    if _still_linked(lock, os.path.join(other, ".lock")):
+                        batches += self._take(other)
+                        # Removed before unlocking, so a process adopting the directory sees it gone
+                        shutil.rmtree(other, ignore_errors=True)
+                finally:
+                    lock.close()
+            # Directories of processes that died before they finished creating them
+            for staging in glob.glob(os.path.join(self.root, ".new-*")):
+                lock = _try_lock(os.path.join(staging, ".lock"), create=False)
+                if lock is not None:
+                    shutil.rmtree(staging, ignore_errors=True)
+                    lock.close()
+        if batches:
+            logger.info(f"Recovered {len(batches)} write-behind batches from earlier processes")
+        return batches
+
+    def dead_letter(self, batch_id: str, path: str) -> str:
+        """Set a batch that cannot be written aside, out of reach of recovery; returns its new path."""
+        directory = os.path.join(self.root, DEAD_LETTER_DIR)
+        os.makedirs(directory, exist_ok=True)
+        target = os.path.join(directory, f"batch-{batch_id}.jsonl")
+        os.replace(path, target)
+        return target
+
+
+class WriteBehindQueue:
+    """Coalesces submitted events per learner and writes them in batches from a background thread."""
+
+    def __init__(self, spool_dir: str = WRITE_BEHIND_SPOOL_DIR, flush_interval: float = WRITE_BEHIND_FLUSH_INTERVAL,
+                 max_users: int = WRITE_BEHIND_MAX_USERS):
+        self.spool_dir = spool_dir
+        self.flush_interval = flush_interval
+        self.max_users = max_users
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._pending: Dict[int, UserWrites] = {}
+        # Batches taken out of pending and sealed, written oldest first: (batch id, path, writes)
+        self._sealed: List[tuple] = []
+        self._spool: Optional[Spool] = None
+        self._thread: Optional[threading.Thread] = None
+        self.events = 0
+        self.batches = 0
+        self.users_written = 0
+        self.failures = 0
+        self.dead_letters = 0
+        self.pruned = 0
+        self.last_error: Optional[str] = None
+        self.last_flush_ms: Optional[float] = None
+        self._attempts: Dict[str, int] = {}
+        self._last_prune = 0.0
+
+    def start(self) -> None:
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._spool = Spool(self.spool_dir)
+            for batch_id, path in self._spool.recover():
+                self._sealed.append((batch_id, path, coalesce(read_events(path))))
+            self._thread = threading.Thread(target=self._run, name="write-behind", daemon=True)
+            self._thread.start()
+        atexit.register(self.close)
+
+    def submit(self, event) -> None:
+        """Spool the event and queue it; returns without touching the database."""
+        if self._thread is None:
+            self.start()
+        with self._lock:
+            self._spool.append(event)
+            self._pending.setdefault(event.user_id, UserWrites()).add(event)
+            self.events += 1
+            full = len(self._pending) >= self.max_users
+        if full:
+            self._wake.set()
+
+    def _seal(self) -> None:
+        with self._lock:
+            if not self._pending:
+                return
+            batch_id, path = self._spool.seal()
+            self._sealed.append((batch_id, path, self._pending))
+            self._pending = {}
+
+    def flush(self) -> None:
+        """Write everything submitted so far; raises if the database write fails, keeping the batch."""
+        if self._spool is None:
+            return
+        with self._flush_lock:
+            self._seal()
+            while self._sealed:
+                batch_id, path, writes = self._sealed[0]
+                started = time.perf_counter()
+                try:
+                    self.users_written += apply_batch(batch_id, writes)
+                except Exception as e:
+                    if self._give_up(batch_id, path, e):
+                        continue
+                    raise
+                self.last_flush_ms = round((time.perf_counter() - started) * 1000, 1)
+                self.batches += 1
+                self._sealed.pop(0)
+                self._attempts.pop(batch_id, None)
+                os.remove(path)
+
+    def _give_up(self, batch_id: str, path: str, error: Exception) -> bool:
+        """Count a failed attempt at the oldest batch; after too many, dead-letter it and return True."""
+        if _is_transient(error):
+            return False
+        attempts = self._attempts[batch_id] = self._attempts.get(batch_id, 0) + 1
+        if attempts < WRITE_BEHIND_MAX_ATTEMPTS:
+            return False
+        self._sealed.pop(0)
+        del self._attempts[batch_id]
+        self.dead_letters += 1
+        target = self._spool.dead_letter(batch_id, path)
+        logger.error(f"Write-behind batch {batch_id} failed {attempts} times, moved to {target}: {error}")
+        return True
+
+    def _prune(self) -> None:
+        if time.monotonic() - self._last_prune < WRITE_BEHIND_PRUNE_INTERVAL:
+            return
+        self._last_prune = time.monotonic()
+        try:
+            self.pruned += prune_batches(self.spool_dir)
+        except Exception as e:
+            logger.warning(f"Could not prune write-behind batch ids: {e}")
+
+    def _run(self) -> None:
+        backoff = self.flush_interval
+        while True:
+            self._wake.wait(backoff)
+            self._wake.clear()
+            try:
+                self.flush()
+                backoff = self.flush_interval
+                self._prune()
+            except Exception as e:
+                self.failures += 1
+                self.last_error = str(e)
+                backoff = min(max(backoff * 2, 1.0), MAX_BACKOFF)
+                logger.error(f"Write-behind flush failed, retrying in {backoff:.0f}s: {e}")
+
+    def close(self) -> None:
+        try:
+            self.flush()
+        except Exception as e:
+            logger.error(f"Write-behind flush at exit failed, the spool keeps the events: {e}")
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                "pending_users": len(self._pending),
+                "sealed_batches": len(self._sealed),
+                "events": self.events,
+                "batches": self.batches,
+                "users_written": self.users_written,
+                "failures": self.failures,
+                "dead_letters": self.dead_letters,
+                "pruned_batch_ids": self.pruned,
+                "last_error": self.last_error,
+                "last_flush_ms": self.last_flush_ms,
+                "spool": self._spool.dir if self._spool else None
+            }
+
+
+_queue: Optional[WriteBehindQueue] = None
+_queue_lock = threading.Lock()
+
+
+def get_queue() -> WriteBehindQueue:
+    global _queue
+    with _queue_lock:
+        if _queue is None:
+            _queue = WriteBehindQueue()
+        return _queue
+
+
+def submit(event) -> None:
+    """Queue an event, or write it at once when the write-behind queue is turned off."""
+    if not WRITE_BEHIND_ENABLED:
+        apply_batch(uuid.uuid4().hex, coalesce([event]))
+        return
+    get_queue().submit(event)
+
+
+def flush() -> None:
+    if _queue is not None:
+        _queue.flush()
+
+
+def snapshot() -> Optional[dict]:
+    return _queue.snapshot() if _queue is not None else None
@@ -0,0 +1,163 @@
+"""
+Warm-up of the bot's connections and caches before it takes traffic.
+
+Without it the first learners after a deploy pay for DNS lookups, TLS
+handshakes, building the service clients, the SDKs' lazy imports and the
+first MainDialog construction. run() does all of that once:
+
+- connections: one cheap request to every AI endpoint, the Translator and
+  Text Analytics, each through the client the turns use, so the pooled
+  connection and everything behind it is ready;
+- translations: the fixed phrases the scenarios pass to translate_text (the
+  phrasebook, read from the dialog sources) are translated into every
+  language in WARMUP_LANGUAGES and put in the translation cache;
+- dialogs: MainDialog and its scenario dialogs are built once.
+
+/ready on bot_app.app answers 503 until run() has finished and 200 after, for
+the load balancer. A step that fails is reported but does not hold readiness
+back: a dependency that is down should open its breaker, not keep the bot out
+of rotation. In cassette replay mode no service is contacted.
+
+Settings: WARMUP_ENABLED (default true), WARMUP_TIMEOUT_MS per step
+(default 10000), WARMUP_TRANSLATIONS (default true) and WARMUP_LANGUAGES, a
+comma separated list of learner languages (default all of them).
+"""
+import ast
+import asyncio
+import glob
+import logging
+import os
+import time
+from functools import lru_cache
+from typing import List, Optional
+
+from backend.bot.services import recorder
+
+WARMUP_ENABLED = os.getenv("WARMUP_ENABLED", "true").lower() == "true"
+WARMUP_TIMEOUT = int(os.getenv("WARMUP_TIMEOUT_MS", "10000")) / 1000
+WARMUP_TRANSLATIONS = os.getenv("WARMUP_TRANSLATIONS", "true").lower() == "true"
+WARMUP_LANGUAGES = [lang.strip() for lang in os.getenv("WARMUP_LANGUAGES", "").split(",") if lang.strip()]
+
+PENDING = "pending"
+RUNNING = "running"
+READY = "ready"
+
+DIALOGS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "dialogs")
+
+logger = logging.getLogger(__name__)
+
+_state = PENDING
+_steps = []
+_started: Optional[float] = None
+_finished: Optional[float] = None
+_task: Optional[asyncio.Task] = None
+
+
+class _WarmUpUser:
+    """Just enough of UserState to build the dialogs without a learner."""
+
+    def get_language(self):
+        return "english"
+
+
+@lru_cache(maxsize=1)
+def phrasebook() -> List[str]:
+    """The string literals the dialogs pass straight to translate_text."""
+    phrases = []
+    for path in sorted(glob.glob(os.path.join(DIALOGS_DIR, "*.py"))):
+        with open(path, encoding="utf-8") as f:
+            tree = ast.parse(f.read(), path)
+        for node in ast.walk(tree):
+            if (isinstance(node, ast.Call) and getattr(node.func, "attr", None) == "translate_text"
+                    and node.args and isinstance(node.args[0], ast.Constant) and isinstance(node.args[0].value, str)):
+                phrases.append(node.args[0].value)
+    return list(dict.fromkeys(phrases))
+
+
+async def _step(name: str, work) -> None:
+    started = time.perf_counter()
+    step = {"name": name, "ok": True}
+    try:
+        await asyncio.wait_for(work(), WARMUP_TIMEOUT)
+    except Exception as e:
+        step["ok"] = False
+        step["error"] = f"{type(e).__name__}: {e}"
+        logger.warning(f"Warm-up step {name} failed: {step['error']}")
+    step["ms"] = round((time.perf_counter() - started) * 1000, 1)
+    _steps.append(step)
+
+
+def _connection_steps():
+    from backend.bot.dialogs import base_dialog
+    from backend.bot.services.llm_router import get_router
+
+    steps = [
+        (f"connect.ai.{endpoint.endpoint}", lambda e=endpoint: asyncio.to_thread(e.warm_up, WARMUP_TIMEOUT))
+        for endpoint in get_router().endpoints
+    ]
+    if os.getenv("TRANSLATOR_ENDPOINT"):
+        steps.append(("connect.translator", lambda: asyncio.to_thread(base_dialog.warm_translator, WARMUP_TIMEOUT)))
+    if os.getenv("TEXT_ANALYTICS_ENDPOINT"):
+        steps.append(("connect.text_analytics",
+                      lambda: asyncio.to_thread(base_dialog.warm_text_analytics, WARMUP_TIMEOUT)))
+    return steps
+
+
+def _translation_steps():
+    from backend.bot.dialogs import base_dialog
+
+    languages = WARMUP_LANGUAGES or list(base_dialog.LANGUAGE_CODE_MAP)
+    return [
+        (f"translations.{language}",
+         lambda code=base_dialog.LANGUAGE_CODE_MAP[language]: base_dialog.prime_translation_cache(code, phrasebook()))
+        for language in languages if language in base_dialog.LANGUAGE_CODE_MAP
+    ]
+
+
+def _build_dialogs() -> None:
+    from backend.bot.dialogs.main_dialog import MainDialog
+    MainDialog(_WarmUpUser(), None)
+
+
+async def _run() -> None:
+    global _state, _started, _finished
+    _state = RUNNING
+    _started = time.monotonic()
+    if WARMUP_ENABLED:
+        await _step("dialogs", lambda: asyncio.to_thread(_build_dialogs))
+        if recorder.CASSETTE_MODE != recorder.REPLAY:
+            steps = _connection_steps()
+            if WARMUP_TRANSLATIONS and os.getenv("TRANSLATOR_ENDPOINT"):
+                steps += _translation_steps()
+            await asyncio.gather(*(_step(name, work) for name, work in steps))
+    _finished = time.monotonic()
+    _state = READY
+    failed = [step["name"] for step in _steps if not step["ok"]]
+    logger.info(f"Warm-up finished in {_finished - _started:.2f}s"
+                + (f", failed steps: {', '.join(failed)}" if failed else ""))
+
+
+def start() -> asyncio.Task:
+    """Start the warm-up once on the running loop; later calls return the same task."""
+    global _task
+    if _task is None:
+        _task = asyncio.ensure_future(_run())
+    return _task
+
+
+async def run() -> None:
+    """Run the warm-up, or wait for the one already running."""
+    await start()
+
+
+def is_ready() -> bool:
+    return _state == READY
+
+
+def snapshot() -> dict:
+    return {
+        "state": _state,
+        "seconds": round((_finished or time.monotonic()) - _started, 2) if _started is not None else None,
+        "phrases": len(phrasebook()) if WARMUP_TRANSLATIONS else 0,
+        "steps": list(_steps)
+    }
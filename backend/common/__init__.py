@@ -1,5 +1,6 @@
 import os
 import logging
+import threading
 from flask import Flask, redirect, request, jsonify
 from dotenv import load_dotenv
 from backend.common.extensions import db, bcrypt
@@ -9,7 +10,8 @@ from flask_migrate import Migrate
 load_dotenv()
 
 # Setup logging
-logging.basicConfig(level=logging.INFO, format="%(asctime)s | %(levelname)s | %(message)s")
+from backend.logging_config import configure_logging
+configure_logging()
 logger = logging.getLogger(__name__)
 
 # Determine environment
@@ -28,118 +30,100 @@ else:
 default_db_path = os.path.join(storage_path, "lingolizard.db")
 DB_PATH = os.getenv("DB_PATH", default_db_path)
 
-# Only create local storage if using SQLite
-if "postgresql" not in os.getenv("DATABASE_URL", ""):
-    os.makedirs(os.path.dirname(DB_PATH), exist_ok=True)
-
-logger.info(f"Using database path: {DB_PATH}")
-
-# Initialise Flask app
-app = Flask(__name__, template_folder=TEMPLATE_DIR)
-
-# Flask config
-app.config["SQLALCHEMY_DATABASE_URI"] = os.getenv("DATABASE_URL", f"sqlite:///{DB_PATH}")
-app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
-app.config["SESSION_COOKIE_SECURE"] = True
-app.config["SESSION_COOKIE_HTTPONLY"] = True
-app.config["SESSION_COOKIE_SAMESITE"] = "Lax"
-app.secret_key = os.getenv("SECRET_KEY", os.urandom(24))
-
-# Azure App Config fallback
-connection_string = os.getenv("AZURE_APP_CONFIG_CONNECTION_STRING")
-if connection_string:
-    try:
-        from azure.appconfiguration import AzureAppConfigurationClient
-        client = AzureAppConfigurationClient.from_connection_string(connection_string)
-        app.secret_key = client.get_configuration_setting(key="FLASK_SECRET").value
-        logger.info("Successfully loaded secret key from Azure App Configuration")
-    except Exception as e:
-        logger.warning(f"Could not load secret key from Azure: {e}")
-
-# Init extensions
-db.init_app(app)
-bcrypt.init_app(app)
-migrate = Migrate(app, db)
-
-# Initialise DB and users
-with app.app_context():
-    try:
-        db.create_all()
-        from backend.models import User
-        user_count = User.query.count()
-
-        if user_count == 0:
-            logger.info("Database exists but has no users. Creating default users...")
-
-            if not User.query.filter_by(username="admin").first():
-                db.session.add(User(
-                    username="admin",
-                    password=bcrypt.generate_password_hash("adminpass").decode("utf-8"),
-                    language="english",
-                    xp=0,
-                    level=1,
-                    admin=True
-                ))
-
-            if not User.query.filter_by(username="testuser").first():
-                db.session.add(User(
-                    username="testuser",
-                    password=bcrypt.generate_password_hash("testpass").decode("utf-8"),
-                    language="spanish",
-                    xp=0,
-                    level=1,
-                    admin=False
-                ))
-
-            db.session.commit()
-            logger.info(f"Created default users. Now have {User.query.count()} users.")
-        else:
-            logger.info(f"Database already has {user_count} users. Skipping default user creation.")
-
-    except Exception as e:
-        logger.error(f"Database initialization error: {e}", exc_info=True)
-        logger.error(f"Current directory: {os.getcwd()}")
-        logger.error(f"DB path: {DB_PATH}")
-        logger.error(f"Directory writable: {os.access(os.path.dirname(DB_PATH), os.W_OK)}")
-
-# Root route
-@app.route("/")
-def index():
-    return redirect("/login")
-
-# Handle 400 errors gracefully
-@app.errorhandler(400)
-def handle_bad_request(e):
-    logger.error(f"Bad request error: {str(e)}")
-    return jsonify({
-        "status": "error",
-        "message": "Bad Request: The server could not understand the request.",
-        "details": str(e)
-    }), 400
-
-# DB health check
-@app.route("/db-health")
-def db_health():
-    try:
+
+def create_app() -> Flask:
+    """
+    Build the shared Flask app the bot uses for database access.
+
+    Nothing here touches the database: tables and default users are created
+    once per deployment by backend/common/bootstrap.py.
+    """
+    # Only create local storage if using SQLite
+    if "postgresql" not in os.getenv("DATABASE_URL", ""):
+        os.makedirs(os.path.dirname(DB_PATH), exist_ok=True)
+
+    logger.info(f"Using database path: {DB_PATH}")
+
+    app = Flask(__name__, template_folder=TEMPLATE_DIR)
+
+    # Flask config
+    app.config["SQLALCHEMY_DATABASE_URI"] = os.getenv("DATABASE_URL", f"sqlite:///{DB_PATH}")
+    app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
+    app.config["SESSION_COOKIE_SECURE"] = True
+    app.config["SESSION_COOKIE_HTTPONLY"] = True
+    app.config["SESSION_COOKIE_SAMESITE"] = "Lax"
+
+    # Azure App Config fallback, from the process-wide settings cache if it has loaded
+    from backend.common import configuration
+    app.secret_key = configuration.get("FLASK_SECRET") or os.getenv("SECRET_KEY") or os.urandom(24)
+
+    # Init extensions
+    db.init_app(app)
+    bcrypt.init_app(app)
+    Migrate(app, db)
+    from backend.common import health
+    health.init_app(app, db, "common")
+
+    # Root route
+    @app.route("/")
+    def index():
+        return redirect("/login")
+
+    # Handle 400 errors gracefully
+    @app.errorhandler(400)
+    def handle_bad_request(e):
+        logger.error(f"Bad request error: {str(e)}")
+        return jsonify({
+            "status": "error",
+            "message": "Bad Request: The server could not understand the request.",
+            "details": str(e)
+        }), 400
+
+    # DB health check, from the cached snapshot; ?verbose runs it now (rate-limited)
+    @app.route("/db-health")
+    def db_health():
         if request.args and not all(k in ['format', 'verbose'] for k in request.args):
             return jsonify({
                 "status": "error",
                 "message": "Invalid query parameters"
             }), 400
 
-        from backend.models import User
-        user_count = User.query.count()
-        return jsonify({
-            "status": "healthy",
-            "database": "connected",
-            "users": user_count,
-            "db_path": DB_PATH
-        })
-    except Exception as e:
-        logger.error(f"Database health check failed: {e}")
+        monitor = app.extensions["health"]
+        ready, report = monitor.deep() if "verbose" in request.args else monitor.ready()
+        database = report["checks"].get("database", {})
+        if ready:
+            return jsonify({
+                "status": "healthy",
+                "database": "connected",
+                "age_seconds": report.get("age_seconds"),
+                "db_path": DB_PATH
+            })
+        logger.error(f"Database health check failed: {database.get('error') or report['status']}")
         return jsonify({
             "status": "unhealthy",
             "database": "disconnected",
-            "error": str(e),
+            "error": database.get("error") or report["status"],
             "db_path": DB_PATH
         }), 500
+
+    return app
+
+
+_app = None
+_app_lock = threading.Lock()
+
+
+def get_app() -> Flask:
+    """The shared app for this process, built on first use."""
+    global _app
+    with _app_lock:
+        if _app is None:
+            _app = create_app()
+        return _app
+
+
+def __getattr__(name):
+    # `from backend.common import app` builds the app only when something asks for it
+    if name == "app":
+        return get_app()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
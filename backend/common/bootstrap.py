@@ -0,0 +1,198 @@
+"""
+One-time database set-up: the tables and the default accounts.
+
+Creating a Flask app never touches the database. Instead this runs once per
+deployment, either as a release step:
+
+    python -m backend.common.bootstrap
+
+or from the entry points (app_flask.py, and the bot's warm-up), where it costs
+a single query once the database has been set up. Completed runs are recorded
+in the app_bootstrap table under BOOTSTRAP_VERSION, so bump that when the
+set-up changes. Processes that start together wait on a lock (an advisory lock
+on PostgreSQL, a lock file next to the database on SQLite) and only the first
+one does the work.
+"""
+import argparse
+import datetime
+import logging
+import os
+import time
+from contextlib import contextmanager
+
+from sqlalchemy import text
+from sqlalchemy.exc import DBAPIError
+
+from backend.common.extensions import db, bcrypt
+
+try:
+    import fcntl
+except ImportError:  # Windows: SQLite's own locking is all we have
+    fcntl = None
+
+BOOTSTRAP_VERSION = 4  # 2: write_behind_batch, 3: unique progress index, 4: user.dashboard_version
+BOOTSTRAP_LOCK_TIMEOUT = int(os.getenv("BOOTSTRAP_LOCK_TIMEOUT_MS", "60000")) / 1000
+ADVISORY_LOCK_KEY = 7320431  # Any constant shared by every process of the app
+
+logger = logging.getLogger(__name__)
+
+
+def is_bootstrapped(engine) -> bool:
+    try:
+        with engine.connect() as conn:
+            return conn.execute(
+                text("SELECT 1 FROM app_bootstrap WHERE version = :version"), {"version": BOOTSTRAP_VERSION}
+            ).first() is not None
+    except DBAPIError:
+        # No app_bootstrap table yet
+        return False
+
+
+def _wait_for(acquire, what: str) -> None:
+    deadline = time.monotonic() + BOOTSTRAP_LOCK_TIMEOUT
+    while not acquire():
+        if time.monotonic() > deadline:
+            raise TimeoutError(f"Gave up waiting {BOOTSTRAP_LOCK_TIMEOUT}s for the {what}")
+        time.sleep(0.1)
+
+
+@contextmanager
+def bootstrap_lock(engine):
+    """Hold a lock shared by every process that uses this database."""
+    if engine.dialect.name == "postgresql":
+        with engine.connect() as conn:
+            def acquire():
+                return conn.execute(text("SELECT pg_try_advisory_lock(:key)"), {"key": ADVISORY_LOCK_KEY}).scalar()
+            _wait_for(acquire, "bootstrap advisory lock")
+            try:
+                yield
+            finally:
+                conn.execute(text("SELECT pg_advisory_unlock(:key)"), {"key": ADVISORY_LOCK_KEY})
+        return
+
+    database = engine.url.database
+    if fcntl is None or not database or database == ":memory:":
+        yield
+        return
+    with open(f"{database}.bootstrap.lock", "w") as lock_file:
+        def acquire():
+            try:
+                fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                return True
+            except BlockingIOError:
+                return False
+        _wait_for(acquire, "bootstrap lock file")
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def _add_columns() -> None:
+    """Add columns declared since a table was created, which create_all leaves out."""
+    from sqlalchemy import inspect
+
+    connection = db.session.connection()
+    columns = {column["name"] for column in inspect(connection).get_columns("user")}
+    if "dashboard_version" not in columns:
+        connection.execute(text('ALTER TABLE "user" ADD COLUMN dashboard_version INTEGER NOT NULL DEFAULT 0'))
+
+
+def _create_indexes() -> None:
+    """Add indexes declared since a table was created, which create_all leaves out."""
+    from backend.models import UserScenarioProgress
+
+    connection = db.session.connection()
+    progress = UserScenarioProgress.__table__
+    # The unique index would fail on duplicate rows: keep the newest, with the best score
+    connection.execute(text(
+        "UPDATE user_scenario_progress SET high_score = (SELECT MAX(other.high_score) "
+        "FROM user_scenario_progress other WHERE other.user_id = user_scenario_progress.user_id "
+        "AND other.scenario_name = user_scenario_progress.scenario_name)"
+    ))
+    connection.execute(text(
+        "DELETE FROM user_scenario_progress WHERE id NOT IN "
+        "(SELECT MAX(id) FROM user_scenario_progress GROUP BY user_id, scenario_name)"
+    ))
+    for index in progress.indexes:
+        index.create(bind=connection, checkfirst=True)
+
+
+def _create_default_users() -> None:
+    from backend.models import User
+
+    if db.session.query(User.id).first() is not None:
+        logger.info("Database already has users. Skipping default user creation.")
+        return
+
+    logger.info("Database has no users. Creating default users...")
+    db.session.add(User(
+        username="admin",
+        password=bcrypt.generate_password_hash("adminpass").decode("utf-8"),
+        language="english",
+        xp=0,
+        level=1,
+        admin=True
+    ))
+    db.session.add(User(
+        username="testuser",
+        password=bcrypt.generate_password_hash("testpass").decode("utf-8"),
+        language="spanish",
+        xp=0,
+        level=1,
+        admin=False
+    ))
+
+
+def bootstrap(app) -> bool:
+    """Set up the app's database unless it already has been; True if this call did the work."""
+    with app.app_context():
+        engine = db.engine
+        if is_bootstrapped(engine):
+            return False
+
+        with bootstrap_lock(engine):
+            # Another process may have finished while we waited for the lock
+            if is_bootstrapped(engine):
+                return False
+
+            started = time.perf_counter()
+            import backend.models  # noqa: F401 - registers the tables
+            db.create_all()
+            db.session.execute(text(
+                "CREATE TABLE IF NOT EXISTS app_bootstrap (version INTEGER PRIMARY KEY, completed_at VARCHAR(32))"
+            ))
+            _add_columns()
+            _create_indexes()
+            _create_default_users()
+            db.session.execute(
+                text("INSERT INTO app_bootstrap (version, completed_at) VALUES (:version, :completed_at)"),
+                {"version": BOOTSTRAP_VERSION, "completed_at": datetime.datetime.utcnow().isoformat()}
+            )
+            db.session.commit()
+            logger.info(f"Bootstrapped database {engine.url.render_as_string(hide_password=True)} "
+                        f"(version {BOOTSTRAP_VERSION}) in {(time.perf_counter() - started) * 1000:.0f}ms")
+            return True
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Create the tables and default users, once per deployment.")
+    parser.parse_args()
+
+    from backend.common import get_app
+    from backend.flask_app.flask_app import create_app
+
+    # The website and the bot can be configured with different databases
+    done = set()
+    for app in (create_app(), get_app()):
+        uri = app.config["SQLALCHEMY_DATABASE_URI"]
+        if uri in done:
+            continue
+        done.add(uri)
+        if not bootstrap(app):
+            logger.info(f"Database {uri.split('@')[-1]} is already bootstrapped")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,180 @@
+"""
+One cached copy of the Azure App Configuration settings per process.
+
+Every setting the bot and the Flask app read from App Configuration is
+fetched with a single list call and kept in memory. A background thread
+repeats that call every CONFIG_REFRESH_SECONDS and only applies the result
+when the version, a hash of the settings' ETags, has changed. Nothing on the
+request path ever waits on App Configuration: the only wait is at start-up
+(for the bot, in the warm-up's configuration phase), bounded by
+CONFIG_LOAD_TIMEOUT_MS. Dialogs call start(timeout=0), which never waits. After
+that a failing store just keeps the last good values while the thread backs
+off.
+
+Settings are exported to the environment, where the rest of the code reads
+them, unless the environment already set them at start-up; local overrides
+always win. A key deleted from the store is removed from the environment
+again. Code that reads a setting once (for example when building a
+client) keeps the value it read until the process restarts.
+"""
+import hashlib
+import logging
+import os
+import threading
+import time
+from typing import Dict, Optional
+
+from backend.common.retry_after import retry_after_seconds
+
+CONFIG_REFRESH_INTERVAL = int(os.getenv("CONFIG_REFRESH_SECONDS", "300"))
+CONFIG_LOAD_TIMEOUT = int(os.getenv("CONFIG_LOAD_TIMEOUT_MS", "5000")) / 1000
+CONFIG_MAX_BACKOFF = 600
+
+# Settings the services read from App Configuration
+CONFIG_KEYS = (
+    "AI_API_KEY",
+    "AI_ENDPOINT",
+    "AI_ENDPOINTS",
+    "TRANSLATOR_KEY",
+    "TRANSLATOR_ENDPOINT",
+    "TRANSLATOR_LOCATION",
+    "TEXT_ANALYTICS_KEY",
+    "TEXT_ANALYTICS_ENDPOINT",
+    "MicrosoftAppId",
+    "MicrosoftAppPassword",
+    "FLASK_SECRET"
+)
+
+logger = logging.getLogger(__name__)
+
+
+class ConfigurationService:
+    """Loads the configured keys in one call and keeps them fresh in the background."""
+
+    def __init__(self, connection_string: Optional[str], keys=CONFIG_KEYS, refresh_interval=CONFIG_REFRESH_INTERVAL):
+        self.connection_string = connection_string
+        self.keys = set(keys)
+        self.refresh_interval = refresh_interval
+        # Values set in the environment before loading are never replaced
+        self.overridden = {key for key in self.keys if os.getenv(key)}
+        self.values: Dict[str, str] = {}
+        self.version: Optional[str] = None
+        self.loaded = threading.Event()
+        self.last_refresh: Optional[float] = None
+        self.last_error: Optional[str] = None
+        self.refreshes = 0
+        self._client = None
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+
+    def _get_client(self):
+        if self._client is None:
+            from azure.appconfiguration import AzureAppConfigurationClient
+            self._client = AzureAppConfigurationClient.from_connection_string(self.connection_string, retry_total=0)
+        return self._client
+
+    def refresh(self) -> bool:
+        """Fetch every setting in one list call; returns True if anything changed."""
+        settings = {
+            setting.key: (setting.value, setting.etag)
+            for setting in self._get_client().list_configuration_settings(fields=["key", "value", "etag"])
+            if setting.key in self.keys
+        }
+        version = hashlib.sha1(
+            "".join(f"{key}={etag};" for key, (_, etag) in sorted(settings.items())).encode("utf-8")
+        ).hexdigest()[:16]
+        self.refreshes += 1
+        self.last_refresh = time.time()
+        self.last_error = None
+        if version == self.version:
+            return False
+
+        with self._lock:
+            removed = set(self.values)
+            self.values = {key: value for key, (value, _) in settings.items() if value is not None}
+            self.version = version
+            removed -= set(self.values)
+        for key, value in self.values.items():
+            if key not in self.overridden:
+                os.environ[key] = value
+        # Keys deleted from the store stop applying too, rather than keeping their old value
+        for key in removed - self.overridden:
+            os.environ.pop(key, None)
+        logger.info(f"Loaded {len(self.values)} settings from Azure App Configuration (version {version})")
+        return True
+
+    def _run(self) -> None:
+        backoff = 1.0
+        while True:
+            try:
+                self.refresh()
+                backoff = 1.0
+                delay = self.refresh_interval
+            except Exception as e:
+                self.last_error = str(e)
+                logger.warning(f"Could not refresh Azure App Configuration, keeping the last values: {e}")
+                delay = max(backoff, retry_after_seconds(e) or 0)
+                backoff = min(backoff * 2, CONFIG_MAX_BACKOFF)
+            finally:
+                self.loaded.set()
+            time.sleep(delay)
+
+    def start(self, timeout: float = CONFIG_LOAD_TIMEOUT) -> bool:
+        """
+        Start the refresh thread once and wait up to timeout for the first load; True if settings were loaded.
+
+        Only the first call waits; with a timeout of 0 it never does, as on the request path.
+        """
+        if not self.connection_string:
+            self.loaded.set()
+            return False
+        with self._lock:
+            first = self._thread is None
+            if first:
+                self._thread = threading.Thread(target=self._run, name="app-config-refresh", daemon=True)
+                self._thread.start()
+        if timeout <= 0 or not first:
+            return self.version is not None
+        if not self.loaded.wait(timeout):
+            logger.warning(f"Azure App Configuration did not load within {timeout}s. Using environment variables.")
+        return self.version is not None
+
+    def get(self, key: str, default: Optional[str] = None) -> Optional[str]:
+        if key in self.overridden:
+            return os.getenv(key, default)
+        return self.values.get(key, os.getenv(key, default))
+
+    def snapshot(self) -> dict:
+        return {
+            "source": "Azure App Configuration" if self.connection_string else "environment",
+            "version": self.version,
+            "keys": len(self.values),
+            "refreshes": self.refreshes,
+            "age_seconds": round(time.time() - self.last_refresh, 1) if self.last_refresh else None,
+            "last_error": self.last_error
+        }
+
+
+_service: Optional[ConfigurationService] = None
+_service_lock = threading.Lock()
+
+
+def get_service() -> ConfigurationService:
+    global _service
+    with _service_lock:
+        if _service is None:
+            _service = ConfigurationService(os.getenv("AZURE_APP_CONFIG_CONNECTION_STRING"))
+        return _service
+
+
+def start(timeout: float = CONFIG_LOAD_TIMEOUT) -> bool:
+    """Load the settings for this process, once; later calls return straight away."""
+    return get_service().start(timeout)
+
+
+def get(key: str, default: Optional[str] = None) -> Optional[str]:
+    return get_service().get(key, default)
+
+
+def snapshot() -> dict:
+    return get_service().snapshot()
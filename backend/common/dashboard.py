@@ -0,0 +1,134 @@
+"""
+The learner's dashboard: what /profile and /scenarios show, read in one query.
+
+get(user_id) loads the User with its scenario progress joined in a single
+SELECT and builds a Dashboard (XP, level progress, streaks, completed and
+unlocked scenarios), which is cached per learner for
+DASHBOARD_CACHE_TTL_SECONDS.
+
+Every write to anything a dashboard shows calls bump_version() in its
+transaction, which increments user.dashboard_version. The bot's write-behind
+queue does so for XP, streaks and progress, so the bump lands with the writes
+themselves, in whichever process makes them. A cached dashboard is only
+served while its version is still the learner's current one. Checking costs a
+primary-key lookup instead of the joined SELECT, and every Flask worker sees
+a write as soon as it commits.
+"""
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Iterable, List, Optional
+
+from backend.common.levels import calculate_level_progress
+
+DASHBOARD_CACHE_TTL = int(os.getenv("DASHBOARD_CACHE_TTL_SECONDS", "30"))
+DASHBOARD_CACHE_SIZE = int(os.getenv("DASHBOARD_CACHE_SIZE", "1000"))
+
+# Scenarios by tier; each tier unlocks once every scenario before it is completed
+SCENARIO_TIERS = {
+    'beginner': ['taxi', 'restaurant', 'shopping'],
+    'intermediate': ['hotel', 'doctor'],
+    'advanced': ['interview']
+}
+
+
+def unlocked_scenarios(completed: Iterable[str], admin: bool = False) -> List[str]:
+    if admin:
+        # Admins can access everything
+        return [s for tier in SCENARIO_TIERS.values() for s in tier]
+    completed = set(completed)
+    unlocked = []
+    for tier in SCENARIO_TIERS.values():
+        unlocked += tier
+        if not completed.issuperset(tier):
+            break
+    return unlocked
+
+
+class Dashboard:
+    """A read-only view of one learner, for templates."""
+
+    def __init__(self, user):
+        self.id = user.id
+        self.username = user.username
+        self.language = user.language
+        self.admin = bool(user.admin)
+        self.xp = user.xp or 0
+        self.level = user.level or 1
+        self.level_progress = calculate_level_progress(self.xp)
+        self.streak_count = user.streak_count or 0
+        self.highest_streak = user.highest_streak or 0
+        self.last_activity_date = user.last_activity_date
+        self.completed_scenarios = sorted(p.scenario_name for p in user.scenario_progress if p.completed)
+        self.unlocked_scenarios = unlocked_scenarios(self.completed_scenarios, self.admin)
+        self.version = user.dashboard_version or 0
+        self.built_at = time.monotonic()
+
+
+_cache: "OrderedDict[int, Dashboard]" = OrderedDict()
+_lock = threading.Lock()
+
+
+def load(user_id) -> Optional[Dashboard]:
+    """Build a learner's dashboard from the database: one SELECT with the progress rows joined."""
+    from sqlalchemy.orm import joinedload
+    from backend.models import User
+
+    user = User.query.options(joinedload(User.scenario_progress)).filter(User.id == int(user_id)).first()
+    return Dashboard(user) if user is not None else None
+
+
+def current_version(user_id) -> Optional[int]:
+    """The learner's dashboard version in the database, or None if there is no such learner."""
+    from sqlalchemy import select
+    from backend.common.extensions import db
+    from backend.models import User
+
+    row = db.session.execute(select(User.dashboard_version).where(User.id == int(user_id))).first()
+    return (row[0] or 0) if row is not None else None
+
+
+def get(user_id) -> Optional[Dashboard]:
+    """The learner's dashboard, from the cache while it is current; None if there is no such learner."""
+    user_id = int(user_id)
+    now = time.monotonic()
+    with _lock:
+        dashboard = _cache.get(user_id)
+    if dashboard is not None and now - dashboard.built_at < DASHBOARD_CACHE_TTL:
+        if current_version(user_id) == dashboard.version:
+            with _lock:
+                if user_id in _cache:
+                    _cache.move_to_end(user_id)
+            return dashboard
+
+    dashboard = load(user_id)
+    with _lock:
+        if dashboard is None:
+            _cache.pop(user_id, None)
+            return None
+        _cache[user_id] = dashboard
+        _cache.move_to_end(user_id)
+        while len(_cache) > DASHBOARD_CACHE_SIZE:
+            _cache.popitem(last=False)
+    return dashboard
+
+
+def bump_version(*user_ids) -> None:
+    """
+    Mark the learners' dashboards as changed, in the current session's transaction, without committing.
+
+    Every worker rebuilds its cached copy on the next read after the commit.
+    """
+    if not user_ids:
+        return
+    from sqlalchemy import func, update
+    from backend.common.extensions import db
+    from backend.models import User
+
+    users = User.__table__
+    db.session.execute(
+        update(users)
+        .where(users.c.id.in_([int(user_id) for user_id in user_ids]))
+        .values(dashboard_version=func.coalesce(users.c.dashboard_version, 0) + 1)
+    )
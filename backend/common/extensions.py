@@ -1,7 +1,24 @@
+import math
+import sqlite3
+
 from flask_sqlalchemy import SQLAlchemy
 from flask_bcrypt import Bcrypt
 from flask_wtf import CSRFProtect
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
 
 db = SQLAlchemy()
 bcrypt = Bcrypt()
 csrf = CSRFProtect()
+
+
+@event.listens_for(Engine, "connect")
+def _add_sqlite_sqrt(dbapi_connection, connection_record):
+    """Give SQLite builds without their maths functions a sqrt(), used for levels."""
+    if not isinstance(dbapi_connection, sqlite3.Connection):
+        return
+    try:
+        dbapi_connection.execute("SELECT sqrt(1)")
+    except sqlite3.OperationalError:
+        dbapi_connection.create_function("sqrt", 1, lambda x: None if x is None else math.sqrt(x),
+                                         deterministic=True)
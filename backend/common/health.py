@@ -0,0 +1,158 @@
+"""
+Health checks that load balancers and probes can call as often as they like.
+
+There are three levels, all answered without blocking on a dependency:
+
+- live: the process is up and serving. Constant time, touches nothing.
+- ready: the result of the dependency checks (for example SELECT 1 on the
+  database) from a snapshot that a background thread refreshes every
+  HEALTH_REFRESH_SECONDS. The snapshot counts as not ready once it is older
+  than HEALTH_MAX_AGE_SECONDS, so a stuck refresh is noticed.
+- deep: runs the checks now, at most once per HEALTH_DEEP_MIN_INTERVAL_SECONDS
+  per process; callers in between get the last deep result.
+
+The refresh thread starts with the first readiness probe, so building an app
+stays free of side effects, and its queries run outside any request.
+"""
+import logging
+import os
+import threading
+import time
+from typing import Callable, Dict, Optional, Tuple
+
+HEALTH_REFRESH_INTERVAL = int(os.getenv("HEALTH_REFRESH_SECONDS", "15"))
+HEALTH_MAX_AGE = int(os.getenv("HEALTH_MAX_AGE_SECONDS", "60"))
+HEALTH_DEEP_MIN_INTERVAL = int(os.getenv("HEALTH_DEEP_MIN_INTERVAL_SECONDS", "30"))
+# How long the very first readiness probe waits for the first snapshot
+FIRST_SNAPSHOT_WAIT = 2.0
+
+logger = logging.getLogger(__name__)
+
+
+class HealthMonitor:
+    """Runs named dependency checks in the background and answers probes from the result."""
+
+    def __init__(self, service: str, refresh_interval: int = HEALTH_REFRESH_INTERVAL,
+                 max_age: int = HEALTH_MAX_AGE, deep_min_interval: int = HEALTH_DEEP_MIN_INTERVAL):
+        self.service = service
+        self.refresh_interval = refresh_interval
+        self.max_age = max_age
+        self.deep_min_interval = deep_min_interval
+        self.checks: Dict[str, Callable[[], None]] = {}
+        self.started = time.time()
+        self._snapshot: Optional[dict] = None
+        self._deep: Optional[dict] = None
+        self._first_snapshot = threading.Event()
+        self._lock = threading.Lock()
+        self._deep_lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+
+    def add_check(self, name: str, check: Callable[[], None]) -> None:
+        """Register a check; it passes unless it raises."""
+        self.checks[name] = check
+
+    def run_checks(self) -> dict:
+        results = {}
+        for name, check in self.checks.items():
+            started = time.perf_counter()
+            try:
+                check()
+                results[name] = {"ok": True, "error": None}
+            except Exception as e:
+                results[name] = {"ok": False, "error": str(e)}
+            results[name]["ms"] = round((time.perf_counter() - started) * 1000, 1)
+        return {"checked_at": time.time(), "checks": results}
+
+    def refresh(self) -> dict:
+        snapshot = self.run_checks()
+        with self._lock:
+            self._snapshot = snapshot
+        self._first_snapshot.set()
+        failed = [name for name, result in snapshot["checks"].items() if not result["ok"]]
+        if failed:
+            logger.warning(f"Health checks failing for {self.service}: {', '.join(failed)}")
+        return snapshot
+
+    def _run(self) -> None:
+        while True:
+            try:
+                self.refresh()
+            except Exception as e:
+                logger.error(f"Health refresh failed: {e}")
+            time.sleep(self.refresh_interval)
+
+    def ensure_started(self) -> None:
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name=f"{self.service}-health", daemon=True)
+                self._thread.start()
+
+    def live(self) -> dict:
+        return {"status": "alive", "service": self.service, "uptime_seconds": round(time.time() - self.started, 1)}
+
+    def _report(self, snapshot: Optional[dict]) -> Tuple[bool, dict]:
+        if snapshot is None:
+            return False, {"status": "starting", "service": self.service, "checks": {}}
+        age = time.time() - snapshot["checked_at"]
+        ok = age <= self.max_age and all(result["ok"] for result in snapshot["checks"].values())
+        if ok:
+            status = "ready"
+        elif age > self.max_age:
+            status = "stale"
+        else:
+            status = "degraded"
+        return ok, {
+            "status": status,
+            "service": self.service,
+            "age_seconds": round(age, 1),
+            "checks": snapshot["checks"]
+        }
+
+    def ready(self) -> Tuple[bool, dict]:
+        """Readiness from the latest background snapshot; never runs a check itself."""
+        self.ensure_started()
+        self._first_snapshot.wait(FIRST_SNAPSHOT_WAIT)
+        with self._lock:
+            snapshot = self._snapshot
+        return self._report(snapshot)
+
+    def deep(self) -> Tuple[bool, dict]:
+        """Run the checks now unless a deep check ran recently or is running; then reuse its result."""
+        cached = True
+        deep = self._deep
+        due = deep is None or time.time() - deep["checked_at"] >= self.deep_min_interval
+        if due and self._deep_lock.acquire(blocking=False):
+            try:
+                deep = self._deep = self.refresh()
+                cached = False
+            finally:
+                self._deep_lock.release()
+        if deep is None:
+            # Another caller is running the first deep check
+            return self.ready()
+        ok, report = self._report(deep)
+        report["deep"] = True
+        report["cached"] = cached
+        if cached:
+            report["next_deep_check_in_seconds"] = max(
+                0, round(self.deep_min_interval - (time.time() - deep["checked_at"]), 1))
+        return ok, report
+
+
+def database_check(app, db) -> Callable[[], None]:
+    """A check that runs SELECT 1 on the app's database."""
+    from sqlalchemy import text
+
+    def check() -> None:
+        with app.app_context():
+            with db.engine.connect() as conn:
+                conn.execute(text("SELECT 1"))
+    return check
+
+
+def init_app(app, db, service: str) -> HealthMonitor:
+    """Attach a monitor with a database check to a Flask app, as app.extensions["health"]."""
+    monitor = HealthMonitor(service)
+    monitor.add_check("database", database_check(app, db))
+    app.extensions["health"] = monitor
+    return monitor
@@ -0,0 +1,20 @@
+"""
+Levels from XP, shared by the bot, which awards XP, and the website, which shows it.
+
+The level is 1 + floor(sqrt(xp / 100)): level 2 at 100 XP, 3 at 400, 4 at
+900, and so on.
+"""
+import math
+
+
+def calculate_level(xp: int) -> int:
+    """Level for a total XP: 1 + floor(sqrt(xp / 100))."""
+    return 1 + math.floor(math.sqrt(xp / 100))
+
+
+def calculate_level_progress(xp: int) -> int:
+    """Percentage, 0-100, of the way from the current level to the next."""
+    current_level = calculate_level(xp)
+    xp_for_current_level = 100 * (current_level - 1) ** 2
+    xp_for_next_level = 100 * current_level ** 2
+    return int((xp - xp_for_current_level) / (xp_for_next_level - xp_for_current_level) * 100)
@@ -0,0 +1,30 @@
+"""
+Reading Retry-After from the errors the HTTP clients raise.
+
+Shared by the bot's rate limiters and the App Configuration refresh thread.
+"""
+import time
+from email.utils import parsedate_to_datetime
+from typing import Optional
+
+
+def retry_after_seconds(error: Exception) -> Optional[float]:
+    """Read the Retry-After header from a 429 error raised by requests, azure-core or openai."""
+    response = getattr(error, "response", None)
+    status = getattr(error, "status_code", None) or getattr(response, "status_code", None)
+    if status != 429:
+        return None
+    headers = getattr(response, "headers", None) or {}
+    try:
+        if headers.get("retry-after-ms"):
+            return float(headers["retry-after-ms"]) / 1000
+        value = headers.get("Retry-After")
+        if value is None:
+            return 1.0
+        try:
+            return float(value)
+        except ValueError:
+            # Retry-After may also be an HTTP date
+            return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return 1.0
@@ -0,0 +1,118 @@
+"""
+Statistical sampling profiler that can be switched on for a few seconds.
+
+While a session runs, a background thread wakes every interval, reads the
+current Python stack of every other thread with sys._current_frames() and
+counts each distinct stack. The result is returned in the collapsed-stack
+format ("frame;frame;frame count") read by flamegraph.pl, speedscope and
+similar tools.
+
+Nothing runs while profiling is off. While it is on, the cost is one stack
+walk per thread per interval, limited by MIN_INTERVAL, MAX_SECONDS and
+MAX_DEPTH, and only one session can run at a time.
+"""
+import math
+import os
+import sys
+import threading
+import time
+from collections import Counter
+
+MAX_SECONDS = int(os.getenv("PROFILER_MAX_SECONDS", "60"))
+MIN_INTERVAL = 0.001
+DEFAULT_INTERVAL = 0.01
+MAX_DEPTH = 128
+
+# Leaf frames of threads that are parked rather than doing work
+IDLE_FRAMES = {
+    ("threading.py", "wait"),
+    ("selectors.py", "select"),
+    ("queue.py", "get"),
+    ("thread.py", "_worker"),
+    ("socket.py", "accept"),
+    ("socketserver.py", "serve_forever")
+}
+
+
+class ProfilerBusy(Exception):
+    """Raised when a profiling session is already running."""
+
+
+_session_lock = threading.Lock()
+
+
+def _frame_label(frame, lines: bool) -> str:
+    code = frame.f_code
+    filename = code.co_filename
+    module = frame.f_globals.get("__name__") or os.path.basename(filename)
+    if lines:
+        return f"{code.co_name} ({module}:{frame.f_lineno})"
+    return f"{code.co_name} ({module})"
+
+
+def _is_idle(frame) -> bool:
+    return (os.path.basename(frame.f_code.co_filename), frame.f_code.co_name) in IDLE_FRAMES
+
+
+def profile(seconds: float, interval: float = DEFAULT_INTERVAL, lines: bool = False,
+            include_idle: bool = False) -> dict:
+    """
+    Sample every thread for the given time and return the counted stacks.
+
+    Blocks the calling thread, so async callers should run it with
+    asyncio.to_thread. Raises ProfilerBusy if another session is running,
+    and ValueError if seconds or interval is not a finite number.
+    """
+    seconds, interval = float(seconds), float(interval)
+    if not (math.isfinite(seconds) and math.isfinite(interval)):
+        raise ValueError("seconds and interval must be finite numbers")
+    seconds = min(max(seconds, 0.1), MAX_SECONDS)
+    # An interval longer than the session would hold the session lock long after it should end
+    interval = min(max(interval, MIN_INTERVAL), seconds)
+    if not _session_lock.acquire(blocking=False):
+        raise ProfilerBusy("A profiling session is already running")
+    try:
+        stacks = Counter()
+        own_thread = threading.get_ident()
+        samples = 0
+        names = {}
+        deadline = time.monotonic() + seconds
+        while time.monotonic() < deadline:
+            if len(names) != threading.active_count():
+                names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_thread or (not include_idle and _is_idle(frame)):
+                    continue
+                labels = []
+                while frame is not None and len(labels) < MAX_DEPTH:
+                    labels.append(_frame_label(frame, lines))
+                    frame = frame.f_back
+                labels.append(f"thread:{names.get(thread_id, thread_id)}")
+                stacks[";".join(reversed(labels))] += 1
+            samples += 1
+            time.sleep(max(0.0, min(interval, deadline - time.monotonic())))
+        return {"seconds": seconds, "interval": interval, "samples": samples, "stacks": stacks}
+    finally:
+        _session_lock.release()
+
+
+def collapsed(result: dict) -> str:
+    """Render a profile as collapsed stacks, most frequent first."""
+    return "\n".join(f"{stack} {count}" for stack, count in result["stacks"].most_common()) + "\n"
+
+
+def parse_options(args) -> dict:
+    """Read seconds, interval_ms, lines and idle from query parameters; ValueError unless they are finite numbers."""
+    def flag(name: str) -> bool:
+        return str(args.get(name, "false")).lower() in ("1", "true", "yes")
+
+    seconds = float(args.get("seconds", "10"))
+    interval_ms = float(args.get("interval_ms", DEFAULT_INTERVAL * 1000))
+    if not (math.isfinite(seconds) and math.isfinite(interval_ms)):
+        raise ValueError("seconds and interval_ms must be finite numbers")
+    return {
+        "seconds": seconds,
+        "interval": interval_ms / 1000,
+        "lines": flag("lines"),
+        "include_idle": flag("idle")
+    }
@@ -0,0 +1,202 @@
+"""
+Lightweight distributed tracing with W3C traceparent propagation.
+
+A chat message is traced from Flask's /send, through the bot's
+/api/messages, down to each waterfall step and external call. Flask sends
+the current span in a traceparent header and the bot continues the same
+trace from it, so both halves of a turn share one trace id.
+
+Finished spans are queued and written as JSON lines, by a listener thread, to
+a rotating file per service in TRACE_DIR, so a span never waits on the disk;
+if the queue fills up, spans are dropped. TRACE_SAMPLE_RATE of new traces are
+recorded, 10% by default. deployment/trace_report.py reads those files and prints where the
+time went in the slowest turns.
+"""
+import atexit
+import contextvars
+import functools
+import inspect
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import re
+import tempfile
+import time
+from typing import Optional
+
+from backend import logging_config
+
+TRACING_ENABLED = os.getenv("TRACING_ENABLED", "true").lower() == "true"
+TRACE_DIR = os.getenv("TRACE_DIR", os.path.join(tempfile.gettempdir(), "lingolizard_traces"))
+# Fraction of new traces that are recorded; traces started elsewhere keep their sampled flag
+TRACE_SAMPLE_RATE = float(os.getenv("TRACE_SAMPLE_RATE", "0.1"))
+TRACE_QUEUE_SIZE = int(os.getenv("TRACE_QUEUE_SIZE", "10000"))
+TRACE_FILE_MAX_BYTES = int(os.getenv("TRACE_FILE_MAX_MB", "20")) * 1024 * 1024
+TRACE_FILE_BACKUPS = int(os.getenv("TRACE_FILE_BACKUPS", "5"))
+
+TRACEPARENT_HEADER = "traceparent"
+_TRACEPARENT = re.compile(r"^00-([0-9a-f]{32})-([0-9a-f]{16})-([0-9a-f]{2})$")
+
+logger = logging.getLogger(__name__)
+
+_current_span = contextvars.ContextVar("current_span", default=None)
+_service = "app"
+_exporter: Optional[logging.Logger] = None
+_listener: Optional[logging.handlers.QueueListener] = None
+
+
+class _SpanQueueHandler(logging_config.NonBlockingQueueHandler):
+    """Queues the span dict as it is; it is only turned into JSON on the listener thread."""
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+
+class _SpanFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        return json.dumps(record.msg, default=str)
+
+
+def _stop_listener() -> None:
+    """Write out the spans still queued."""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+# Flush whatever is still queued when the process exits
+atexit.register(_stop_listener)
+
+
+def configure(service: str) -> None:
+    """Name the service spans are recorded under and start writing its span file."""
+    global _service, _exporter, _listener
+    _service = service
+    if not TRACING_ENABLED:
+        return
+    _stop_listener()
+    try:
+        os.makedirs(TRACE_DIR, exist_ok=True)
+        handler = logging.handlers.RotatingFileHandler(
+            os.path.join(TRACE_DIR, f"{service}-spans.jsonl"),
+            maxBytes=TRACE_FILE_MAX_BYTES,
+            backupCount=TRACE_FILE_BACKUPS,
+            encoding="utf-8"
+        )
+        handler.setFormatter(_SpanFormatter())
+        queue_handler = _SpanQueueHandler(queue.Queue(maxsize=TRACE_QUEUE_SIZE))
+        exporter = logging.getLogger(f"lingolizard.spans.{service}")
+        exporter.handlers = [queue_handler]
+        exporter.setLevel(logging.INFO)
+        exporter.propagate = False
+        _listener = logging.handlers.QueueListener(queue_handler.queue, handler)
+        _listener.start()
+        _exporter = exporter
+        logger.info(f"Writing {service} trace spans to {TRACE_DIR}")
+    except OSError as e:
+        logger.warning(f"Tracing disabled, could not open {TRACE_DIR}: {e}")
+
+
+def _new_id(length: int) -> str:
+    return f"{random.getrandbits(length * 4):0{length}x}"
+
+
+def parse_traceparent(header: Optional[str]):
+    """Return (trace_id, parent_span_id, sampled) from a traceparent header, or None if invalid."""
+    match = _TRACEPARENT.match((header or "").strip().lower())
+    if not match or match.group(1) == "0" * 32 or match.group(2) == "0" * 16:
+        return None
+    return match.group(1), match.group(2), int(match.group(3), 16) & 1 == 1
+
+
+class Span:
+    """One timed operation. Use as a context manager; it becomes the parent of spans started inside it."""
+
+    def __init__(self, name: str, traceparent: Optional[str] = None, **attributes):
+        self.name = name
+        self.attributes = attributes
+        self.status = "ok"
+        parent = _current_span.get()
+        incoming = parse_traceparent(traceparent) if traceparent else None
+        if incoming:
+            self.trace_id, self.parent_id, self.sampled = incoming
+        elif parent is not None:
+            self.trace_id, self.parent_id, self.sampled = parent.trace_id, parent.span_id, parent.sampled
+        else:
+            self.trace_id, self.parent_id = _new_id(32), None
+            self.sampled = random.random() < TRACE_SAMPLE_RATE
+        self.span_id = _new_id(16)
+
+    @property
+    def traceparent(self) -> str:
+        """Header value that makes a downstream service continue this trace under this span."""
+        return f"00-{self.trace_id}-{self.span_id}-{'01' if self.sampled else '00'}"
+
+    def set(self, **attributes) -> None:
+        self.attributes.update(attributes)
+
+    def __enter__(self):
+        self.start = time.time()
+        self._started = time.perf_counter()
+        self._token = _current_span.set(self)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        duration = time.perf_counter() - self._started
+        _current_span.reset(self._token)
+        if exc is not None and self.status == "ok":
+            self.status = "error"
+            self.attributes.setdefault("error", f"{exc_type.__name__}: {exc}")
+        if self.sampled and _exporter is not None:
+            _exporter.info({
+                "trace_id": self.trace_id,
+                "span_id": self.span_id,
+                "parent_id": self.parent_id,
+                "service": _service,
+                "name": self.name,
+                "start": round(self.start, 6),
+                "duration_ms": round(duration * 1000, 3),
+                "status": self.status,
+                "attributes": dict(self.attributes)
+            })
+        return False
+
+
+def start_span(name: str, traceparent: Optional[str] = None, **attributes) -> Span:
+    """Start a span under the current one, or continue the trace in a traceparent header."""
+    return Span(name, traceparent, **attributes)
+
+
+def current_span() -> Optional[Span]:
+    return _current_span.get()
+
+
+def _log_context() -> dict:
+    span = _current_span.get()
+    return {"trace_id": span.trace_id, "span_id": span.span_id} if span is not None else {}
+
+
+# Lets log lines from a turn be matched with its trace
+logging_config.register_context(_log_context)
+
+
+def traced(name: str):
+    """Decorator that runs a function or coroutine function inside a span."""
+    def decorator(func):
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                with Span(name):
+                    return await func(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with Span(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
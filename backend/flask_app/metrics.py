@@ -0,0 +1,170 @@
+"""
+Request metrics for the Flask app, served at /metrics.
+
+MetricsMiddleware wraps the WSGI app and times every request. While a request
+runs, SQLAlchemy engine events, Flask's template signals and the bot proxy in
+/send add their time to it. The breakdown is recorded in per-endpoint
+histograms and returned in a Server-Timing header, so browser devtools show
+where the time in /profile, /scenarios or /send went.
+"""
+import contextvars
+import time
+from typing import Optional
+
+from flask import Response, before_render_template, request, template_rendered
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from backend.common.metrics import CONTENT_TYPE, Registry
+
+REGISTRY = Registry()
+
+REQUEST_SECONDS = REGISTRY.histogram(
+    "flask_request_seconds", "Time to handle a request, by endpoint, method and status.",
+    ["endpoint", "method", "status"])
+REQUESTS_IN_FLIGHT = REGISTRY.gauge(
+    "flask_requests_in_flight", "Requests currently being handled.")
+DB_QUERIES = REGISTRY.counter(
+    "flask_db_queries_total", "SQL statements executed, by endpoint.", ["endpoint"])
+DB_SECONDS = REGISTRY.histogram(
+    "flask_db_seconds", "Time spent in SQL statements per request, by endpoint.", ["endpoint"])
+TEMPLATE_SECONDS = REGISTRY.histogram(
+    "flask_template_seconds", "Time spent rendering templates per request, by endpoint.", ["endpoint"])
+BOT_SECONDS = REGISTRY.histogram(
+    "flask_bot_wait_seconds", "Time spent waiting for each reply from the bot service, by outcome.", ["outcome"])
+
+_current = contextvars.ContextVar("request_timings", default=None)
+
+
+class RequestTimings:
+    """Time spent by one request in each part of the stack."""
+
+    def __init__(self):
+        self.endpoint = "unmatched"
+        self.db_count = 0
+        self.db_time = 0.0
+        self.template_time = 0.0
+        self.bot_time = 0.0
+        self.render_started = None
+
+    def server_timing(self, total: float) -> str:
+        parts = [f"db;desc=\"{self.db_count} queries\";dur={self.db_time * 1000:.1f}"]
+        if self.template_time:
+            parts.append(f"tpl;dur={self.template_time * 1000:.1f}")
+        if self.bot_time:
+            parts.append(f"bot;dur={self.bot_time * 1000:.1f}")
+        parts.append(f"app;dur={total * 1000:.1f}")
+        return ", ".join(parts)
+
+
+def current() -> Optional[RequestTimings]:
+    """Timings for the request being handled on this thread, if any."""
+    return _current.get()
+
+
+class track_bot_call:
+    """Times one request to the bot service and adds it to the current request's timings."""
+
+    def __init__(self):
+        self.outcome = "ok"
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        elapsed = time.perf_counter() - self.started
+        if exc is not None:
+            self.outcome = type(exc).__name__
+        BOT_SECONDS.observe(elapsed, outcome=self.outcome)
+        timings = _current.get()
+        if timings is not None:
+            timings.bot_time += elapsed
+        return False
+
+
+class MetricsMiddleware:
+    """WSGI middleware recording request metrics and adding a Server-Timing header."""
+
+    def __init__(self, wsgi_app):
+        self.wsgi_app = wsgi_app
+
+    def __call__(self, environ, start_response):
+        timings = RequestTimings()
+        token = _current.set(timings)
+        started = time.perf_counter()
+        status_code = ["500"]
+
+        def timed_start_response(status, headers, exc_info=None):
+            status_code[0] = status.split(" ", 1)[0]
+            # The view has finished by the time its headers are sent
+            headers.append(("Server-Timing", timings.server_timing(time.perf_counter() - started)))
+            return start_response(status, headers, exc_info)
+
+        REQUESTS_IN_FLIGHT.inc()
+        try:
+            return self.wsgi_app(environ, timed_start_response)
+        finally:
+            elapsed = time.perf_counter() - started
+            REQUESTS_IN_FLIGHT.dec()
+            REQUEST_SECONDS.observe(elapsed, endpoint=timings.endpoint,
+                                    method=environ.get("REQUEST_METHOD", ""), status=status_code[0])
+            DB_QUERIES.inc(timings.db_count, endpoint=timings.endpoint)
+            DB_SECONDS.observe(timings.db_time, endpoint=timings.endpoint)
+            if timings.template_time:
+                TEMPLATE_SECONDS.observe(timings.template_time, endpoint=timings.endpoint)
+            _current.reset(token)
+
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("flask_query_started", []).append(time.perf_counter())
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = conn.info["flask_query_started"].pop()
+    timings = _current.get()
+    if timings is not None:
+        timings.db_count += 1
+        timings.db_time += time.perf_counter() - started
+
+
+@event.listens_for(Engine, "handle_error")
+def _handle_error(context):
+    started = context.connection.info.get("flask_query_started") if context.connection is not None else None
+    if started:
+        started.pop()
+
+
+def _before_render(sender, template, context, **extra):
+    timings = _current.get()
+    if timings is not None:
+        timings.render_started = time.perf_counter()
+
+
+def _after_render(sender, template, context, **extra):
+    timings = _current.get()
+    if timings is not None and timings.render_started is not None:
+        timings.template_time += time.perf_counter() - timings.render_started
+        timings.render_started = None
+
+
+def _record_endpoint():
+    timings = _current.get()
+    if timings is not None:
+        # The URL rule rather than the path, so label values stay bounded
+        timings.endpoint = request.endpoint or "unmatched"
+
+
+def metrics_endpoint():
+    return Response(REGISTRY.render(), headers={"Content-Type": CONTENT_TYPE})
+
+
+def init_app(app):
+    """Install the middleware, signal handlers and /metrics route on the app."""
+    app.wsgi_app = MetricsMiddleware(app.wsgi_app)
+    app.before_request(_record_endpoint)
+    before_render_template.connect(_before_render, app)
+    template_rendered.connect(_after_render, app)
+    app.add_url_rule("/metrics", "metrics", metrics_endpoint)
@@ -1,9 +1,25 @@
-from flask import Blueprint, render_template, redirect, session, request
+from flask import Blueprint, render_template, redirect, session, request, jsonify, Response
 from backend.models import User
 from backend.common.extensions import db
+from backend.common import dashboard, sampling_profiler
+import hmac
+import os
 
 admin_bp = Blueprint("admin", __name__, template_folder="templates")
 
+# Lets monitoring tools use the /debug endpoints without an admin session
+DEBUG_ADMIN_TOKEN = os.getenv("DEBUG_ADMIN_TOKEN")
+
+def is_debug_authorised():
+    """Allow a logged-in admin, or a request carrying DEBUG_ADMIN_TOKEN."""
+    supplied = request.headers.get("X-Admin-Token", "")
+    if DEBUG_ADMIN_TOKEN and supplied and hmac.compare_digest(supplied.encode(), DEBUG_ADMIN_TOKEN.encode()):
+        return True
+    if "user_id" not in session:
+        return False
+    user = User.query.get(session["user_id"])
+    return bool(user and user.admin)
+
 @admin_bp.route("/admin", methods=["GET", "POST"])
 def admin_tools():
     if "user_id" not in session:
@@ -19,7 +35,27 @@ def admin_tools():
         if new_language:
             user.language = new_language.lower()
 
+        dashboard.bump_version(user.id)
         db.session.commit()
         return redirect("/admin")
 
     return render_template("admin.html", user=user)
+
+@admin_bp.route("/debug/profile")
+def sampling_profile():
+    """Sample every thread for a few seconds and return collapsed stacks for a flame graph."""
+    if not is_debug_authorised():
+        return jsonify({"error": "Admin access required"}), 403
+    try:
+        options = sampling_profiler.parse_options(request.args)
+    except ValueError:
+        return jsonify({"error": "seconds and interval_ms must be numbers"}), 400
+    try:
+        result = sampling_profiler.profile(**options)
+    except sampling_profiler.ProfilerBusy as e:
+        return jsonify({"error": str(e)}), 409
+    return Response(
+        sampling_profiler.collapsed(result),
+        mimetype="text/plain",
+        headers={"X-Profile-Samples": str(result["samples"])}
+    )
@@ -1,54 +1,64 @@
-from flask import Blueprint, jsonify, current_app
+from flask import Blueprint, jsonify, current_app, request
 import os
 import sys
 import platform
-import sqlalchemy
 
 health_bp = Blueprint('health', __name__)
 
+# Static details, worked out once rather than on every probe
+SYSTEM_INFO = {
+    'python_version': sys.version,
+    'platform': platform.platform(),
+    'environment': os.environ.get('ENVIRONMENT', 'development')
+}
+
+
+@health_bp.route('/health/live', methods=['GET'])
+def liveness():
+    """Liveness probe: constant time, touches nothing."""
+    return jsonify(current_app.extensions['health'].live()), 200
+
+
+@health_bp.route('/health/ready', methods=['GET'])
+def readiness():
+    """Readiness probe: 503 unless the background dependency snapshot is recent and passing."""
+    ready, report = current_app.extensions['health'].ready()
+    return jsonify(report), 200 if ready else 503
+
+
 @health_bp.route('/health', methods=['GET'])
 @health_bp.route('/', methods=['GET'])  # Add root route for Azure default health checks
 def health_check():
-    """Health check endpoint for the Flask application."""
-    # Basic system info
-    system_info = {
-        'python_version': sys.version,
-        'platform': platform.platform(),
-        'environment': os.environ.get('ENVIRONMENT', 'development')
-    }
-    
-    # Database check
-    db_status = 'unknown'
-    db_error = None
-    try:
-        # Import here to avoid circular imports
-        from backend.common.extensions import db
-        
-        # Check if we can connect to the database with a simple query
-        with db.engine.connect() as conn:
-            conn.execute(sqlalchemy.text('SELECT 1'))
-        db_status = 'connected'
-    except Exception as e:
-        db_status = 'error'
-        db_error = str(e)
-    
+    """
+    Health check endpoint for the Flask application.
+
+    Reads the cached dependency snapshot; ?deep=1 runs the checks now, rate-limited.
+    """
+    monitor = current_app.extensions['health']
+    if request.args.get('deep') in ('1', 'true'):
+        ready, report = monitor.deep()
+    else:
+        ready, report = monitor.ready()
+    database = report['checks'].get('database', {})
+
     # App configuration check
     config_status = {
         'secret_key': 'configured' if current_app.secret_key else 'missing',
         'database_url': current_app.config.get('SQLALCHEMY_DATABASE_URI', 'not_set').split(':')[0]
     }
-    
+
     response = {
-        'status': 'healthy' if db_status == 'connected' else 'degraded',
+        'status': 'healthy' if ready else 'degraded',
         'service': 'flask',
-        'system': system_info,
+        'system': SYSTEM_INFO,
         'database': {
-            'status': db_status,
-            'error': db_error
+            'status': 'connected' if database.get('ok') else ('unknown' if not database else 'error'),
+            'error': database.get('error')
         },
-        'config': config_status
+        'config': config_status,
+        'checks': report
     }
-    
+
     # Always return 200 for health checks to avoid deployment failures,
     # but include detailed status in the response body
     return jsonify(response), 200
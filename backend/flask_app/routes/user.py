@@ -1,5 +1,8 @@
 from flask import Blueprint, render_template, redirect, session, request, jsonify
-from backend.models import User, UserScenarioProgress
+from backend.models import User
+from backend.flask_app import metrics
+from backend.common import dashboard, tracing
+from backend.logging_config import PAYLOAD
 import requests
 import os
 import logging
@@ -9,23 +12,21 @@ import traceback
 user_bp = Blueprint("user", __name__, template_folder="templates")
 BOT_URL = os.getenv("BOT_URL", "http://localhost:3978")
 
+# Total time /send waits for the bot across all retries, in seconds
+BOT_TURN_BUDGET = int(os.getenv("BOT_TURN_BUDGET_MS", "15000")) / 1000
+# Time kept back from the bot's deadline for the network and response handling
+BOT_DEADLINE_MARGIN = int(os.getenv("BOT_DEADLINE_MARGIN_MS", "1000")) / 1000
+
 @user_bp.route("/profile")
 def profile():
     if "user_id" not in session:
         return redirect("/login")
-        
-    user = User.query.get(session["user_id"])
-    
-    # Calculate level progress
-    from backend.bot.state.user_state import UserState
-    user_state = UserState(str(user.id))
-    user.level_progress = user_state.calculate_level_progress(user.xp)
-    
-    # Get streak info if available
-    streak_info = user_state.get_streak_info()
-    user.streak_count = streak_info.get("streak_count", 0)
-    user.highest_streak = streak_info.get("highest_streak", 0)
-    
+
+    # XP, level progress and streaks in one query, or none while cached
+    user = dashboard.get(session["user_id"])
+    if user is None:
+        return redirect("/login")
+
     return render_template("profile.html", user=user)
 
 @user_bp.route("/scenarios")
@@ -33,37 +34,12 @@ def scenarios():
     """Render scenarios based on user proficiency and progress."""
     if "user_id" not in session:
         return redirect("/login")
-    user = User.query.get(session["user_id"])
-    
-    # Define scenario tiers for progression tracking
-    scenario_tiers = {
-        'beginner': ['taxi', 'restaurant', 'shopping'],
-        'intermediate': ['hotel', 'doctor'],
-        'advanced': ['interview']
-    }
-
-    # Get completed scenarios from DB
-    completed = [
-        p.scenario_name for p in user.scenario_progress if p.completed
-    ]
-
-    # Determine unlocked scenarios
-    if user.admin:  
-        # Admins can access everything
-        unlocked = [s for tier in scenario_tiers.values() for s in tier]
-    else:
-        unlocked = scenario_tiers['beginner'].copy()
-
-        if all(s in completed for s in scenario_tiers['beginner']):
-            unlocked += scenario_tiers['intermediate']
-
-            if all(s in completed for s in scenario_tiers['intermediate']):
-                unlocked += scenario_tiers['advanced']
-
-
-    user.unlocked_scenarios = unlocked
+    user = dashboard.get(session["user_id"])
+    if user is None:
+        return redirect("/login")
 
-    return render_template("scenarios.html", user=user, scenario_tiers=scenario_tiers, completed_scenarios=completed)
+    return render_template("scenarios.html", user=user, scenario_tiers=dashboard.SCENARIO_TIERS,
+                           completed_scenarios=user.completed_scenarios)
 
 @user_bp.route("/chat")
 def chat():
@@ -150,6 +126,7 @@ def chat():
     )
 
 @user_bp.route("/send", methods=["POST"])
+@tracing.traced("flask.send_message")
 def send_message():
     if "user_id" not in session:
         return jsonify({"error": "Not logged in"}), 401
@@ -169,12 +146,20 @@ def send_message():
     if len(message) > 500:
         return jsonify({"error": "Message too long"}), 400
 
-    # Set up retry mechanism
+    # Set up retry mechanism, all attempts share one turn budget
     max_retries = 3
     retry_count = 0
+    turn_deadline = time.monotonic() + BOT_TURN_BUDGET
     while retry_count < max_retries:
+        time_left = turn_deadline - time.monotonic()
+        if time_left <= BOT_DEADLINE_MARGIN:
+            logging.error(f"Turn budget used up for user {user_id} after {retry_count} attempts")
+            return jsonify({
+                "error": "Bot service unavailable",
+                "reply": "I'm currently unavailable. Please try again in a moment."
+            }), 503
         try:
-            logging.info(f"Sending message to bot service for user {user_id}: {message[:50]}... (Scenario: {scenario})")
+            logging.info("Sending message to bot service for user %s: %.50s... (Scenario: %s)", user_id, message, scenario, extra=PAYLOAD)
             
             # Get the bot URL from environment, ensure it points to the correct endpoint
             bot_url = os.getenv("BOT_URL", "http://localhost:3978/api/messages")
@@ -183,28 +168,32 @@ def send_message():
             if not bot_url.endswith("/api/messages"):
                 bot_url = f"{bot_url.rstrip('/')}/api/messages"
                 
-            logging.info(f"Using bot URL: {bot_url}")
+            logging.debug("Using bot URL: %s", bot_url)
             
-            # Include the scenario in headers
+            # Include the scenario in headers, and tell the bot when we stop waiting
             headers = {
                 "Content-Type": "application/json",
-                "X-User-ID": str(user_id)
+                "X-User-ID": str(user_id),
+                "X-Turn-Deadline-Ms": str(int((time_left - BOT_DEADLINE_MARGIN) * 1000))
             }
             
             # Only add X-Scenario header if scenario is present
             if scenario:
                 headers["X-Scenario"] = scenario
-                logging.info(f"Added X-Scenario header: {scenario}")
+                logging.debug("Added X-Scenario header: %s", scenario)
             
-            bot_response = requests.post(
-                bot_url,
-                headers=headers,
-                json={
-                    "type": "message",
-                    "text": message
-                },
-                timeout=15
-            )
+            # The bot continues this trace from the traceparent header
+            with tracing.start_span("bot.request", attempt=retry_count + 1) as span, metrics.track_bot_call():
+                headers[tracing.TRACEPARENT_HEADER] = span.traceparent
+                bot_response = requests.post(
+                    bot_url,
+                    headers=headers,
+                    json={
+                        "type": "message",
+                        "text": message
+                    },
+                    timeout=time_left
+                )
             
             bot_response.raise_for_status()
             data = bot_response.json()
@@ -228,6 +217,13 @@ def send_message():
                 "attachments": data.get("attachments", [])
             })
 
+        except requests.Timeout as e:
+            # The bot has already given up on this turn, retrying would only start it again
+            logging.error(f"Bot service did not reply within the turn budget: {e}")
+            return jsonify({
+                "error": "Bot service timed out",
+                "reply": "I'm currently unavailable. Please try again in a moment."
+            }), 504
         except requests.RequestException as e:
             logging.error(f"Failed to contact bot service (attempt {retry_count+1}/{max_retries}): {e}")
             if retry_count < max_retries - 1:
@@ -0,0 +1,219 @@
+"""
+Process-wide logging setup shared by the bot and the Flask app.
+
+Records are filtered and put on an in-memory queue by the thread that logs
+them; a QueueListener thread formats them and writes them to stdout. The
+request path never waits on log I/O, and if the queue fills up new records
+are dropped and counted rather than blocking.
+
+Settings:
+
+- LOG_LEVEL: root log level (default INFO).
+- LOG_FORMAT: "json" for one JSON object per line (default) or "text".
+- LOG_TURN_PAYLOADS: "true" to keep records marked as per-turn payloads
+  (message text, bot replies); they are dropped by default.
+- LOG_RATE_LIMITS: JSON object of logger name prefix to
+  {"per_second": n, "burst": n}, applied to records below WARNING.
+- LOG_SAMPLING: JSON object of logger name prefix to the fraction of
+  records below WARNING to keep, e.g. {"backend.bot.state": 0.1}.
+
+Mark a per-turn payload with extra=PAYLOAD so the switch can drop it.
+"""
+import atexit
+import datetime
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import sys
+import threading
+import time
+from typing import Callable, Dict, List, Optional
+
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+LOG_FORMAT = os.getenv("LOG_FORMAT", "json").lower()
+LOG_TURN_PAYLOADS = os.getenv("LOG_TURN_PAYLOADS", "false").lower() == "true"
+LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", "10000"))
+
+PAYLOAD = {"payload": True}
+
+# Built-in LogRecord attributes, everything else on a record came from extra=
+_RESERVED = set(vars(logging.makeLogRecord({}))) | {"message", "asctime", "service"}
+
+_lock = threading.Lock()
+_listener: Optional[logging.handlers.QueueListener] = None
+_service = "app"
+_context_providers: List[Callable[[], dict]] = []
+
+
+def _load_json(name: str) -> dict:
+    raw = os.getenv(name)
+    if not raw:
+        return {}
+    try:
+        value = json.loads(raw)
+        return value if isinstance(value, dict) else {}
+    except ValueError:
+        sys.stderr.write(f"Ignoring invalid {name}: {raw}\n")
+        return {}
+
+
+def register_context(provider: Callable[[], dict]) -> None:
+    """Add fields, such as the current trace id, to every record logged from now on."""
+    _context_providers.append(provider)
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per record, including any extra= fields."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": datetime.datetime.fromtimestamp(record.created, datetime.timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "service": getattr(record, "service", _service),
+            "message": record.getMessage()
+        }
+        for key, value in vars(record).items():
+            if key not in _RESERVED and key not in entry:
+                entry[key] = value
+        if record.exc_text:
+            entry["exc"] = record.exc_text
+        return json.dumps(entry, default=str, ensure_ascii=False)
+
+
+class VolumeFilter(logging.Filter):
+    """Drops payload records when they are switched off, and rate limits or samples noisy loggers."""
+
+    def __init__(self, rate_limits: Dict[str, dict], sampling: Dict[str, float], keep_payloads: bool):
+        super().__init__()
+        self.rate_limits = rate_limits
+        self.sampling = sampling
+        self.keep_payloads = keep_payloads
+        self._rules: Dict[str, tuple] = {}
+        self._buckets: Dict[str, list] = {}
+        self._lock = threading.Lock()
+        self.dropped: Dict[str, int] = {}
+
+    @staticmethod
+    def _match(name: str, config: dict):
+        """Setting for the longest logger name prefix in config that matches, if any."""
+        best = None
+        for prefix in config:
+            if (name == prefix or name.startswith(prefix + ".")) and (best is None or len(prefix) > len(best)):
+                best = prefix
+        return config[best] if best is not None else None
+
+    def _rule(self, name: str) -> tuple:
+        rule = self._rules.get(name)
+        if rule is None:
+            rule = self._rules[name] = (self._match(name, self.rate_limits), self._match(name, self.sampling))
+        return rule
+
+    def _drop(self, name: str) -> bool:
+        with self._lock:
+            self.dropped[name] = self.dropped.get(name, 0) + 1
+        return False
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno >= logging.WARNING:
+            return True
+        if getattr(record, "payload", False) and not self.keep_payloads:
+            return self._drop(record.name)
+        limit, sample_rate = self._rule(record.name)
+        if sample_rate is not None and random.random() >= sample_rate:
+            return self._drop(record.name)
+        if limit:
+            rate = float(limit.get("per_second", 10))
+            burst = float(limit.get("burst", rate))
+            now = time.monotonic()
+            with self._lock:
+                tokens, last = self._buckets.get(record.name, (burst, now))
+                tokens = min(burst, tokens + (now - last) * rate)
+                allowed = tokens >= 1
+                self._buckets[record.name] = (tokens - 1 if allowed else tokens, now)
+            if not allowed:
+                return self._drop(record.name)
+        return True
+
+
+class ContextFilter(logging.Filter):
+    """Stamps each record with the service name and any registered context, in the logging thread."""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.service = _service
+        for provider in _context_providers:
+            for key, value in provider().items():
+                if not hasattr(record, key):
+                    setattr(record, key, value)
+        return True
+
+
+class NonBlockingQueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler that drops records instead of blocking when the queue is full."""
+
+    def __init__(self, log_queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Only the message and traceback are rendered here, the rest happens on the listener thread
+        record.message = record.getMessage()
+        record.msg = record.message
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+def configure_logging(service: Optional[str] = None) -> None:
+    """Set up the queue-based pipeline once per process; later calls only rename the service."""
+    global _listener, _service
+    with _lock:
+        if service:
+            _service = service
+        if _listener is not None:
+            return
+
+        stream = logging.StreamHandler(sys.stdout)
+        if LOG_FORMAT == "text":
+            stream.setFormatter(logging.Formatter("%(asctime)s - %(name)s - %(levelname)s - %(message)s"))
+        else:
+            stream.setFormatter(JsonFormatter())
+
+        handler = NonBlockingQueueHandler(queue.Queue(maxsize=LOG_QUEUE_SIZE))
+        handler.addFilter(VolumeFilter(_load_json("LOG_RATE_LIMITS"), _load_json("LOG_SAMPLING"), LOG_TURN_PAYLOADS))
+        handler.addFilter(ContextFilter())
+
+        root = logging.getLogger()
+        for existing in list(root.handlers):
+            root.removeHandler(existing)
+        root.addHandler(handler)
+        root.setLevel(logging.getLevelName(LOG_LEVEL))
+
+        _listener = logging.handlers.QueueListener(handler.queue, stream, respect_handler_level=True)
+        _listener.start()
+        # Flush whatever is still queued when the process exits
+        atexit.register(_listener.stop)
+
+
+def snapshot() -> dict:
+    """Counts of records dropped by the filters and by a full queue."""
+    root = logging.getLogger()
+    for handler in root.handlers:
+        if isinstance(handler, NonBlockingQueueHandler):
+            volume = next((f for f in handler.filters if isinstance(f, VolumeFilter)), None)
+            return {
+                "queue_full_drops": handler.dropped,
+                "filtered": dict(volume.dropped) if volume else {}
+            }
+    return {}
@@ -17,6 +17,8 @@ class User(db.Model):
     streak_count = db.Column(db.Integer, default=0)
     highest_streak = db.Column(db.Integer, default=0)
     last_activity_date = db.Column(db.Date, nullable=True)
+    # Bumped with every write a dashboard shows, so cached dashboards can tell they are stale
+    dashboard_version = db.Column(db.Integer, nullable=False, default=0, server_default="0")
     
     @property
     def completed_scenarios(self):
@@ -26,7 +28,11 @@ class User(db.Model):
     
 class UserScenarioProgress(db.Model):
     __tablename__ = 'user_scenario_progress'
-    __table_args__ = {'extend_existing': True}
+    # One row per learner and scenario: the upsert target, and the index the unlock check reads
+    __table_args__ = (
+        db.Index('ix_user_scenario_progress_user_scenario', 'user_id', 'scenario_name', unique=True),
+        {'extend_existing': True}
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
@@ -37,3 +43,12 @@ class UserScenarioProgress(db.Model):
     completed_at = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc))
 
     user = db.relationship("User", backref=db.backref("scenario_progress", lazy=True))
+
+
+class WriteBehindBatch(db.Model):
+    """A batch of bot writes that has been committed, so a replay after a crash can skip it."""
+    __tablename__ = 'write_behind_batch'
+    __table_args__ = {'extend_existing': True}
+
+    id = db.Column(db.String(32), primary_key=True)
+    applied_at = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc))
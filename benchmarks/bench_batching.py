@@ -0,0 +1,74 @@
+"""
+Benchmark for the Translator / Text Analytics micro-batcher.
+
+Simulates N concurrent users each making a series of single-text calls to a
+fake service with a fixed per-request latency and a per-request quota, with
+batching on and off. Prints calls per second and the number of requests that
+actually reached the service.
+
+    python benchmarks/bench_batching.py [--latency-ms 80] [--calls 20]
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from backend.bot.services.batching import MicroBatcher
+
+
+class FakeService:
+    """Answers any batch after a fixed latency, allowing a limited number of requests at once."""
+
+    def __init__(self, latency: float, max_concurrent_requests: int):
+        self.latency = latency
+        self.semaphore = asyncio.Semaphore(max_concurrent_requests)
+        self.requests = 0
+
+    async def send(self, texts):
+        async with self.semaphore:
+            self.requests += 1
+            await asyncio.sleep(self.latency)
+            return [text.upper() for text in texts]
+
+
+async def run(users: int, calls: int, batch_size: int, latency: float, concurrency: int) -> dict:
+    service = FakeService(latency, concurrency)
+    batcher = MicroBatcher("bench", service.send, batch_size)
+
+    async def user(n):
+        for i in range(calls):
+            result = await batcher.submit(f"user {n} message {i}")
+            assert result == f"USER {n} MESSAGE {i}"
+
+    started = time.perf_counter()
+    await asyncio.gather(*(user(n) for n in range(users)))
+    elapsed = time.perf_counter() - started
+    return {
+        "calls_per_second": users * calls / elapsed,
+        "requests": service.requests,
+        "seconds": elapsed
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--latency-ms", type=float, default=80, help="Service latency per request")
+    parser.add_argument("--calls", type=int, default=20, help="Calls made by each user")
+    parser.add_argument("--batch-size", type=int, default=100, help="Service batch limit")
+    parser.add_argument("--service-concurrency", type=int, default=10,
+                        help="Requests the service (or its quota) allows at once")
+    args = parser.parse_args()
+
+    print(f"{'users':>6} {'mode':>9} {'calls/s':>10} {'requests':>9} {'seconds':>8}")
+    for users in (1, 10, 100):
+        for label, batch_size in (("single", 1), ("batched", args.batch_size)):
+            result = asyncio.run(run(users, args.calls, batch_size, args.latency_ms / 1000, args.service_concurrency))
+            print(f"{users:>6} {label:>9} {result['calls_per_second']:>10.1f} "
+                  f"{result['requests']:>9} {result['seconds']:>8.2f}")
+
+
+if __name__ == "__main__":
+    main()
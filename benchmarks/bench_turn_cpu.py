@@ -0,0 +1,262 @@
+"""
+Microbenchmarks for the CPU the bot spends on every turn, apart from network waits.
+
+Each case isolates one piece of the /api/messages hot path with its I/O
+stubbed out: building MainDialog and its six scenario dialogs,
+Activity().deserialize, DialogSet.create_context, collecting and joining the
+replies sent during a turn, prompt assembly in chatbot_respond (with an LLM
+client that answers at once), and conversation_state.save_changes.
+
+Every case is calibrated to run for about --round-ms per round, and the
+median and fastest time per operation over --rounds rounds are reported. The
+fastest round is the least disturbed by other work on the machine, so that is
+what the baseline comparison uses.
+
+    python benchmarks/bench_turn_cpu.py                       # run and print
+    python benchmarks/bench_turn_cpu.py --save-baseline       # record the baseline
+    python benchmarks/bench_turn_cpu.py --compare --threshold 15
+
+--compare exits with status 1 if any case is slower than the baseline by more
+than the threshold percentage, so it can gate CI. Timings depend on the
+machine, so record the baseline on the machine that runs the comparison.
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+import types
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, ROOT)
+DEFAULT_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "turn_cpu_baseline.json")
+
+# Keep the imports below off the network and away from the real database
+os.environ.setdefault("DB_PATH", os.path.join(tempfile.mkdtemp(prefix="lingolizard_bench_"), "bench.db"))
+os.environ["DB_FILENAME"] = os.environ["DB_PATH"]
+os.environ.pop("AZURE_APP_CONFIG_CONNECTION_STRING", None)
+for key, value in {
+    "AI_API_KEY": "bench", "AI_ENDPOINT": "http://127.0.0.1:9/v1",
+    "TRANSLATOR_KEY": "bench", "TRANSLATOR_ENDPOINT": "http://127.0.0.1:9", "TRANSLATOR_LOCATION": "local",
+    "TEXT_ANALYTICS_KEY": "bench", "TEXT_ANALYTICS_ENDPOINT": "http://127.0.0.1:9",
+    "LOG_LEVEL": "WARNING", "TRACING_ENABLED": "false"
+}.items():
+    os.environ.setdefault(key, value)
+
+
+def message_body(user_id, text):
+    """The activity body /api/messages builds from a Flask request."""
+    return {
+        "type": "message",
+        "text": text,
+        "channelId": "directline",
+        "from": {"id": user_id},
+        "recipient": {"id": "bot"},
+        "conversation": {"id": f"conversation-{user_id}"},
+        "serviceUrl": "http://localhost:3978"
+    }
+
+
+class StubLLM:
+    """Answers every chat completion immediately."""
+
+    def __init__(self):
+        message = types.SimpleNamespace(content="Claro, ¿adónde quiere ir?")
+        self.response = types.SimpleNamespace(choices=[types.SimpleNamespace(message=message)])
+
+    async def create(self, **kwargs):
+        return self.response
+
+
+def build_cases():
+    """Return (name, setup) pairs; setup returns a sync callable or an async callable run in a loop."""
+    from botbuilder.core import ConversationState, MemoryStorage, TurnContext
+    from botbuilder.dialogs import DialogSet, DialogState, DialogInstance
+    from botbuilder.schema import Activity
+    import backend.bot.bot_app as bot_app
+    from backend.bot.dialogs.main_dialog import MainDialog
+    from backend.bot.dialogs.taxi_scenario import TaxiScenarioDialog
+    from backend.bot.state.user_state import UserState
+    from backend.common import app, db
+    from backend.models import User
+
+    with app.app_context():
+        db.create_all()
+        if not db.session.get(User, 1):
+            db.session.add(User(id=1, username="bench", password="x", language="spanish"))
+            db.session.commit()
+    user_state = UserState("1")
+    body = message_body("1", "Quiero ir al Hotel Central, por favor.")
+    activity = Activity().deserialize(body)
+
+    def main_dialog_construction():
+        return lambda: MainDialog(user_state, "taxi")
+
+    def activity_deserialize():
+        return lambda: Activity().deserialize(dict(body))
+
+    def dialog_context_creation():
+        conversation_state = ConversationState(MemoryStorage())
+        accessor = conversation_state.create_property("DialogState")
+        dialog = MainDialog(user_state, "taxi")
+
+        async def create_context():
+            dialog_set = DialogSet(accessor)
+            dialog_set.add(dialog)
+            return await dialog_set.create_context(TurnContext(bot_app.ADAPTER, activity))
+        return create_context
+
+    def response_aggregation():
+        sent = [
+            "Step 2 of 5: Saying where you want to go",
+            "Your sentence is correct.",
+            Activity(type="typing"),
+            Activity(type="message", text="Example: Quiero ir al centro de la ciudad."),
+            Activity(type="message", text="Perfecto. ¿Adónde quiere ir?")
+        ]
+
+        async def aggregate():
+            all_responses = []
+            bot_response = {"text": "", "attachments": []}
+            for msg in sent:
+                bot_app.capture_response(msg, all_responses, bot_response)
+            return await bot_app.combine_responses(all_responses)
+        return aggregate
+
+    def chatbot_respond_prompt():
+        dialog = TaxiScenarioDialog(user_state)
+        dialog.client = StubLLM()
+        turn_context = TurnContext(bot_app.ADAPTER, activity)
+        history = [{"role": "user" if i % 2 == 0 else "assistant", "content": f"Mensaje número {i} de la conversación."}
+                   for i in range(12)]
+
+        async def respond():
+            user_state.set_conversation_history(list(history))
+            return await dialog.chatbot_respond(turn_context, activity.text, dialog.taxi_persona)
+        return respond
+
+    def state_save_changes():
+        conversation_state = ConversationState(MemoryStorage())
+        waterfall = {"options": None, "values": {"instanceId": "5b7f0c1e-waterfall"}, "stepIndex": 3}
+        prompt = {"options": {"prompt": {"type": "message", "text": "¿Adónde quiere ir?"}}, "state": {}}
+
+        async def save():
+            turn_context = TurnContext(bot_app.ADAPTER, activity)
+            await conversation_state.load(turn_context)
+            state = conversation_state.get(turn_context)
+            state["DialogState"] = DialogState([
+                DialogInstance("TextPrompt", dict(prompt)),
+                DialogInstance("TaxiScenarioDialog.waterfall", dict(waterfall)),
+                DialogInstance("TaxiScenarioDialog", {"dialogs": DialogState()}),
+                DialogInstance("MainDialog.waterfall", dict(waterfall)),
+                DialogInstance("MainDialog", {"dialogs": DialogState()})
+            ])
+            await conversation_state.save_changes(turn_context)
+        return save
+
+    return [
+        ("main_dialog_construction", main_dialog_construction),
+        ("activity_deserialize", activity_deserialize),
+        ("dialog_context_creation", dialog_context_creation),
+        ("response_aggregation", response_aggregation),
+        ("chatbot_respond_prompt", chatbot_respond_prompt),
+        ("state_save_changes", state_save_changes)
+    ]
+
+
+def time_operation(func, loop, iterations):
+    """Seconds taken to call func the given number of times."""
+    if asyncio.iscoroutinefunction(func):
+        async def repeat():
+            started = time.perf_counter()
+            for _ in range(iterations):
+                await func()
+            return time.perf_counter() - started
+        return loop.run_until_complete(repeat())
+    started = time.perf_counter()
+    for _ in range(iterations):
+        func()
+    return time.perf_counter() - started
+
+
+def bench(func, loop, rounds, round_seconds):
+    """Calibrate iterations to round_seconds, then return the median and minimum seconds per operation."""
+    iterations = 1
+    while True:
+        elapsed = time_operation(func, loop, iterations)
+        if elapsed >= round_seconds / 10 or iterations >= 1_000_000:
+            break
+        iterations *= 10
+    iterations = max(1, int(iterations * round_seconds / max(elapsed, 1e-9)))
+    per_op = [time_operation(func, loop, iterations) / iterations for _ in range(rounds)]
+    return {"median_us": statistics.median(per_op) * 1e6, "min_us": min(per_op) * 1e6, "iterations": iterations}
+
+
+def run(selected, rounds, round_seconds):
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+    results = {}
+    for name, setup in build_cases():
+        if selected and name not in selected:
+            continue
+        results[name] = bench(setup(), loop, rounds, round_seconds)
+    loop.close()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("cases", nargs="*", help="Only run these cases")
+    parser.add_argument("--rounds", type=int, default=5)
+    parser.add_argument("--round-ms", type=float, default=200, help="Target duration of each round")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE, help="Baseline JSON file")
+    parser.add_argument("--save-baseline", action="store_true", help="Write the results to the baseline file")
+    parser.add_argument("--compare", action="store_true", help="Compare with the baseline and flag regressions")
+    parser.add_argument("--threshold", type=float, default=15, help="Regression threshold in percent")
+    args = parser.parse_args()
+
+    results = run(set(args.cases), args.rounds, args.round_ms / 1000)
+
+    baseline = {}
+    if args.compare:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)["results"]
+
+    regressions = []
+    print(f"{'case':<28} {'median us':>11} {'min us':>11} {'baseline us':>12} {'change':>8}")
+    for name, result in results.items():
+        line = f"{name:<28} {result['median_us']:>11.1f} {result['min_us']:>11.1f}"
+        if name in baseline:
+            before = baseline[name]["min_us"]
+            change = (result["min_us"] - before) / before * 100
+            flag = "  REGRESSION" if change > args.threshold else ""
+            if flag:
+                regressions.append(name)
+            line += f" {before:>12.1f} {change:>+7.1f}%{flag}"
+        print(line)
+    print(f"{'total per turn (approx.)':<28} {sum(r['median_us'] for r in results.values()):>11.1f}")
+
+    if args.save_baseline:
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump({
+                "python": platform.python_version(),
+                "machine": platform.machine(),
+                "saved": time.strftime("%Y-%m-%dT%H:%M:%S"),
+                "results": {name: {"median_us": round(r["median_us"], 2), "min_us": round(r["min_us"], 2)}
+                            for name, r in results.items()}
+            }, f, indent=2)
+            f.write("\n")
+        print(f"Baseline written to {args.baseline}")
+
+    if regressions:
+        print(f"\n{len(regressions)} case(s) slower than the baseline by more than {args.threshold}%: "
+              f"{', '.join(regressions)}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,153 @@
+"""
+How long a fresh worker process takes to boot, and how much database work it does.
+
+Each worker is a new Python process, like a Gunicorn worker after a fork-less
+spawn: it imports the app module, then serves its first request through the
+Flask test client. The benchmark reports, per target:
+
+- import: importing the module, which builds the Flask app;
+- first_request: the first GET /login (or, for user_state, the first
+  UserState), including any lazy set-up;
+- queries: SQL statements run during both, which should be none at import now
+  that the tables are created by the bootstrap command instead;
+- rss: resident memory once booted.
+
+The database is bootstrapped once beforehand, as a deployment would, and that
+cold run is timed too, along with the warm check every later start makes.
+
+    python benchmarks/bench_worker_boot.py
+    python benchmarks/bench_worker_boot.py --workers 8 --concurrent --output boot.json
+
+--concurrent starts every worker at once, as during a rollout.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, ROOT)
+
+TARGETS = {
+    "flask": "backend.flask_app.flask_app",
+    "user_state": "backend.bot.state.user_state"
+}
+
+# Runs in each worker; prints one JSON line of timings
+WORKER = r"""
+import json, os, sys, time
+started = time.perf_counter()
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+queries = {"import": 0, "first_request": 0}
+stage = "import"
+def count(*args):
+    queries[stage] += 1
+event.listen(Engine, "before_cursor_execute", count)
+
+import importlib
+module = importlib.import_module(sys.argv[1])
+imported = time.perf_counter()
+
+stage = "first_request"
+if sys.argv[1].endswith("user_state"):
+    module.UserState("1")
+else:
+    module.app.test_client().get("/login")
+served = time.perf_counter()
+
+with open("/proc/self/statm") as f:
+    rss_mb = int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 1024 / 1024
+print(json.dumps({
+    "import_ms": (imported - started) * 1000,
+    "first_request_ms": (served - imported) * 1000,
+    "import_queries": queries["import"],
+    "first_request_queries": queries["first_request"],
+    "rss_mb": rss_mb
+}))
+"""
+
+
+def worker_environment(db_path):
+    env = dict(os.environ)
+    env.pop("AZURE_APP_CONFIG_CONNECTION_STRING", None)
+    env.update({
+        "DB_PATH": db_path,
+        "DB_FILENAME": db_path,
+        "LOG_LEVEL": "ERROR",
+        "TRACING_ENABLED": "false",
+        "PYTHONPATH": ROOT
+    })
+    return env
+
+
+def boot_worker(target, env):
+    completed = subprocess.run(
+        [sys.executable, "-c", WORKER, TARGETS[target]],
+        cwd=ROOT, env=env, capture_output=True, text=True, timeout=120
+    )
+    if completed.returncode != 0:
+        raise RuntimeError(f"{target} worker failed:\n{completed.stderr[-2000:]}")
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+
+def time_bootstrap(env):
+    """Seconds taken by the bootstrap command in a fresh process."""
+    started = time.perf_counter()
+    subprocess.run([sys.executable, "-m", "backend.common.bootstrap"], cwd=ROOT, env=env,
+                   check=True, capture_output=True, timeout=120)
+    return time.perf_counter() - started
+
+
+def summarise(samples, key):
+    values = sorted(sample[key] for sample in samples)
+    return {"median": statistics.median(values), "max": values[-1]}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, default=5, help="workers to boot per target")
+    parser.add_argument("--target", choices=sorted(TARGETS), action="append", help="default: all")
+    parser.add_argument("--concurrent", action="store_true", help="start the workers at the same time")
+    parser.add_argument("--output", help="write the results as JSON")
+    args = parser.parse_args()
+
+    db_path = os.path.join(tempfile.mkdtemp(prefix="lingolizard_boot_"), "boot.db")
+    env = worker_environment(db_path)
+    results = {
+        "bootstrap_cold_s": time_bootstrap(env),
+        "bootstrap_warm_s": time_bootstrap(env),
+        "workers": args.workers,
+        "concurrent": args.concurrent,
+        "targets": {}
+    }
+    print(f"bootstrap: cold {results['bootstrap_cold_s'] * 1000:.0f}ms, "
+          f"already done {results['bootstrap_warm_s'] * 1000:.0f}ms (whole process)")
+
+    print(f"{'target':<12}{'import ms':>18}{'first req ms':>18}{'queries':>10}{'rss MB':>9}")
+    for target in args.target or sorted(TARGETS):
+        if args.concurrent:
+            with ThreadPoolExecutor(args.workers) as pool:
+                samples = list(pool.map(lambda _: boot_worker(target, env), range(args.workers)))
+        else:
+            samples = [boot_worker(target, env) for _ in range(args.workers)]
+        summary = {key: summarise(samples, key) for key in samples[0]}
+        results["targets"][target] = {"summary": summary, "samples": samples}
+        queries = summary["import_queries"]["max"] + summary["first_request_queries"]["max"]
+        print(f"{target:<12}"
+              f"{summary['import_ms']['median']:>9.0f} (max {summary['import_ms']['max']:>4.0f})"
+              f"{summary['first_request_ms']['median']:>9.0f} (max {summary['first_request_ms']['max']:>4.0f})"
+              f"{queries:>10}{summary['rss_mb']['median']:>9.1f}")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
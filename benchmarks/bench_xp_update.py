@@ -0,0 +1,154 @@
+"""
+Concurrent XP awards for one learner: lost updates and statements per award.
+
+Several threads award XP to the same learner at once, as two tabs or a retried
+/send would. Each award runs one of:
+
+- read_modify_write: load the User, add the XP and work out the level in
+  Python, commit (how UserState.update_xp worked);
+- atomic: user_repository.add_xp, one UPDATE ... RETURNING, then commit.
+
+The benchmark reports the XP that went missing (expected total minus the
+final total), the level left behind, the statements per award and the
+latency. atomic must lose nothing and leave the right level; the benchmark
+exits with status 1 if it does not, so it can serve as a concurrency check in CI.
+
+    python benchmarks/bench_xp_update.py
+    python benchmarks/bench_xp_update.py --threads 16 --awards 100 --output xp.json
+
+It uses a fresh SQLite file unless DATABASE_URL is set; on PostgreSQL the
+learner's XP is reset between runs but otherwise left alone.
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import tempfile
+import threading
+import time
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, ROOT)
+
+if not os.getenv("DATABASE_URL"):
+    os.environ["DB_PATH"] = os.path.join(tempfile.mkdtemp(prefix="bench_xp_"), "bench.db")
+
+from sqlalchemy import event  # noqa: E402
+from sqlalchemy.engine import Engine  # noqa: E402
+
+from backend.common import bootstrap, db, get_app  # noqa: E402
+from backend.models import User  # noqa: E402
+from backend.bot.state.user_repository import add_xp  # noqa: E402
+from backend.common.levels import calculate_level  # noqa: E402
+
+USER_ID = 2  # testuser, created by the bootstrap
+
+_local = threading.local()
+
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _count(*args):
+    _local.statements = getattr(_local, "statements", 0) + 1
+
+
+def read_modify_write(user_id: int, xp: int) -> None:
+    user = db.session.get(User, user_id)
+    user.xp = (user.xp or 0) + xp
+    user.level = calculate_level(user.xp)
+    db.session.commit()
+
+
+def atomic(user_id: int, xp: int) -> None:
+    add_xp(user_id, xp)
+    db.session.commit()
+
+
+MODES = {"read_modify_write": read_modify_write, "atomic": atomic}
+
+
+def run(mode: str, threads: int, awards: int, xp: int) -> dict:
+    app = get_app()
+    award = MODES[mode]
+    with app.app_context():
+        user = db.session.get(User, USER_ID)
+        user.xp, user.level = 0, 1
+        db.session.commit()
+
+    start = threading.Barrier(threads)
+    latencies, statements, errors = [], [], []
+
+    def worker():
+        with app.app_context():
+            start.wait()
+            for _ in range(awards):
+                _local.statements = 0
+                started = time.perf_counter()
+                try:
+                    award(USER_ID, xp)
+                except Exception as e:
+                    db.session.rollback()
+                    errors.append(str(e))
+                    continue
+                latencies.append((time.perf_counter() - started) * 1000)
+                statements.append(_local.statements)
+            db.session.remove()
+
+    workers = [threading.Thread(target=worker) for _ in range(threads)]
+    started = time.perf_counter()
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    with app.app_context():
+        user = db.session.get(User, USER_ID)
+        final_xp, final_level = user.xp, user.level
+    expected = xp * len(latencies)
+    latencies.sort()
+    return {
+        "mode": mode,
+        "awards": len(latencies),
+        "errors": len(errors),
+        "expected_xp": expected,
+        "final_xp": final_xp,
+        "lost_xp": expected - final_xp,
+        "level": final_level,
+        "expected_level": calculate_level(expected),
+        "statements_per_award": round(statistics.mean(statements), 2) if statements else None,
+        "p50_ms": round(latencies[len(latencies) // 2], 2) if latencies else None,
+        "p95_ms": round(latencies[int(len(latencies) * 0.95)], 2) if latencies else None,
+        "awards_per_second": round(len(latencies) / elapsed, 1)
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--threads", type=int, default=8, help="Concurrent awarders")
+    parser.add_argument("--awards", type=int, default=50, help="Awards per thread")
+    parser.add_argument("--xp", type=int, default=30, help="XP per award")
+    parser.add_argument("--output", help="Write the results as JSON here")
+    args = parser.parse_args()
+
+    bootstrap.bootstrap(get_app())
+    results = [run(mode, args.threads, args.awards, args.xp) for mode in MODES]
+
+    print(f"{'mode':<20}{'awards':>8}{'lost xp':>10}{'level':>8}{'stmts':>8}{'p50 ms':>9}{'p95 ms':>9}{'errors':>8}")
+    for r in results:
+        print(f"{r['mode']:<20}{r['awards']:>8}{r['lost_xp']:>10}{str(r['level']) + '/' + str(r['expected_level']):>8}"
+              f"{r['statements_per_award']:>8}{r['p50_ms']:>9}{r['p95_ms']:>9}{r['errors']:>8}")
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+    atomic_result = next(r for r in results if r["mode"] == "atomic")
+    if atomic_result["lost_xp"] or atomic_result["errors"] \
+            or atomic_result["level"] != atomic_result["expected_level"]:
+        print("FAIL: atomic awards lost XP, failed or left the wrong level", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,442 @@
+"""
+End-to-end load test that walks concurrent learners through whole scenarios.
+
+Starts the service emulator (emulator/), the bot and the Flask app in this
+process. Each learner is a thread with its own Flask test client, logged in
+as its own user, that sends "__start__" and then the scripted replies for its
+scenario to POST /send. Flask forwards every turn to the bot's /api/messages
+over HTTP exactly as in production, and the bot calls the emulator instead of
+DeepSeek and Azure, so nothing leaves the machine.
+
+Reports throughput, p50/p95/p99 turn latency per scenario step, the error rate
+and process memory growth, and writes them to a JSON file. Pass --compare
+with the file from another commit to print the differences. A walk ends with
+the turn that reports the learner's score.
+
+A turn counts as an error if /send fails, if it answers 200 with one of the
+apology or fallback texts the bot and Flask send when a turn goes wrong, or
+if any span of its trace ended in an error. The last catches steps whose
+exceptions MainDialog.run swallows, which never show in the reply. So every
+turn is sent with a sampled trace of its own, and tracing is switched on for
+the run.
+
+--record saves every service call the bot makes to a cassette (see
+backend/bot/services/recorder.py), for example while pointing the bot at the
+real services with --real-services. --replay answers the calls from a
+cassette instead, --replay-speed times faster than recorded.
+
+    python benchmarks/load_test.py --learners 30 --output after.json --compare before.json
+    python benchmarks/load_test.py --replay trace.jsonl.gz --replay-speed 10
+"""
+import argparse
+import asyncio
+import gc
+import json
+import logging
+import os
+import random
+import re
+import resource
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, ROOT)
+
+SCENARIOS = ["taxi", "restaurant", "shopping", "hotel", "doctor", "interview"]
+
+# Replies that mean the turn failed even though /send answered 200
+ERROR_REPLIES = (
+    "I apologise, but",
+    "I apologize, but",
+    "I'm having trouble",
+    "I'm currently unavailable",
+    "I'm processing your request",
+    "I'm still processing"
+)
+
+# Every scenario reports "Your score: N/100" or "Your final score: N/100" as it ends
+COMPLETED = re.compile(r"score: \d+/100")
+
+# One scripted learner reply per waterfall prompt after the "__start__" turn, the last one
+# being the reply that gets the score
+SCRIPTS = {
+    "taxi": [
+        "Hola, estoy bien, gracias. ¿Y usted?",
+        "Quiero ir al Hotel Central, por favor.",
+        "Sí, es correcto.",
+        "Vale, está bien.",
+        "Es un poco caro. ¿Puede ser 15 euros?",
+        "15 euros, por favor.",
+        "Perfecto, gracias.",
+        "Gracias, adiós."
+    ],
+    "restaurant": [
+        "Buenas noches, una mesa para dos, por favor.",
+        "Quiero la paella, por favor.",
+        "Un vaso de agua y una copa de vino tinto.",
+        "Sí, un flan, por favor.",
+        "La cuenta, por favor. Todo estaba muy bueno."
+    ],
+    "shopping": [
+        "Hola, busco una camisa azul.",
+        "¿Cuánto cuesta esta camisa?",
+        "Me la llevo, gracias.",
+        "Sí, perfecto, pago con tarjeta.",
+        "Gracias, adiós."
+    ],
+    "hotel": [
+        "Buenas tardes, quiero reservar una habitación.",
+        "Tres noches, por favor.",
+        "Una habitación doble.",
+        "Somos 2 personas.",
+        "Una cama extra, por favor.",
+        "Sí, todo es correcto, gracias.",
+        "Con tarjeta de crédito.",
+        "Perfecto, muchas gracias."
+    ],
+    "doctor": [
+        "Buenos días, tengo una cita con el doctor.",
+        "Hola doctor, no me siento bien.",
+        "Me duele la cabeza desde hace 3 días.",
+        "Entiendo, gracias.",
+        "Vale, tomaré la medicina. Gracias, doctor."
+    ],
+    "interview": [
+        "Buenos días, encantado de conocerle.",
+        "Tengo 5 años de experiencia en ventas.",
+        "Sé trabajar en equipo y hablo tres idiomas.",
+        "Me interesa mucho esta empresa.",
+        "Soy organizado, pero a veces soy impaciente.",
+        "Espero un salario de 30000 euros.",
+        "¿Cuáles son los próximos pasos?",
+        "Muchas gracias por su tiempo.",
+        "Sí, gracias."
+    ]
+}
+
+
+def percentile(values, fraction):
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))]
+
+
+def summarise(latencies):
+    return {
+        "count": len(latencies),
+        "p50_ms": round(percentile(latencies, 0.50) * 1000, 1) if latencies else None,
+        "p95_ms": round(percentile(latencies, 0.95) * 1000, 1) if latencies else None,
+        "p99_ms": round(percentile(latencies, 0.99) * 1000, 1) if latencies else None
+    }
+
+
+def rss_mb():
+    """Current resident set size, falling back to the peak where /proc is not available."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 1024 / 1024
+    except (OSError, ValueError):
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak / 1024 / 1024 if sys.platform == "darwin" else peak / 1024
+
+
+class MemorySampler(threading.Thread):
+    """Samples the process RSS until stopped."""
+
+    def __init__(self, interval=0.5):
+        super().__init__(daemon=True)
+        self.interval = interval
+        self.samples = []
+        self._stop_event = threading.Event()
+
+    def run(self):
+        while not self._stop_event.is_set():
+            self.samples.append(rss_mb())
+            self._stop_event.wait(self.interval)
+
+    def stop(self):
+        self._stop_event.set()
+        self.join()
+        self.samples.append(rss_mb())
+
+
+def serve(app, name):
+    """Run an aiohttp app on a free loopback port in a background thread and return its base URL."""
+    from aiohttp import web
+
+    ready = threading.Event()
+    address = {}
+
+    def run():
+        loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(loop)
+        runner = web.AppRunner(app, access_log=None)
+        loop.run_until_complete(runner.setup())
+        site = web.TCPSite(runner, "127.0.0.1", 0)
+        loop.run_until_complete(site.start())
+        address["port"] = runner.addresses[0][1]
+        ready.set()
+        loop.run_forever()
+
+    threading.Thread(target=run, name=name, daemon=True).start()
+    ready.wait()
+    return f"http://127.0.0.1:{address['port']}"
+
+
+def configure_environment(args):
+    """Point the bot and Flask app at a scratch database and an in-process emulator."""
+    from emulator.server import create_app
+
+    if args.record or args.replay:
+        os.environ["CASSETTE_MODE"] = "record" if args.record else "replay"
+        os.environ["CASSETTE_PATH"] = args.record or args.replay
+        os.environ["CASSETTE_SPEED"] = str(args.replay_speed)
+
+    emulator_config = {}
+    if args.emulator_config:
+        with open(args.emulator_config, encoding="utf-8") as f:
+            emulator_config = json.load(f)
+    emulator_app = create_app(emulator_config, args.seed)
+    base_url = serve(emulator_app, "emulator")
+
+    db_path = os.path.join(tempfile.mkdtemp(prefix="lingolizard_load_"), "load.db")
+    os.environ.update({"DB_PATH": db_path, "DB_FILENAME": db_path})
+    os.environ.setdefault("LOG_LEVEL", "WARNING")
+    # Error spans are how swallowed step failures are counted
+    os.environ["TRACING_ENABLED"] = "true"
+    if args.real_services:
+        return emulator_app
+    os.environ.update({
+        "AI_API_KEY": "emulator-key",
+        "AI_ENDPOINT": f"{base_url}/v1",
+        "TRANSLATOR_KEY": "emulator-key",
+        "TRANSLATOR_ENDPOINT": base_url,
+        "TRANSLATOR_LOCATION": "local",
+        "TEXT_ANALYTICS_KEY": "emulator-key",
+        "TEXT_ANALYTICS_ENDPOINT": base_url
+    })
+    os.environ.pop("AZURE_APP_CONFIG_CONNECTION_STRING", None)
+    return emulator_app
+
+
+def create_learners(flask_app, db, count):
+    from backend.models import User
+
+    with flask_app.app_context():
+        db.create_all()
+        base = (db.session.query(db.func.max(User.id)).scalar() or 0) + 1
+        ids = list(range(base, base + count))
+        for user_id in ids:
+            db.session.add(User(id=user_id, username=f"load-{user_id}", password="x", language="spanish"))
+        db.session.commit()
+    return ids
+
+
+class FailedTraces(logging.Handler):
+    """Collects the trace ids of spans that ended in an error, from the bot's and Flask's span exporters."""
+
+    def __init__(self):
+        super().__init__()
+        self.trace_ids = set()
+
+    def emit(self, record):
+        span = record.msg
+        if isinstance(span, dict) and span.get("status") == "error":
+            self.trace_ids.add(span["trace_id"])
+
+
+def is_error_reply(reply: str) -> bool:
+    """True for the bot's apology texts and its fallback replies for skipped service calls."""
+    from backend.bot.dialogs.base_dialog import FALLBACK_REPLIES
+
+    return any(text in reply for text in ERROR_REPLIES + tuple(FALLBACK_REPLIES.values()))
+
+
+def walk_scenario(flask_app, user_id, scenario, record, failed_traces):
+    """Send one learner through a whole scenario, recording (step, seconds, ok) for each turn."""
+    from backend.common import tracing
+
+    client = flask_app.test_client()
+    with client.session_transaction() as session:
+        session["user_id"] = user_id
+    for step, message in enumerate(["__start__"] + SCRIPTS[scenario]):
+        # A sampled trace per turn, so its error spans are exported whatever TRACE_SAMPLE_RATE is
+        trace_id = f"{random.getrandbits(128):032x}"
+        traceparent = f"00-{trace_id}-{random.getrandbits(64):016x}-01"
+        reply = ""
+        started = time.perf_counter()
+        try:
+            with tracing.start_span("load_test.turn", traceparent, scenario=scenario, step=step):
+                response = client.post("/send", json={"message": message, "scenario": scenario})
+            data = response.get_json(silent=True) or {"error": True}
+            reply = str(data.get("reply", ""))
+            ok = (response.status_code == 200 and "error" not in data
+                  and not is_error_reply(reply) and trace_id not in failed_traces.trace_ids)
+        except Exception:
+            ok = False
+        record(scenario, step, time.perf_counter() - started, ok)
+        if COMPLETED.search(reply):
+            return
+
+
+def run(args):
+    emulator_app = configure_environment(args)
+
+    import backend.bot.bot_app as bot_app
+    from backend.bot.services import recorder
+    from backend.flask_app.flask_app import app as flask_app
+    from backend.common.extensions import db
+
+    os.environ["BOT_URL"] = serve(bot_app.app, "bot")
+    flask_app.config["WTF_CSRF_ENABLED"] = False
+    failed_traces = FailedTraces()
+    for service in ("bot", "flask"):
+        logging.getLogger(f"lingolizard.spans.{service}").addHandler(failed_traces)
+    learners = create_learners(flask_app, db, args.learners)
+
+    turns = defaultdict(list)
+    errors = defaultdict(int)
+    lock = threading.Lock()
+
+    def record(scenario, step, seconds, ok):
+        with lock:
+            turns[(scenario, step)].append(seconds)
+            if not ok:
+                errors[(scenario, step)] += 1
+
+    jobs = []
+    for i, user_id in enumerate(learners):
+        scenarios = [args.scenario] if args.scenario else SCENARIOS
+        for walk in range(args.walks):
+            jobs.append((user_id, scenarios[(i + walk) % len(scenarios)]))
+
+    if args.warmup:
+        walk_scenario(flask_app, learners[0], "taxi", lambda *a: None, failed_traces)
+
+    gc.collect()
+    memory = MemorySampler()
+    memory.start()
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.learners) as pool:
+        # Each learner walks its scenarios one after another
+        by_learner = defaultdict(list)
+        for user_id, scenario in jobs:
+            by_learner[user_id].append(scenario)
+        futures = [pool.submit(lambda u=u, s=s: [walk_scenario(flask_app, u, x, record, failed_traces) for x in s])
+                   for u, s in by_learner.items()]
+        for future in futures:
+            future.result()
+    elapsed = time.perf_counter() - started
+    gc.collect()
+    memory.stop()
+
+    all_latencies = [s for values in turns.values() for s in values]
+    total_turns = len(all_latencies)
+    total_errors = sum(errors.values())
+    steps = {}
+    for (scenario, step), values in sorted(turns.items()):
+        steps[f"{scenario}:{step}"] = {**summarise(values), "errors": errors[(scenario, step)]}
+
+    return {
+        "commit": git_commit(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "config": vars(args),
+        "summary": {
+            "seconds": round(elapsed, 2),
+            "turns": total_turns,
+            "turns_per_second": round(total_turns / elapsed, 2) if elapsed else None,
+            "scenarios_per_second": round(len(jobs) / elapsed, 3) if elapsed else None,
+            "error_rate": round(total_errors / total_turns, 4) if total_turns else None,
+            **summarise(all_latencies)
+        },
+        "memory_mb": {
+            "start": round(memory.samples[0], 1),
+            "end": round(memory.samples[-1], 1),
+            "peak": round(max(memory.samples), 1),
+            "growth": round(memory.samples[-1] - memory.samples[0], 1)
+        },
+        "emulator": {name: faults.snapshot() for name, faults in emulator_app["faults"].items()},
+        "cassette": recorder.snapshot(),
+        "steps": steps
+    }
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, text=True,
+                                       stderr=subprocess.DEVNULL).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def print_report(result):
+    summary = result["summary"]
+    memory = result["memory_mb"]
+    print(f"commit {result['commit']}  {summary['turns']} turns in {summary['seconds']}s")
+    print(f"  throughput   {summary['turns_per_second']} turns/s, {summary['scenarios_per_second']} scenarios/s")
+    print(f"  latency      p50 {summary['p50_ms']}ms  p95 {summary['p95_ms']}ms  p99 {summary['p99_ms']}ms")
+    print(f"  error rate   {summary['error_rate']:.2%}")
+    print(f"  memory       {memory['start']}MB -> {memory['end']}MB (peak {memory['peak']}MB, growth {memory['growth']}MB)")
+    print()
+    print(f"  {'step':<16} {'turns':>6} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'errors':>7}")
+    for step, stats in result["steps"].items():
+        print(f"  {step:<16} {stats['count']:>6} {stats['p50_ms']:>9} {stats['p95_ms']:>9} "
+              f"{stats['p99_ms']:>9} {stats['errors']:>7}")
+
+
+def print_comparison(before, after):
+    def change(old, new):
+        if old in (None, 0) or new is None:
+            return ""
+        return f"{(new - old) / old:+.1%}"
+
+    print(f"\nCompared with {before.get('commit')} ({before.get('timestamp')}):")
+    for key in ("turns_per_second", "p50_ms", "p95_ms", "p99_ms", "error_rate"):
+        old, new = before["summary"].get(key), after["summary"].get(key)
+        print(f"  {key:<18} {old!s:>10} -> {new!s:<10} {change(old, new)}")
+    old, new = before["memory_mb"]["growth"], after["memory_mb"]["growth"]
+    print(f"  {'memory growth MB':<18} {old!s:>10} -> {new!s:<10}")
+    print(f"\n  {'step p95 ms':<16} {'before':>9} {'after':>9}")
+    for step, stats in after["steps"].items():
+        old = before["steps"].get(step, {}).get("p95_ms")
+        print(f"  {step:<16} {old!s:>9} {stats['p95_ms']!s:>9} {change(old, stats['p95_ms'])}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--learners", type=int, default=12, help="Concurrent learners")
+    parser.add_argument("--walks", type=int, default=1, help="Scenarios each learner walks in turn")
+    parser.add_argument("--scenario", choices=SCENARIOS, help="Only run this scenario")
+    parser.add_argument("--emulator-config", help="Emulator latency and fault settings, see emulator/faults.py")
+    parser.add_argument("--seed", type=int, default=1, help="Seed for emulator latency and faults")
+    parser.add_argument("--real-services", action="store_true",
+                        help="Use the service settings from the environment instead of the emulator")
+    parser.add_argument("--record", metavar="CASSETTE", help="Record every service call to this cassette")
+    parser.add_argument("--replay", metavar="CASSETTE", help="Answer service calls from this cassette")
+    parser.add_argument("--replay-speed", type=float, default=1.0,
+                        help="Replay this many times faster than recorded, 0 for no waiting")
+    parser.add_argument("--no-warmup", dest="warmup", action="store_false", help="Skip the untimed warm-up walk")
+    parser.add_argument("--output", help="Write the results to this JSON file")
+    parser.add_argument("--compare", help="Results JSON from an earlier run to compare against")
+    args = parser.parse_args()
+
+    result = run(args)
+    print_report(result)
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            print_comparison(json.load(f), result)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(result, f, indent=2)
+        print(f"\nResults written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,12 +1,31 @@
 #!/usr/bin/env python
+"""
+Health check server for the container, answering from a cached snapshot.
+
+A background asyncio prober checks the Flask app and the bot concurrently
+every HEALTHCHECK_INTERVAL_SECONDS, each with a HEALTHCHECK_TIMEOUT_MS
+timeout, and keeps the latest result and a short latency history per
+service. The HTTP server is threaded and its handler only reads that
+snapshot, so a slow dependency never delays or piles up health probes.
+
+    python deployment/healthcheck.py
+
+The bot is optional: if it is not answering it is reported as skipped rather
+than failing the container, as before.
+"""
+import asyncio
 import http.server
-import socketserver
 import json
+import logging
 import os
-import urllib.request
-import urllib.error
+import threading
 import time
-import logging
+from collections import deque
+from urllib.parse import urlsplit
+
+HEALTHCHECK_INTERVAL = int(os.getenv("HEALTHCHECK_INTERVAL_SECONDS", "10"))
+HEALTHCHECK_TIMEOUT = int(os.getenv("HEALTHCHECK_TIMEOUT_MS", "5000")) / 1000
+HEALTHCHECK_HISTORY = int(os.getenv("HEALTHCHECK_HISTORY", "30"))
 
 # Configure logging
 logging.basicConfig(
@@ -15,89 +34,176 @@ logging.basicConfig(
 )
 logger = logging.getLogger('healthcheck')
 
-class HealthStatus:
-    def __init__(self):
-        self.flask_healthy = False
-        self.bot_healthy = False
-        self.last_checked = 0
-
-    def update(self):
-        # Don't check more often than every 10 seconds
-        if time.time() - self.last_checked < 10:
-            return
-            
-        self.last_checked = time.time()
-        
-        # Check Flask service
+
+async def fetch_status(url, timeout):
+    """GET an http:// URL and return its status code."""
+    parts = urlsplit(url)
+    path = parts.path or "/"
+
+    async def get():
+        reader, writer = await asyncio.open_connection(parts.hostname, parts.port or 80)
         try:
-            flask_port = os.environ.get("FLASK_PORT", "5000")
-            logger.info(f"Checking Flask health at http://localhost:{flask_port}/health")
-            with urllib.request.urlopen(f"http://localhost:{flask_port}/health", timeout=5) as response:
-                self.flask_healthy = response.status == 200
-                logger.info(f"Flask health: {'OK' if self.flask_healthy else 'FAILED'}")
-        except Exception as e:
-            self.flask_healthy = False
-            logger.warning(f"Flask health check failed: {str(e)}")
-        
-        # Check Bot service
+            writer.write(f"GET {path} HTTP/1.1\r\nHost: {parts.netloc}\r\nConnection: close\r\n\r\n".encode("ascii"))
+            await writer.drain()
+            status_line = await reader.readline()
+            return int(status_line.split()[1])
+        finally:
+            writer.close()
+
+    return await asyncio.wait_for(get(), timeout)
+
+
+class ServiceCheck:
+    """The latest result and recent latencies of one service's health endpoint."""
+
+    def __init__(self, name, url, optional=False):
+        self.name = name
+        self.url = url
+        self.optional = optional
+        self.healthy = False
+        self.reachable = False
+        self.last_error = None
+        self.checked_at = None
+        self.consecutive_failures = 0
+        self.latencies = deque(maxlen=HEALTHCHECK_HISTORY)
+
+    async def probe(self, timeout):
+        started = time.perf_counter()
         try:
-            bot_port = os.environ.get("PORT", "8000")
-            logger.info(f"Checking Bot health at http://localhost:{bot_port}/health")
-            with urllib.request.urlopen(f"http://localhost:{bot_port}/health", timeout=5) as response:
-                self.bot_healthy = response.status == 200
-                logger.info(f"Bot health: {'OK' if self.bot_healthy else 'FAILED'}")
+            status = await fetch_status(self.url, timeout)
+            self.reachable = True
+            self.healthy = status == 200
+            self.last_error = None if self.healthy else f"HTTP {status}"
         except Exception as e:
-            # Bot health is optional - we consider it "OK" if the service isn't responding
-            self.bot_healthy = True
-            logger.warning(f"Bot health check skipped: {str(e)}")
+            self.reachable = False
+            self.healthy = False
+            self.last_error = str(e) or type(e).__name__
+        self.latencies.append((time.perf_counter() - started) * 1000)
+        self.checked_at = time.time()
+        self.consecutive_failures = 0 if self.healthy else self.consecutive_failures + 1
+        if not self.healthy:
+            logger.warning(f"{self.name} health check failed: {self.last_error}")
 
-health_status = HealthStatus()
+    def state(self):
+        if self.healthy:
+            return "up"
+        if self.optional and not self.reachable and self.checked_at is not None:
+            return "skipped"
+        return "starting"
 
-class HealthCheckHandler(http.server.SimpleHTTPRequestHandler):
+    def snapshot(self):
+        latencies = sorted(self.latencies)
+        return {
+            "status": self.state(),
+            "url": self.url,
+            "checked_at": self.checked_at,
+            "consecutive_failures": self.consecutive_failures,
+            "last_error": self.last_error,
+            "latency_ms": {
+                "last": round(self.latencies[-1], 1) if latencies else None,
+                "p50": round(latencies[len(latencies) // 2], 1) if latencies else None,
+                "p95": round(latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))], 1) if latencies else None,
+                "max": round(latencies[-1], 1) if latencies else None,
+                "history": [round(value, 1) for value in self.latencies]
+            }
+        }
+
+
+class HealthStatus:
+    """Probes every service in the background and keeps the result for the handler to read."""
+
+    def __init__(self, checks, interval=HEALTHCHECK_INTERVAL, timeout=HEALTHCHECK_TIMEOUT):
+        self.checks = checks
+        self.interval = interval
+        self.timeout = min(timeout, interval)
+        self.rounds = 0
+        self._snapshot = self._build_snapshot()
+        self._lock = threading.Lock()
+
+    def _build_snapshot(self):
+        required_up = all(check.healthy for check in self.checks if not check.optional)
+        return {
+            "status": "healthy" if required_up else "starting",
+            "timestamp": time.time(),
+            "rounds": self.rounds,
+            "services": {check.name: check.state() for check in self.checks},
+            "checks": {check.name: check.snapshot() for check in self.checks}
+        }
+
+    async def probe_all(self):
+        await asyncio.gather(*(check.probe(self.timeout) for check in self.checks))
+        self.rounds += 1
+        snapshot = self._build_snapshot()
+        with self._lock:
+            self._snapshot = snapshot
+
+    async def run(self):
+        while True:
+            started = time.monotonic()
+            try:
+                await self.probe_all()
+            except Exception as e:
+                logger.error(f"Health probe round failed: {e}")
+            await asyncio.sleep(max(0.0, self.interval - (time.monotonic() - started)))
+
+    def start(self):
+        """Run the prober on its own event loop in a daemon thread."""
+        thread = threading.Thread(target=lambda: asyncio.run(self.run()), name="health-prober", daemon=True)
+        thread.start()
+        return thread
+
+    def snapshot(self):
+        with self._lock:
+            snapshot = dict(self._snapshot)
+        snapshot["age_seconds"] = round(time.time() - snapshot["timestamp"], 2)
+        return snapshot
+
+
+health_status = HealthStatus([
+    ServiceCheck("flask", f"http://localhost:{os.environ.get('FLASK_PORT', '5000')}/health"),
+    # Bot health is optional - the container stays up if the bot isn't responding
+    ServiceCheck("bot", f"http://localhost:{os.environ.get('PORT', '8000')}/health", optional=True)
+])
+
+
+class HealthCheckServer(http.server.ThreadingHTTPServer):
+    # Allow socket reuse to prevent "Address already in use" errors
+    allow_reuse_address = True
+    daemon_threads = True
+    # Room for a burst of probes without dropped connections
+    request_queue_size = 128
+
+
+class HealthCheckHandler(http.server.BaseHTTPRequestHandler):
     def log_message(self, format, *args):
-        logger.info("%s - - [%s] %s" % 
+        logger.debug("%s - - [%s] %s" %
                 (self.address_string(),
                  self.log_date_time_string(),
                  format % args))
-                 
+
     def do_GET(self):
         if self.path == "/health" or self.path == "/":
-            # Always update health status on request
-            health_status.update()
-            
             # We'll return 200 status code for Azure to keep the container running
             # even if Flask is not yet ready (it might be starting up)
-            status_code = 200
-            
-            self.send_response(status_code)
+            body = json.dumps(health_status.snapshot()).encode()
+            self.send_response(200)
             self.send_header("Content-type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
             self.end_headers()
-            
-            health_data = {
-                "status": "healthy" if health_status.flask_healthy else "starting",
-                "timestamp": time.time(),
-                "services": {
-                    "flask": "up" if health_status.flask_healthy else "starting",
-                    "bot": "up" if health_status.bot_healthy else "starting",
-                }
-            }
-            
-            logger.info(f"Health check response: {json.dumps(health_data)}")
-            self.wfile.write(json.dumps(health_data).encode())
+            self.wfile.write(body)
         else:
             self.send_response(404)
             self.end_headers()
             self.wfile.write(b"Not found")
 
+
 if __name__ == "__main__":
     port = int(os.environ.get("WEBSITES_PORT", 8080))
     logger.info(f"Starting health check server on port {port}")
-    
-    # Allow socket reuse to prevent "Address already in use" errors
-    socketserver.TCPServer.allow_reuse_address = True
-    
+
     try:
-        with socketserver.TCPServer(("", port), HealthCheckHandler) as httpd:
+        health_status.start()
+        with HealthCheckServer(("", port), HealthCheckHandler) as httpd:
             logger.info(f"Health check service started at port {port}")
             httpd.serve_forever()
     except Exception as e:
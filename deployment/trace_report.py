@@ -0,0 +1,118 @@
+#!/usr/bin/env python
+"""
+Print a flame-style breakdown of the slowest traced turns.
+
+Reads the span files written by backend/common/tracing.py (including rotated
+ones), rebuilds each trace as a tree and prints the slowest ones with a bar
+per span showing when it ran within the turn, followed by the span names that
+account for the most self time across those turns.
+
+    python deployment/trace_report.py --top 5 --since 60
+"""
+import argparse
+import glob
+import json
+import os
+import tempfile
+import time
+from collections import defaultdict
+
+DEFAULT_TRACE_DIR = os.getenv("TRACE_DIR", os.path.join(tempfile.gettempdir(), "lingolizard_traces"))
+BAR_WIDTH = 40
+
+
+def load_traces(trace_dir, since=None):
+    """Group every span in the directory by trace id."""
+    traces = defaultdict(list)
+    for path in glob.glob(os.path.join(trace_dir, "*-spans.jsonl*")):
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    span = json.loads(line)
+                except ValueError:
+                    continue
+                if since is None or span["start"] >= since:
+                    traces[span["trace_id"]].append(span)
+    return traces
+
+
+def build_tree(spans):
+    """Return the root span of a trace, with each span's children attached in start order."""
+    by_id = {span["span_id"]: span for span in spans}
+    roots = []
+    for span in spans:
+        span.setdefault("children", [])
+    for span in sorted(spans, key=lambda s: s["start"]):
+        parent = by_id.get(span.get("parent_id"))
+        if parent is None:
+            roots.append(span)
+        else:
+            parent["children"].append(span)
+    if not roots:
+        return None
+    # A trace whose root span is missing (e.g. not sampled upstream) is shown from its longest span
+    return max(roots, key=lambda s: s["duration_ms"])
+
+
+def self_time(span):
+    children = sum(child["duration_ms"] for child in span["children"])
+    return max(0.0, span["duration_ms"] - children)
+
+
+def print_tree(span, turn_start, turn_ms, depth=0):
+    offset = span["start"] - turn_start
+    left = int(BAR_WIDTH * max(0.0, offset * 1000) / turn_ms) if turn_ms else 0
+    width = max(1, int(BAR_WIDTH * span["duration_ms"] / turn_ms)) if turn_ms else 1
+    bar = (" " * left + "#" * width)[:BAR_WIDTH].ljust(BAR_WIDTH)
+    status = "" if span.get("status", "ok") == "ok" else f"  [{span['status']}]"
+    label = f"{'  ' * depth}{span['service']}:{span['name']}"
+    print(f"  |{bar}| {span['duration_ms']:9.1f}ms  {label}{status}")
+    for child in span["children"]:
+        print_tree(child, turn_start, turn_ms, depth + 1)
+
+
+def collect_self_times(span, totals):
+    totals[f"{span['service']}:{span['name']}"] += self_time(span)
+    for child in span["children"]:
+        collect_self_times(child, totals)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--dir", default=DEFAULT_TRACE_DIR, help="Directory holding the span files")
+    parser.add_argument("--top", type=int, default=5, help="Number of slowest turns to show")
+    parser.add_argument("--since", type=float, help="Only include spans from the last N minutes")
+    parser.add_argument("--name", help="Only include traces whose root span has this name")
+    args = parser.parse_args()
+
+    since = time.time() - args.since * 60 if args.since else None
+    roots = []
+    for spans in load_traces(args.dir, since).values():
+        root = build_tree(spans)
+        if root is not None and (args.name is None or root["name"] == args.name):
+            roots.append(root)
+
+    if not roots:
+        print(f"No traces found in {args.dir}")
+        return
+
+    roots.sort(key=lambda s: s["duration_ms"], reverse=True)
+    slowest = roots[:args.top]
+    print(f"{len(roots)} traces, showing the {len(slowest)} slowest\n")
+    totals = defaultdict(float)
+    for root in slowest:
+        started = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(root["start"]))
+        print(f"trace {root['trace_id']}  {root['duration_ms']:.1f}ms  {started}")
+        print_tree(root, root["start"], root["duration_ms"])
+        print()
+        collect_self_times(root, totals)
+
+    total_ms = sum(root["duration_ms"] for root in slowest)
+    print("Self time across these turns:")
+    for name, ms in sorted(totals.items(), key=lambda item: item[1], reverse=True)[:15]:
+        share = 100 * ms / total_ms if total_ms else 0
+        print(f"  {ms:10.1f}ms  {share:5.1f}%  {name}")
+
+
+if __name__ == "__main__":
+    main()
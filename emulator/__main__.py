@@ -0,0 +1,58 @@
+"""
+Run the service emulator so the bot can be exercised without network access.
+
+    python -m emulator --port 8090 --config emulator.json --seed 1
+
+The config file holds one entry per service ("llm", "translator",
+"text_analytics", "app_configuration") with the settings described in
+emulator/faults.py, plus optional "settings" to add or override App
+Configuration values and "llm": {"stream_chunk_ms": n} for streaming.
+
+The App Configuration SDK only talks https, so pass --certfile and --keyfile
+(a self-signed pair is fine, with REQUESTS_CA_BUNDLE pointing at the
+certificate) to serve it through AZURE_APP_CONFIG_CONNECTION_STRING. Without
+them, export the printed endpoint variables directly instead.
+"""
+import argparse
+import json
+import ssl
+
+from aiohttp import web
+
+from emulator.server import create_app
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline emulator for the OpenAI and Azure services used by the bot")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8090)
+    parser.add_argument("--config", help="JSON file with latency, error and throttling settings per service")
+    parser.add_argument("--seed", type=int, help="Seed for latency and fault sampling, for repeatable runs")
+    parser.add_argument("--certfile", help="TLS certificate, needed by the App Configuration SDK")
+    parser.add_argument("--keyfile", help="TLS private key for --certfile")
+    args = parser.parse_args()
+
+    config = {}
+    if args.config:
+        with open(args.config, encoding="utf-8") as f:
+            config = json.load(f)
+
+    ssl_context = None
+    if args.certfile:
+        ssl_context = ssl.create_default_context(ssl.Purpose.CLIENT_AUTH)
+        ssl_context.load_cert_chain(args.certfile, args.keyfile)
+    base_url = f"{'https' if ssl_context else 'http'}://{args.host}:{args.port}"
+
+    print("Point the bot at the emulator with:")
+    if ssl_context:
+        print(f"  AZURE_APP_CONFIG_CONNECTION_STRING='Endpoint={base_url};Id=emulator;Secret=c2VjcmV0'")
+        print(f"  REQUESTS_CA_BUNDLE={args.certfile}")
+    else:
+        print("  AI_API_KEY=emulator-key TRANSLATOR_KEY=emulator-key TEXT_ANALYTICS_KEY=emulator-key TRANSLATOR_LOCATION=local")
+    print(f"  AI_ENDPOINT={base_url}/v1 TRANSLATOR_ENDPOINT={base_url} TEXT_ANALYTICS_ENDPOINT={base_url}")
+    web.run_app(create_app(config, args.seed, base_url), host=args.host, port=args.port,
+                ssl_context=ssl_context, print=None)
+
+
+if __name__ == "__main__":
+    main()
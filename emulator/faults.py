@@ -0,0 +1,89 @@
+"""
+Latency and fault injection for the emulated services.
+
+Each service is configured with a dictionary such as:
+
+    {"latency": {"distribution": "lognormal", "median_ms": 800, "sigma": 0.4},
+     "error_rate": 0.01, "throttle_rate": 0.02, "retry_after": 1,
+     "rate_limit_per_second": 20}
+
+Supported latency distributions are "fixed" (ms), "uniform" (min_ms, max_ms)
+and "lognormal" (median_ms, sigma). error_rate answers 500, throttle_rate
+answers 429 with a Retry-After header, and rate_limit_per_second answers 429
+once that many requests have arrived in the current second, like a quota.
+"""
+import asyncio
+import math
+import random
+import time
+from typing import Optional
+
+
+class Latency:
+    """Draws a response delay, in seconds, from the configured distribution."""
+
+    def __init__(self, config: Optional[dict], rng: random.Random):
+        self.config = config or {"distribution": "fixed", "ms": 0}
+        self.rng = rng
+
+    def sample(self) -> float:
+        kind = self.config.get("distribution", "fixed")
+        if kind == "uniform":
+            ms = self.rng.uniform(self.config.get("min_ms", 0), self.config.get("max_ms", 0))
+        elif kind == "lognormal":
+            median = max(self.config.get("median_ms", 1), 0.001)
+            ms = self.rng.lognormvariate(math.log(median), self.config.get("sigma", 0.5))
+            ms = min(ms, self.config.get("max_ms", ms))
+        else:
+            ms = self.config.get("ms", 0)
+        return max(ms, 0) / 1000
+
+
+class ServiceFaults:
+    """Decides how one emulated service answers a request and counts the outcomes."""
+
+    def __init__(self, name: str, config: Optional[dict], rng: random.Random):
+        config = config or {}
+        self.name = name
+        self.rng = rng
+        self.latency = Latency(config.get("latency"), rng)
+        self.error_rate = config.get("error_rate", 0.0)
+        self.throttle_rate = config.get("throttle_rate", 0.0)
+        self.retry_after = config.get("retry_after", 1)
+        self.rate_limit = config.get("rate_limit_per_second")
+        self._window = 0
+        self._window_count = 0
+        self.requests = 0
+        self.errors = 0
+        self.throttled = 0
+        self.in_flight = 0
+
+    def decide(self) -> Optional[int]:
+        """Return the status code to fail this request with, or None to answer normally."""
+        self.requests += 1
+        if self.rate_limit:
+            window = int(time.monotonic())
+            if window != self._window:
+                self._window, self._window_count = window, 0
+            self._window_count += 1
+            if self._window_count > self.rate_limit:
+                self.throttled += 1
+                return 429
+        if self.rng.random() < self.throttle_rate:
+            self.throttled += 1
+            return 429
+        if self.rng.random() < self.error_rate:
+            self.errors += 1
+            return 500
+        return None
+
+    async def delay(self) -> None:
+        await asyncio.sleep(self.latency.sample())
+
+    def snapshot(self) -> dict:
+        return {
+            "requests": self.requests,
+            "errors": self.errors,
+            "throttled": self.throttled,
+            "in_flight": self.in_flight
+        }
@@ -0,0 +1,342 @@
+"""
+One aiohttp app standing in for every external service the bot calls.
+
+Routes:
+
+- POST /v1/chat/completions (and /chat/completions): OpenAI-compatible chat
+  completions, including "stream": true as server-sent events.
+- POST /translate: Azure Translator v3.
+- POST /language/:analyze-text: Azure AI Language sentiment, entities and
+  language detection, as used by azure-ai-textanalytics 5.3.
+- POST /text/analytics/v3.1/...: the same operations on the older API.
+- GET /kv and /kv/{key}: Azure App Configuration key-value reads, with ETags.
+- GET /_emulator/stats: request, error and throttle counts per service.
+
+Replies are deterministic for a given input, so runs can be compared.
+"""
+import asyncio
+import fnmatch
+import hashlib
+import json
+import random
+import re
+import time
+import uuid
+import zlib
+from email.utils import formatdate
+
+from aiohttp import web
+
+from emulator.faults import ServiceFaults
+
+LLM = "llm"
+TRANSLATOR = "translator"
+TEXT_ANALYTICS = "text_analytics"
+APP_CONFIGURATION = "app_configuration"
+
+CANNED_REPLIES = {
+    "english": ["Of course. Where would you like to go?", "That sounds good. Anything else?",
+                "I understand. Let me help you with that.", "Perfect, thank you very much."],
+    "spanish": ["Claro. ¿Adónde quiere ir?", "Muy bien. ¿Algo más?",
+                "Entiendo. Le ayudo con eso.", "Perfecto, muchas gracias."],
+    "french": ["Bien sûr. Où voulez-vous aller ?", "Très bien. Autre chose ?",
+               "Je comprends. Je vais vous aider.", "Parfait, merci beaucoup."],
+    "portuguese": ["Claro. Para onde quer ir?", "Muito bem. Mais alguma coisa?",
+                   "Compreendo. Vou ajudá-lo com isso.", "Perfeito, muito obrigado."]
+}
+
+LANGUAGE_NAMES = {"en": "English", "es": "Spanish", "fr": "French", "pt": "Portuguese"}
+STOPWORDS = {
+    "en": {"the", "and", "is", "i", "you", "to", "please", "want", "would", "thank"},
+    "es": {"el", "la", "y", "es", "quiero", "por", "favor", "gracias", "de", "que", "un", "una"},
+    "fr": {"le", "la", "et", "est", "je", "vous", "merci", "voudrais", "de", "une", "s'il"},
+    "pt": {"o", "a", "e", "é", "eu", "quero", "obrigado", "obrigada", "de", "um", "uma", "por"}
+}
+POSITIVE_WORDS = {"good", "great", "thanks", "thank", "perfect", "bien", "bueno", "gracias", "perfecto",
+                  "merci", "parfait", "bom", "obrigado", "obrigada", "perfeito", "excelente", "excellent"}
+NEGATIVE_WORDS = {"bad", "no", "not", "terrible", "expensive", "malo", "caro", "mal", "non", "cher",
+                  "mauvais", "não", "ruim"}
+
+_WORD = re.compile(r"[\w'À-ÿ]+", re.UNICODE)
+
+
+def _words(text: str) -> list:
+    return [w.lower() for w in _WORD.findall(text or "")]
+
+
+def default_settings(base_url: str) -> dict:
+    """App Configuration values that point the bot back at this emulator."""
+    return {
+        "AI_API_KEY": "emulator-key",
+        "AI_ENDPOINT": f"{base_url}/v1",
+        "TRANSLATOR_KEY": "emulator-key",
+        "TRANSLATOR_ENDPOINT": base_url,
+        "TRANSLATOR_LOCATION": "local",
+        "TEXT_ANALYTICS_KEY": "emulator-key",
+        "TEXT_ANALYTICS_ENDPOINT": base_url,
+        "FLASK_SECRET": "emulator-secret",
+        "MicrosoftAppId": "",
+        "MicrosoftAppPassword": ""
+    }
+
+
+def _azure_error(status: int, retry_after: float) -> web.Response:
+    headers = {"Retry-After": str(retry_after)} if status == 429 else {}
+    code = "429" if status == 429 else "InternalServerError"
+    message = "Rate limit is exceeded." if status == 429 else "Injected failure from the emulator."
+    return web.json_response({"error": {"code": code, "message": message}}, status=status, headers=headers)
+
+
+def _openai_error(status: int, retry_after: float) -> web.Response:
+    headers = {"Retry-After": str(retry_after)} if status == 429 else {}
+    kind = "rate_limit_error" if status == 429 else "server_error"
+    return web.json_response(
+        {"error": {"message": f"Injected {kind} from the emulator.", "type": kind, "code": kind}},
+        status=status, headers=headers)
+
+
+async def _guard(request: web.Request, service: str, error_response=_azure_error):
+    """Apply the service's faults and latency; returns an error response or None."""
+    faults: ServiceFaults = request.app["faults"][service]
+    status = faults.decide()
+    if status == 429:
+        # Throttling is answered straight away, like the real services
+        return error_response(429, faults.retry_after)
+    faults.in_flight += 1
+    try:
+        await faults.delay()
+    finally:
+        faults.in_flight -= 1
+    if status is not None:
+        return error_response(status, faults.retry_after)
+    return None
+
+
+# --- OpenAI chat completions -------------------------------------------------
+
+def _chat_reply(messages: list) -> str:
+    system = " ".join(str(m.get("content", "")) for m in messages if m.get("role") == "system")
+    user = next((str(m.get("content", "")) for m in reversed(messages) if m.get("role") == "user"), "")
+    if "grammar checking tool" in system:
+        # Treat every sentence as correct so the reply is stable
+        return user
+    match = re.search(r"role-playing in (\w+)", system)
+    replies = CANNED_REPLIES.get(match.group(1).lower() if match else "english", CANNED_REPLIES["english"])
+    return replies[zlib.crc32(user.encode("utf-8")) % len(replies)]
+
+
+async def chat_completions(request: web.Request) -> web.StreamResponse:
+    body = await request.json()
+    error = await _guard(request, LLM, _openai_error)
+    if error is not None:
+        return error
+
+    reply = _chat_reply(body.get("messages", []))
+    completion_id = f"chatcmpl-{uuid.uuid4().hex[:24]}"
+    created = int(time.time())
+    model = body.get("model", "emulator")
+    prompt_tokens = sum(len(_words(str(m.get("content", "")))) for m in body.get("messages", []))
+    completion_tokens = len(_words(reply))
+
+    if not body.get("stream"):
+        return web.json_response({
+            "id": completion_id,
+            "object": "chat.completion",
+            "created": created,
+            "model": model,
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": reply}, "finish_reason": "stop"}],
+            "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens,
+                      "total_tokens": prompt_tokens + completion_tokens}
+        })
+
+    response = web.StreamResponse(headers={"Content-Type": "text/event-stream", "Cache-Control": "no-cache"})
+    await response.prepare(request)
+    chunk_delay = request.app["config"].get(LLM, {}).get("stream_chunk_ms", 20) / 1000
+
+    def chunk(delta: dict, finish_reason=None) -> bytes:
+        payload = {"id": completion_id, "object": "chat.completion.chunk", "created": created, "model": model,
+                   "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}]}
+        return f"data: {json.dumps(payload, ensure_ascii=False)}\n\n".encode("utf-8")
+
+    await response.write(chunk({"role": "assistant", "content": ""}))
+    for i, word in enumerate(reply.split(" ")):
+        await asyncio.sleep(chunk_delay)
+        await response.write(chunk({"content": word if i == 0 else f" {word}"}))
+    await response.write(chunk({}, "stop"))
+    await response.write(b"data: [DONE]\n\n")
+    await response.write_eof()
+    return response
+
+
+# --- Translator ----------------------------------------------------------------
+
+async def translate(request: web.Request) -> web.Response:
+    targets = request.query.getall("to", [])
+    if not targets:
+        return web.json_response({"error": {"code": 400036, "message": "The target language is not valid."}}, status=400)
+    body = await request.json()
+    if not isinstance(body, list) or len(body) > 1000:
+        return web.json_response({"error": {"code": 400077, "message": "The maximum request size has been exceeded."}}, status=400)
+    error = await _guard(request, TRANSLATOR)
+    if error is not None:
+        return error
+    return web.json_response([
+        {
+            "detectedLanguage": {"language": _detect(item.get("text", ""))[0], "score": 1.0},
+            "translations": [{"text": f"[{to}] {item.get('text', '')}", "to": to} for to in targets]
+        }
+        for item in body
+    ])
+
+
+# --- Text Analytics ----------------------------------------------------------------
+
+def _detect(text: str):
+    words = _words(text)
+    scores = {code: sum(w in stop for w in words) for code, stop in STOPWORDS.items()}
+    code = max(scores, key=lambda c: (scores[c], c == "en"))
+    total = sum(scores.values())
+    return code, (scores[code] / total if total else 0.5)
+
+
+def _sentiment(text: str) -> dict:
+    words = _words(text)
+    positive = sum(w in POSITIVE_WORDS for w in words)
+    negative = sum(w in NEGATIVE_WORDS for w in words)
+    label = "positive" if positive > negative else "negative" if negative > positive else "neutral"
+    scores = {"positive": 0.1, "neutral": 0.1, "negative": 0.1}
+    scores[label] = 0.8
+    return {"sentiment": label, "confidenceScores": scores}
+
+
+def _entities(text: str) -> list:
+    entities = []
+    for match in re.finditer(r"\d+(?:[.,]\d+)?|\b[A-ZÀ-Þ][\w'À-ÿ]+", text or ""):
+        word = match.group(0)
+        if word[0].isdigit():
+            category, subcategory = "Quantity", "Number"
+        elif match.start() == 0:
+            continue
+        else:
+            category, subcategory = "Location", "GPE"
+        entities.append({"text": word, "category": category, "subcategory": subcategory,
+                         "offset": match.start(), "length": len(word), "confidenceScore": 0.9})
+    return entities
+
+
+def _analyse(kind: str, document: dict) -> dict:
+    text = document.get("text", "")
+    result = {"id": document.get("id"), "warnings": []}
+    if kind == "SentimentAnalysis":
+        sentiment = _sentiment(text)
+        result.update(sentiment)
+        result["sentences"] = [{**sentiment, "offset": 0, "length": len(text), "text": text}]
+    elif kind == "EntityRecognition":
+        result["entities"] = _entities(text)
+    else:
+        code, score = _detect(text)
+        result["detectedLanguage"] = {"name": LANGUAGE_NAMES[code], "iso6391Name": code, "confidenceScore": score}
+    return result
+
+
+async def analyze_text(request: web.Request) -> web.Response:
+    body = await request.json()
+    kind = body.get("kind")
+    if kind not in ("SentimentAnalysis", "EntityRecognition", "LanguageDetection"):
+        return web.json_response({"error": {"code": "InvalidRequest", "message": f"Unsupported kind {kind}"}}, status=400)
+    error = await _guard(request, TEXT_ANALYTICS)
+    if error is not None:
+        return error
+    documents = body.get("analysisInput", {}).get("documents", [])
+    return web.json_response({
+        "kind": f"{kind}Results",
+        "results": {"documents": [_analyse(kind, d) for d in documents], "errors": [], "modelVersion": "emulator"}
+    })
+
+
+async def analyze_text_v3(request: web.Request) -> web.Response:
+    kind = {"sentiment": "SentimentAnalysis", "languages": "LanguageDetection"}.get(
+        request.match_info["operation"], "EntityRecognition")
+    body = await request.json()
+    error = await _guard(request, TEXT_ANALYTICS)
+    if error is not None:
+        return error
+    return web.json_response({
+        "documents": [_analyse(kind, d) for d in body.get("documents", [])],
+        "errors": [],
+        "modelVersion": "emulator"
+    })
+
+
+# --- App Configuration ----------------------------------------------------------------
+
+def _setting(key: str, value: str, modified: float) -> dict:
+    return {
+        "etag": hashlib.sha1(f"{key}={value}".encode("utf-8")).hexdigest(),
+        "key": key,
+        "label": None,
+        "content_type": None,
+        "value": value,
+        "tags": {},
+        "locked": False,
+        "last_modified": time.strftime("%Y-%m-%dT%H:%M:%S+00:00", time.gmtime(modified))
+    }
+
+
+async def get_key_value(request: web.Request) -> web.Response:
+    error = await _guard(request, APP_CONFIGURATION)
+    if error is not None:
+        return error
+    key = request.match_info["key"]
+    settings = request.app["settings"]
+    if key not in settings:
+        return web.json_response({"type": "https://azconfig.io/errors/key-not-found", "title": "Not Found",
+                                  "status": 404}, status=404)
+    item = _setting(key, settings[key], request.app["settings_modified"])
+    headers = {"ETag": f'"{item["etag"]}"', "Last-Modified": formatdate(request.app["settings_modified"], usegmt=True)}
+    if request.headers.get("If-None-Match", "").strip('"') == item["etag"]:
+        return web.Response(status=304, headers=headers)
+    return web.json_response(item, headers=headers, content_type="application/vnd.microsoft.appconfig.kv+json")
+
+
+async def list_key_values(request: web.Request) -> web.Response:
+    error = await _guard(request, APP_CONFIGURATION)
+    if error is not None:
+        return error
+    patterns = [p for p in request.query.get("key", "*").split(",") if p]
+    settings = request.app["settings"]
+    items = [_setting(key, value, request.app["settings_modified"]) for key, value in sorted(settings.items())
+             if any(fnmatch.fnmatchcase(key, pattern) for pattern in patterns)]
+    etag = hashlib.sha1("".join(item["etag"] for item in items).encode("utf-8")).hexdigest()
+    headers = {"ETag": f'"{etag}"'}
+    if request.headers.get("If-None-Match", "").strip('"') == etag:
+        return web.Response(status=304, headers=headers)
+    return web.json_response({"items": items}, headers=headers, content_type="application/vnd.microsoft.appconfig.kvset+json")
+
+
+# --- Emulator control ----------------------------------------------------------------
+
+async def stats(request: web.Request) -> web.Response:
+    return web.json_response({name: faults.snapshot() for name, faults in request.app["faults"].items()})
+
+
+def create_app(config: dict = None, seed: int = None, base_url: str = "http://127.0.0.1:8090") -> web.Application:
+    """Build the emulator app. config holds fault settings per service and optional "settings" for App Configuration."""
+    config = config or {}
+    rng = random.Random(seed)
+    app = web.Application()
+    app["config"] = config
+    app["faults"] = {name: ServiceFaults(name, config.get(name), rng)
+                     for name in (LLM, TRANSLATOR, TEXT_ANALYTICS, APP_CONFIGURATION)}
+    app["settings"] = {**default_settings(base_url), **config.get("settings", {})}
+    app["settings_modified"] = time.time()
+
+    app.router.add_post("/v1/chat/completions", chat_completions)
+    app.router.add_post("/chat/completions", chat_completions)
+    app.router.add_post("/translate", translate)
+    app.router.add_post("/language/:analyze-text", analyze_text)
+    app.router.add_post("/text/analytics/v3.1/{operation:.+}", analyze_text_v3)
+    app.router.add_get("/kv", list_key_values)
+    app.router.add_get("/kv/{key}", get_key_value)
+    app.router.add_get("/_emulator/stats", stats)
+    return app